@@ -3,13 +3,21 @@ from flask_cors import CORS
 from flask_mail import Mail
 from flask_jwt_extended import JWTManager
 from routes.api import api_blueprint
+from services.supabase import init_app as init_db
+from services.cache import api_cache_control, SECURITY_HEADERS, CORS_OPTIONS
+from services.assets import serve_asset
+from services.transcoder import VIDEO_MAX_BYTES
+from services.mailer import init_app as init_mail_outbox
+from services.metrics import init_app as init_metrics
+from services.query_profiler import init_app as init_query_profiler
 import os
 from dotenv import load_dotenv
 from datetime import timedelta
 
 load_dotenv()
 
-app = Flask(__name__, static_folder='static', static_url_path='')
+# static/ is served by serve_static() below, not Flask's built-in static route
+app = Flask(__name__, static_folder=None)
 
 # Configure Flask-Mail
 app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER')
@@ -19,6 +27,9 @@ app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
 app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
 app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER')
 
+# Reject oversized uploads before they are read (videos plus form fields)
+app.config['MAX_CONTENT_LENGTH'] = VIDEO_MAX_BYTES + 1024 * 1024
+
 # Configure JWT
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(seconds=int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 86400)))  # 24 hours
@@ -27,66 +38,42 @@ app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(seconds=int(os.getenv('JWT_AC
 mail = Mail(app)
 jwt = JWTManager(app)
 
-CORS(app)
+CORS(app, **CORS_OPTIONS)
+init_db(app)
+init_mail_outbox(app)
+init_metrics(app)
+init_query_profiler(app)
 app.register_blueprint(api_blueprint)
 
-# Add cache headers for static assets (McMaster-Carr style caching)
+# Cache headers for API responses; static files set their own in serve_static()
 @app.after_request
 def add_cache_headers(response):
-    # Static assets get long cache times
-    if request.endpoint == 'serve_static':
-        # Critical files get no cache to avoid styling issues
-        if 'critical-css.js' in request.path or request.path.endswith('index.html'):
-            response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-            response.headers['Pragma'] = 'no-cache'
-            response.headers['Expires'] = '0'
-        elif any(request.path.endswith(ext) for ext in ['.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico', '.woff', '.woff2', '.ttf']):
-            # 1 year cache for static assets
-            response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
-            response.headers['Expires'] = 'Thu, 31 Dec 2025 23:59:59 GMT'
-        elif request.path.endswith('.html'):
-            # 5 minutes cache for HTML pages
-            response.headers['Cache-Control'] = 'public, max-age=300'
-    
-    # API responses get shorter cache times
-    elif request.endpoint and 'api' in request.endpoint:
-        if 'leaderboard' in request.path:
-            response.headers['Cache-Control'] = 'public, max-age=300'  # 5 minutes
-        elif 'videos' in request.path:
-            response.headers['Cache-Control'] = 'public, max-age=60'   # 1 minute
-        else:
-            response.headers['Cache-Control'] = 'no-cache'
+    # API responses get shorter cache times, unless the view chose its own (e.g. media)
+    if request.endpoint and 'api' in request.endpoint and 'Cache-Control' not in response.headers:
+        response.headers['Cache-Control'] = api_cache_control(request.path)
     
     # Add security headers
-    response.headers['X-Content-Type-Options'] = 'nosniff'
-    response.headers['X-Frame-Options'] = 'DENY'
-    response.headers['X-XSS-Protection'] = '1; mode=block'
+    response.headers.update(SECURITY_HEADERS)
     
     return response
 
-# Initialize database indexes on startup
-def initialize_database():
-    try:
-        from routes.api import create_performance_indexes
-        create_performance_indexes()
-    except Exception as e:
-        print(f"Warning: Could not create database indexes on startup: {e}")
-
-# Call initialization
-with app.app_context():
-    initialize_database()
-
 @app.route('/')
 def home():
-    return send_file('static/index.html')
+    return serve_asset('index.html') or send_file('static/index.html')
 
 @app.route('/health')
 def health_check():
+    # Public; per-worker internals are at /api/admin/stats
     return {'status': 'healthy', 'version': '1.0.0'}, 200
 
 @app.route('/<path:filename>')
 def serve_static(filename):
-    return send_from_directory('static', filename)
+    # Fingerprinted, precompressed build when available (python -m services.assets build)
+    response = serve_asset(filename)
+    if response is None:
+        response = send_from_directory('static', filename)
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,12 @@
+"""
+ASGI entry point: the public reads served asynchronously in front of the Flask app
+
+    gunicorn -k uvicorn.workers.UvicornWorker asgi:app
+
+See services/async_reads.py. ``app:app`` on sync workers remains a complete
+deployment on its own.
+"""
+from app import app as flask_app
+from services.async_reads import create_app
+
+app = create_app(flask_app)
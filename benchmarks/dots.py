@@ -0,0 +1,51 @@
+"""
+Micro-benchmark: scalar vs batch DOTS scoring
+
+    python -m benchmarks.dots [--lifters 100000] [--repeat 5]
+"""
+import argparse
+import random
+import time
+
+from services.scoring import calculate_dots_score, calculate_dots_scores, round_dots_scores
+
+def synthetic_lifters(count, seed=42):
+    rng = random.Random(seed)
+    genders = [rng.choice(['male', 'female']) for _ in range(count)]
+    bodyweights = [round(rng.gauss(85 if gender == 'male' else 65, 12), 1) for gender in genders]
+    totals = [round(max(60.0, rng.gauss(520 if gender == 'male' else 330, 110)) * 2) / 2 for gender in genders]
+    return totals, bodyweights, genders
+
+def best_of(repeat, fn):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lifters', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    totals, bodyweights, genders = synthetic_lifters(args.lifters)
+
+    scalar_time, scalar = best_of(args.repeat, lambda: [
+        calculate_dots_score(total, bodyweight, gender)
+        for total, bodyweight, gender in zip(totals, bodyweights, genders)
+    ])
+    batch_time, batch = best_of(args.repeat, lambda: calculate_dots_scores(totals, bodyweights, genders))
+    rounded_time, rounded = best_of(args.repeat, lambda: round_dots_scores(calculate_dots_scores(totals, bodyweights, genders)))
+
+    mismatches = sum(1 for a, b in zip(scalar, rounded) if a != b)
+    print(f"lifters:            {args.lifters}")
+    print(f"scalar:             {scalar_time * 1000:9.2f} ms")
+    print(f"batch (unrounded):  {batch_time * 1000:9.2f} ms  ({scalar_time / batch_time:5.1f}x)")
+    print(f"batch (rounded):    {rounded_time * 1000:9.2f} ms  ({scalar_time / rounded_time:5.1f}x)")
+    print(f"rounding mismatches: {mismatches}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+"""
+HTTP load driver with latency percentiles and stored baselines
+
+    python -m benchmarks.load [--base-url http://localhost:8000] [--duration 30] [--concurrency 8]
+                              [--scenarios leaderboard,videos,profile,team_leaderboard,login]
+                              [--save benchmarks/baselines/NAME.json] [--compare benchmarks/baselines/NAME.json]
+
+Runs each scenario in turn against a server loaded by ``benchmarks.datagen``
+(``--users`` must match the generated count), after a short warm-up, from
+``--concurrency`` threads holding keep-alive connections. Reports
+throughput and p50/p95/p99 latency per scenario. ``--save`` writes the
+results as a baseline; ``--compare`` checks them against one and exits with
+status 1 when p95/p99 latency rose or throughput fell by more than
+``--tolerance``. Compare runs made on the same machine, data and settings.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote, urlparse
+
+from benchmarks.datagen import BENCHMARK_PASSWORD, FLAGS, bench_username
+
+# Error-rate increase (absolute) treated as a regression
+MAX_ERROR_RATE_INCREASE = 0.01
+
+def leaderboard_request(rng, users):
+    params = [f"limit={rng.choice([20, 50, 100])}"]
+    if rng.random() < 0.3:
+        params.append(f"gender={rng.choice(['male', 'female'])}")
+    if rng.random() < 0.2:
+        params.append(f"country={quote(rng.choice(FLAGS)[0])}")
+    return 'GET', '/api/leaderboard?' + '&'.join(params), None
+
+def videos_request(rng, users):
+    return 'GET', '/api/videos', None
+
+def profile_request(rng, users):
+    return 'GET', f"/api/user/{bench_username(rng.randrange(users))}", None
+
+def team_leaderboard_request(rng, users):
+    return 'GET', f"/api/team_leaderboard?sort={rng.choice(['avg_elo', 'total_elo'])}", None
+
+def login_request(rng, users):
+    body = {'username': bench_username(rng.randrange(users)), 'password': BENCHMARK_PASSWORD}
+    return 'POST', '/api/login', json.dumps(body)
+
+SCENARIOS = {
+    'leaderboard': leaderboard_request,
+    'videos': videos_request,
+    'profile': profile_request,
+    'team_leaderboard': team_leaderboard_request,
+    'login': login_request,
+}
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+class Worker(threading.Thread):
+    """Issues requests on one keep-alive connection until the deadline"""
+
+    def __init__(self, base_url, make_request, users, seed, deadline, record_after):
+        super().__init__(daemon=True)
+        self.url = urlparse(base_url)
+        self.make_request = make_request
+        self.users = users
+        self.rng = random.Random(seed)
+        self.deadline = deadline
+        self.record_after = record_after
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+
+    def connect(self):
+        connection_class = http.client.HTTPSConnection if self.url.scheme == 'https' else http.client.HTTPConnection
+        return connection_class(self.url.hostname, self.url.port, timeout=30)
+
+    def run(self):
+        conn = self.connect()
+        while True:
+            started = time.perf_counter()
+            if started >= self.deadline:
+                break
+            method, path, body = self.make_request(self.rng, self.users)
+            headers = {'Content-Type': 'application/json'} if body else {}
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = self.connect()
+                status = None
+            elapsed = time.perf_counter() - started
+            if started < self.record_after:
+                continue
+            if status is None or status >= 500:
+                self.errors += 1
+            else:
+                self.latencies.append(elapsed)
+            self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+        conn.close()
+
+def run_scenario(name, base_url, users, duration, concurrency, warmup, seed):
+    """
+    Returns:
+        dict: {'requests', 'errors', 'statuses', 'throughput', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'}
+    """
+    started = time.perf_counter()
+    record_after = started + warmup
+    workers = [
+        Worker(base_url, SCENARIOS[name], users, seed * 1000 + i, record_after + duration, record_after)
+        for i in range(concurrency)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    latencies = sorted(latency for worker in workers for latency in worker.latencies)
+    statuses = {}
+    for worker in workers:
+        for status, count in worker.statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        'requests': len(latencies),
+        'errors': sum(worker.errors for worker in workers),
+        'statuses': statuses,
+        'throughput': round(len(latencies) / duration, 2),
+        'p50_ms': ms(percentile(latencies, 0.50)),
+        'p95_ms': ms(percentile(latencies, 0.95)),
+        'p99_ms': ms(percentile(latencies, 0.99)),
+        'max_ms': ms(latencies[-1] if latencies else None),
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def error_rate_of(result):
+    attempts = result['requests'] + result['errors']
+    return result['errors'] / attempts if attempts else 0.0
+
+def compare(results, baseline, tolerance):
+    """
+    Returns:
+        list: Human-readable regressions (empty when within tolerance)
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline['results'].get(name)
+        if not base:
+            continue
+        for metric in ('p95_ms', 'p99_ms'):
+            if result[metric] is not None and base[metric] and result[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {base[metric]} -> {result[metric]}")
+        if base['throughput'] and result['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {base['throughput']} -> {result['throughput']} req/s")
+        error_rate, base_error_rate = error_rate_of(result), error_rate_of(base)
+        if error_rate > base_error_rate + MAX_ERROR_RATE_INCREASE:
+            regressions.append(f"{name}: error rate {base_error_rate:.1%} -> {error_rate:.1%}")
+    return regressions
+
+def print_results(results, baseline=None):
+    print(f"\n{'scenario':<18} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, result in results.items():
+        print(f"{name:<18} {result['throughput']:>9.1f} {result['p50_ms'] or 0:>9.2f} {result['p95_ms'] or 0:>9.2f} "
+              f"{result['p99_ms'] or 0:>9.2f} {result['errors']:>7}")
+        base = (baseline or {}).get('results', {}).get(name)
+        if base:
+            print(f"{'  baseline':<18} {base['throughput']:>9.1f} {base['p50_ms'] or 0:>9.2f} {base['p95_ms'] or 0:>9.2f} "
+                  f"{base['p99_ms'] or 0:>9.2f} {base['errors']:>7}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default=os.getenv('BENCH_BASE_URL', 'http://localhost:8000'))
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--users', type=int, default=10000, help='users generated by benchmarks.datagen')
+    parser.add_argument('--duration', type=float, default=30, help='measured seconds per scenario')
+    parser.add_argument('--warmup', type=float, default=3, help='unmeasured seconds before each scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--save', help='write the results as a baseline to this path')
+    parser.add_argument('--compare', help='baseline to check the results against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative regression')
+    args = parser.parse_args()
+
+    names = [name for name in args.scenarios.split(',') if name]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+
+    results = {}
+    for name in names:
+        print(f"Running {name}: {args.concurrency} clients for {args.duration:.0f}s...")
+        results[name] = run_scenario(name, args.base_url, args.users, args.duration, args.concurrency,
+                                     args.warmup, args.seed)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                'meta': {
+                    'recorded_at': datetime.now(timezone.utc).isoformat(),
+                    'revision': git_revision(),
+                    'host': platform.node(),
+                    'python': platform.python_version(),
+                    'base_url': args.base_url,
+                    'users': args.users,
+                    'duration': args.duration,
+                    'concurrency': args.concurrency,
+                    'seed': args.seed,
+                },
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+        print(f"\nSaved baseline to {args.save}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nRegressions beyond {args.tolerance:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.compare}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
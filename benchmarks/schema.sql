@@ -0,0 +1,24 @@
+-- Base tables that exist in Supabase before migrations/ runs, for a local benchmark database
+-- Applied by python -m benchmarks.datagen; every statement is a no-op on an existing schema
+
+CREATE TABLE IF NOT EXISTS users (
+    username VARCHAR(255) PRIMARY KEY,
+    password_hash VARCHAR(255) NOT NULL,
+    email VARCHAR(255) UNIQUE NOT NULL,
+    display_name VARCHAR(255),
+    flag VARCHAR(255),
+    team VARCHAR(255) DEFAULT 'Independent',
+    elo FLOAT DEFAULT 1000,
+    is_active BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT NOW(),
+    last_login TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS prs (
+    id SERIAL PRIMARY KEY,
+    username VARCHAR(255) NOT NULL REFERENCES users(username) ON DELETE CASCADE ON UPDATE CASCADE,
+    lift_type VARCHAR(20) NOT NULL,
+    weight FLOAT NOT NULL,
+    video_url TEXT,
+    created_at TIMESTAMP DEFAULT NOW()
+);
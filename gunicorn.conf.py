@@ -0,0 +1,107 @@
+"""
+Production gunicorn settings, read automatically from the working directory
+
+    gunicorn                          # app:app, the Flask app on gthread workers
+    GUNICORN_APP=asgi:app gunicorn    # async public reads on uvicorn workers (services/async_reads.py)
+
+Workers are sized from the CPUs and memory actually available to the
+container (cgroup limits, not the host's). ``WEB_CONCURRENCY`` and
+``GUNICORN_THREADS`` override the computed values. The app is preloaded in
+the master, so workers share its imported code copy-on-write, and each
+worker warms up (services/warmup.py) before it takes traffic. Workers are
+recycled after ``GUNICORN_MAX_REQUESTS`` requests, with jitter so they do
+not all restart at once.
+
+Every worker opens its own DB pool (``DB_POOL_MAX_SIZE`` connections), so
+keep workers x pool size under the database's connection limit.
+"""
+import math
+import os
+import shutil
+
+def cpu_limit():
+    # cgroup v2 CPU quota (containers), then the CPUs this process may run on
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            return max(1, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def memory_limit_mb():
+    # cgroup v2 / v1 memory limit, then physical memory; None if unknown
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        # cgroup v1 reports "unlimited" as a huge number
+        if value.isdigit() and int(value) < 1 << 50:
+            return int(value) // (1024 * 1024)
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def default_workers(cpus, memory_mb, asgi):
+    # Event-loop workers are CPU bound; sync workers also wait on I/O, hence 2n+1
+    workers = cpus if asgi else 2 * cpus + 1
+    if memory_mb:
+        # Leave room for the master and the OS, then fit worker resident size
+        per_worker = int(os.getenv('WORKER_MEMORY_MB', 256))
+        workers = min(workers, (memory_mb - int(os.getenv('RESERVED_MEMORY_MB', 256))) // per_worker)
+    return max(1, workers)
+
+wsgi_app = os.getenv('GUNICORN_APP', 'app:app')
+asgi = wsgi_app.startswith('asgi:')
+
+CPUS = cpu_limit()
+MEMORY_MB = memory_limit_mb()
+
+bind = f"0.0.0.0:{os.getenv('PORT', 8000)}"
+worker_class = 'uvicorn.workers.UvicornWorker' if asgi else 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', 0)) or default_workers(CPUS, MEMORY_MB, asgi)
+# Threads share their worker's DB pool; more threads than connections would only queue on it
+threads = int(os.getenv('GUNICORN_THREADS', 0)) or min(4, int(os.getenv('DB_POOL_MAX_SIZE', 10)))
+
+preload_app = True
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Heartbeat files on tmpfs: a slow overlay filesystem can get workers killed as unresponsive
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG')
+errorlog = '-'
+
+# Multiprocess metrics (services/metrics.py) must be configured before the
+# app is imported, which with preload_app happens right after this file is
+# read. Samples left by a previous run would be summed into this one.
+MULTIPROC_DIR = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus_multiproc')
+shutil.rmtree(MULTIPROC_DIR, ignore_errors=True)
+os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+def on_starting(server):
+    print(f"Starting {workers} {worker_class} workers x {threads} threads "
+          f"({CPUS} CPUs, {MEMORY_MB or 'unknown'} MB) for {wsgi_app}")
+
+def post_worker_init(worker):
+    # Runs before the worker's accept loop, so no request reaches a cold
+    # worker. Warm-up stops at WARMUP_TIMEOUT, well inside ``timeout``.
+    from app import app
+    from services.warmup import warm_up
+    warm_up(app)
+
+def child_exit(server, worker):
+    from services.metrics import mark_worker_dead
+    mark_worker_dead(worker.pid)
@@ -1,7 +1,7 @@
 -- Add weight column to users table
 -- This migration adds a weight field to store user's body weight
 
-ALTER TABLE users ADD COLUMN weight FLOAT;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS weight FLOAT;
 
 -- Optional: Add a comment to the column
 COMMENT ON COLUMN users.weight IS 'User body weight in kilograms';
\ No newline at end of file
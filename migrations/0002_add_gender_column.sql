@@ -1,10 +1,15 @@
 -- Add gender column to users table
 -- This migration adds a gender field required for DOTS score calculation
 
-ALTER TABLE users ADD COLUMN gender VARCHAR(10);
+ALTER TABLE users ADD COLUMN IF NOT EXISTS gender VARCHAR(10);
 
 -- Optional: Add a comment to the column
 COMMENT ON COLUMN users.gender IS 'User gender (male/female) for DOTS score calculation';
 
 -- Optional: Add a check constraint to ensure only valid values
-ALTER TABLE users ADD CONSTRAINT check_gender CHECK (gender IN ('male', 'female'));
\ No newline at end of file
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'check_gender') THEN
+        ALTER TABLE users ADD CONSTRAINT check_gender CHECK (gender IN ('male', 'female'));
+    END IF;
+END $$;
\ No newline at end of file
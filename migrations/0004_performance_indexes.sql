@@ -0,0 +1,13 @@
+-- migrate: no-transaction
+-- Performance indexes for the leaderboard, teams and feed queries
+-- Built CONCURRENTLY so writes to users/prs are not blocked during a rollout;
+-- CONCURRENTLY cannot run inside a transaction, so each statement commits on its own
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_weight_gender ON users(weight, gender);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_team_active ON users(team, is_active);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_prs_username_lift ON prs(username, lift_type);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_prs_username_lift_weight ON prs(username, lift_type, weight);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_prs_weight ON prs(weight);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_prs_created_at ON prs(created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_prs_video_feed ON prs(created_at DESC, id DESC) WHERE video_url IS NOT NULL AND video_url != '';
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_prs_username_created ON prs(username, created_at DESC, id DESC);
@@ -0,0 +1,27 @@
+-- Create user standings table
+-- Denormalized per-user leaderboard row (best lifts, total, DOTS score and segment keys),
+-- kept current by the PR/profile write paths so leaderboard reads are an indexed top-K scan
+
+CREATE TABLE IF NOT EXISTS user_standings (
+    username VARCHAR(255) PRIMARY KEY,
+    gender VARCHAR(10) NOT NULL,
+    flag VARCHAR(255),
+    bodyweight FLOAT NOT NULL,
+    bench FLOAT,
+    squat FLOAT,
+    deadlift FLOAT,
+    total_lifted FLOAT NOT NULL,
+    dots_score DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    FOREIGN KEY (username) REFERENCES users(username) ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- One index per leaderboard segment (all, gender, country, gender + country)
+CREATE INDEX IF NOT EXISTS idx_user_standings_dots ON user_standings(dots_score DESC, username);
+CREATE INDEX IF NOT EXISTS idx_user_standings_gender_dots ON user_standings(gender, dots_score DESC, username);
+CREATE INDEX IF NOT EXISTS idx_user_standings_flag_dots ON user_standings(flag, dots_score DESC, username);
+CREATE INDEX IF NOT EXISTS idx_user_standings_gender_flag_dots ON user_standings(gender, flag, dots_score DESC, username);
+
+-- Add comment
+COMMENT ON TABLE user_standings IS 'Per-user leaderboard standings, maintained on PR and profile writes (repair: python -m services.standings rebuild)';
+COMMENT ON COLUMN user_standings.dots_score IS 'Unrounded DOTS score used for ranking';
@@ -0,0 +1,38 @@
+"""Fill user_standings from the existing PRs (later kept current by the write paths)"""
+
+# Frozen copy of the standings computation as of this migration (DOTS
+# coefficients inlined), so replaying it never depends on services/ code
+BACKFILL_SQL = """
+    WITH best AS (
+        SELECT p.username,
+               (MAX(p.weight) FILTER (WHERE p.lift_type = 'bench'))::float8 AS bench,
+               (MAX(p.weight) FILTER (WHERE p.lift_type = 'squat'))::float8 AS squat,
+               (MAX(p.weight) FILTER (WHERE p.lift_type = 'deadlift'))::float8 AS deadlift
+        FROM prs p
+        JOIN users u ON u.username = p.username
+        WHERE u.weight IS NOT NULL AND u.weight > 0 AND u.gender IS NOT NULL
+        GROUP BY p.username
+    ), totals AS (
+        SELECT u.username, u.gender, u.flag, u.weight::float8 AS bodyweight,
+               b.bench, b.squat, b.deadlift,
+               COALESCE(b.bench, 0) + COALESCE(b.squat, 0) + COALESCE(b.deadlift, 0) AS total_lifted
+        FROM best b
+        JOIN users u ON u.username = b.username
+    ), computed AS (
+        SELECT username, gender, flag, bodyweight, bench, squat, deadlift, total_lifted,
+               (500 * total_lifted / NULLIF(CASE WHEN gender = 'male'
+                   THEN ((((7.07665973e-06 * bodyweight + -0.001395833811) * bodyweight + 0.07369410346) * bodyweight + 8.472061379) * bodyweight + 47.46178854)
+                   ELSE ((((-1.13708316e-06 * bodyweight + 0.0003872554572) * bodyweight + -0.03307250631) * bodyweight + 13.71219419) * bodyweight + -125.4255398)
+               END, 0)) AS dots_score
+        FROM totals
+        WHERE total_lifted > 0
+    )
+    INSERT INTO user_standings (username, gender, flag, bodyweight, bench, squat, deadlift, total_lifted, dots_score, updated_at)
+    SELECT username, gender, flag, bodyweight, bench, squat, deadlift, total_lifted, dots_score, NOW()
+    FROM computed
+    WHERE dots_score IS NOT NULL
+"""
+
+def upgrade(cur):
+    cur.execute("DELETE FROM user_standings")
+    cur.execute(BACKFILL_SQL)
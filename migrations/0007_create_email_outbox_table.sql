@@ -0,0 +1,24 @@
+-- Create email outbox table
+-- Outgoing mail is written here in the same transaction as the change that triggers it
+-- (e.g. the password reset token) and delivered by the background sender in services/mailer.py
+
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    recipient VARCHAR(255) NOT NULL,
+    subject VARCHAR(255) NOT NULL,
+    html TEXT NOT NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT NOW(),
+    sent_at TIMESTAMP,
+    CONSTRAINT check_email_outbox_status CHECK (status IN ('pending', 'sent', 'failed'))
+);
+
+-- Add index for the sender's "due messages" scan
+CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox(next_attempt_at) WHERE status = 'pending';
+
+-- Add comment
+COMMENT ON TABLE email_outbox IS 'Transactional outbox for outgoing email, drained by services/mailer.py';
+COMMENT ON COLUMN email_outbox.next_attempt_at IS 'Earliest time of the next delivery attempt (exponential backoff on failure)';
@@ -0,0 +1,27 @@
+-- Create team standings table
+-- Per-team member count and ELO aggregates, kept current by the registration, profile
+-- and PR write paths so the team leaderboard is an indexed scan instead of a GROUP BY over users
+
+CREATE TABLE IF NOT EXISTS team_standings (
+    team VARCHAR(255) PRIMARY KEY,
+    member_count INTEGER NOT NULL,
+    avg_elo DOUBLE PRECISION NOT NULL,
+    top_elo DOUBLE PRECISION NOT NULL,
+    total_elo DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- One index per server-side sort order
+CREATE INDEX IF NOT EXISTS idx_team_standings_avg_elo ON team_standings(avg_elo DESC, team);
+CREATE INDEX IF NOT EXISTS idx_team_standings_total_elo ON team_standings(total_elo DESC, team);
+
+-- Backfill from the current users
+INSERT INTO team_standings (team, member_count, avg_elo, top_elo, total_elo, updated_at)
+SELECT team, COUNT(*), AVG(elo), MAX(elo), SUM(elo), NOW()
+FROM users
+WHERE team IS NOT NULL AND team != '' AND elo IS NOT NULL
+GROUP BY team
+ON CONFLICT (team) DO NOTHING;
+
+-- Add comment
+COMMENT ON TABLE team_standings IS 'Per-team ELO aggregates, maintained on user and PR writes (repair: python -m services.standings teams)';
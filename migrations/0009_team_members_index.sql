@@ -0,0 +1,5 @@
+-- migrate: no-transaction
+-- Keyset index for paginated team member lists (team, then ELO descending)
+-- and for recomputing one team's aggregates without scanning all users
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_team_elo ON users(team, elo DESC, username DESC);
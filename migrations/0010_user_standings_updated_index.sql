@@ -0,0 +1,5 @@
+-- migrate: no-transaction
+-- Lets each worker's in-memory rank index (services/ranks.py) pick up recently
+-- changed standings with an index range scan instead of re-reading the table
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_standings_updated_at ON user_standings(updated_at);
@@ -0,0 +1,31 @@
+-- Create video processing jobs table
+-- Uploaded videos are queued here in the same transaction as their PR and processed
+-- by the transcoding worker (python -m services.transcoder), off the request threads
+
+ALTER TABLE prs ADD COLUMN IF NOT EXISTS poster_url TEXT;
+ALTER TABLE prs ADD COLUMN IF NOT EXISTS thumbnail_url TEXT;
+
+CREATE TABLE IF NOT EXISTS video_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    pr_id INTEGER NOT NULL,
+    source_path TEXT NOT NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    locked_until TIMESTAMP,
+    last_error TEXT,
+    duration FLOAT,
+    created_at TIMESTAMP DEFAULT NOW(),
+    finished_at TIMESTAMP,
+    FOREIGN KEY (pr_id) REFERENCES prs(id) ON DELETE CASCADE,
+    CONSTRAINT check_video_jobs_status CHECK (status IN ('pending', 'processing', 'done', 'rejected', 'failed'))
+);
+
+-- Add indexes for the worker's "due jobs" scan and for stale (crashed) claims
+CREATE INDEX IF NOT EXISTS idx_video_jobs_due ON video_jobs(next_attempt_at) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_video_jobs_processing ON video_jobs(locked_until) WHERE status = 'processing';
+CREATE INDEX IF NOT EXISTS idx_video_jobs_pr ON video_jobs(pr_id);
+
+-- Add comment
+COMMENT ON TABLE video_jobs IS 'Video transcoding/thumbnail jobs, processed by services/transcoder.py';
+COMMENT ON COLUMN video_jobs.locked_until IS 'Claim lease; a processing job past it is picked up again';
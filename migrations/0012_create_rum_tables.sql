@@ -0,0 +1,36 @@
+-- Create real-user-monitoring tables
+-- Raw beacon samples are appended in batches by services/rum.py and rolled up hourly
+-- into per-page / per-endpoint percentiles; raw rows are pruned after the retention window
+
+CREATE TABLE IF NOT EXISTS rum_events (
+    recorded_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    page VARCHAR(100) NOT NULL,
+    metric VARCHAR(20) NOT NULL,
+    name VARCHAR(100) NOT NULL DEFAULT '',
+    value REAL NOT NULL,
+    device VARCHAR(10) NOT NULL,
+    connection VARCHAR(10),
+    status SMALLINT
+);
+
+-- Append-only and time-ordered: a BRIN index stays tiny and serves the rollup's time range scans
+CREATE INDEX IF NOT EXISTS idx_rum_events_recorded_at ON rum_events USING BRIN (recorded_at);
+
+CREATE TABLE IF NOT EXISTS rum_rollups (
+    bucket TIMESTAMPTZ NOT NULL,
+    page VARCHAR(100) NOT NULL,
+    metric VARCHAR(20) NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    device VARCHAR(10) NOT NULL,
+    samples INTEGER NOT NULL,
+    p50 REAL NOT NULL,
+    p75 REAL NOT NULL,
+    p95 REAL NOT NULL,
+    p99 REAL NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (bucket, page, metric, name, device)
+);
+
+-- Add comment
+COMMENT ON TABLE rum_events IS 'Raw real-user performance samples from static/src/performance-monitor.js (POST /api/rum)';
+COMMENT ON TABLE rum_rollups IS 'Hourly percentiles of rum_events (python -m services.rum rollup)';
@@ -0,0 +1,12 @@
+-- Keep the original upload of a processed video for a while
+-- Web workers may still serve cached feed/profile JSON linking to it; the transcoding
+-- worker (services/transcoder.py) deletes it once delete_original_after has passed
+
+ALTER TABLE video_jobs ADD COLUMN IF NOT EXISTS delete_original_after TIMESTAMP;
+
+-- Add index for the worker's sweep of expired originals
+CREATE INDEX IF NOT EXISTS idx_video_jobs_delete_original ON video_jobs(delete_original_after)
+WHERE delete_original_after IS NOT NULL;
+
+-- Add comment
+COMMENT ON COLUMN video_jobs.delete_original_after IS 'When the original upload (source_path) may be deleted';
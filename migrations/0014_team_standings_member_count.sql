@@ -0,0 +1,12 @@
+-- Recount team_standings members
+-- member_count now includes members without an ELO, as the team leaderboard did before
+-- team_standings existed; recompute every row with the same aggregates as services/standings.py
+
+DELETE FROM team_standings;
+
+INSERT INTO team_standings (team, member_count, avg_elo, top_elo, total_elo, updated_at)
+SELECT team, COUNT(*), AVG(elo), MAX(elo), SUM(elo), NOW()
+FROM users
+WHERE team IS NOT NULL AND team != ''
+GROUP BY team
+HAVING COUNT(elo) > 0;
@@ -0,0 +1,14 @@
+-- Create user standings removals table
+-- One row per user dropped from user_standings (no longer eligible, renamed or rebuilt away),
+-- so the in-memory rank index (services/ranks.py) can remove them in its incremental sync
+
+CREATE TABLE IF NOT EXISTS user_standings_removals (
+    username VARCHAR(255) NOT NULL,
+    removed_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Add index for the rank index's "removed since" scan and for pruning
+CREATE INDEX IF NOT EXISTS idx_user_standings_removals_removed_at ON user_standings_removals(removed_at);
+
+-- Add comment
+COMMENT ON TABLE user_standings_removals IS 'Tombstones for user_standings rows, pruned after a day (rank indexes fully reload well within that)';
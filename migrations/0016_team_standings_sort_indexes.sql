@@ -0,0 +1,5 @@
+-- Indexes for the team leaderboard's top ELO and member count sort orders,
+-- alongside the avg_elo and total_elo ones from 0008
+
+CREATE INDEX IF NOT EXISTS idx_team_standings_top_elo ON team_standings(top_elo DESC, team);
+CREATE INDEX IF NOT EXISTS idx_team_standings_member_count ON team_standings(member_count DESC, team);
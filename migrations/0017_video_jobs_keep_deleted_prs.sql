@@ -0,0 +1,12 @@
+-- Keep video jobs when their PR is deleted
+-- The job row holds delete_original_after, so with ON DELETE CASCADE an original upload
+-- still inside its retention window was never swept. The sweep works from the job alone.
+
+ALTER TABLE video_jobs ALTER COLUMN pr_id DROP NOT NULL;
+
+ALTER TABLE video_jobs
+    DROP CONSTRAINT IF EXISTS video_jobs_pr_id_fkey,
+    ADD CONSTRAINT video_jobs_pr_id_fkey FOREIGN KEY (pr_id) REFERENCES prs(id) ON DELETE SET NULL;
+
+-- Add comment
+COMMENT ON COLUMN video_jobs.pr_id IS 'NULL once the PR is deleted; the job is kept until its original is swept';
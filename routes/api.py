@@ -1,127 +1,43 @@
-from flask import Blueprint, request, jsonify, current_app, render_template
+from flask import Blueprint, request, jsonify, current_app, render_template, Response
 from werkzeug.utils import secure_filename
-from services.supabase import get_db_connection, calculate_elo
-from flask_mail import Message
+from services.supabase import get_db_connection, calculate_elo, get_pool_stats
+from services.leaderboard import fetch_leaderboard
+from services.ranks import get_rank_index, get_rank_index_stats, RANK_WINDOW, RANK_MAX_WINDOW, RANK_BULK_MAX_USERS
+from services.pagination import (
+    parse_page_args, decode_cursor, keyset_page, paginated_response, InvalidCursor
+)
+from services.feeds import (
+    FEED_PAGE_SIZE, FEED_MAX_PAGE_SIZE, VIDEO_FEED_WHERE, TEAM_PAGE_SIZE, TEAM_MAX_PAGE_SIZE,
+    TEAM_MEMBERS_PAGE_SIZE, TEAM_MEMBERS_MAX_PAGE_SIZE, TEAM_SORT_COLUMNS,
+    feed_query, team_leaderboard_query, team_members_query, team_member_cursor, decode_team_member_cursor
+)
+from services.standings import refresh_user_standings, refresh_team_standings
+from services.cache import cached_response, invalidate, get_cache_stats
+from services.exports import export_stream, EXPORT_QUERIES, EXPORT_FORMATS
+from services.passwords import hash_password, verify_password, rehash_if_needed, get_hasher_stats, PasswordHasherBusy
+from services.mailer import enqueue_email, wake_sender
+from services.media import serve_media, UPLOAD_DIR
+from services.transcoder import save_upload, enqueue_video_job, delete_uploads, upload_url, VideoRejected
+from services.migrations import run_migrations
+from services.profiles import fetch_profile, profile_namespace, invalidate_profiles, PROFILE_CACHE_TTL
+from services.query_profiler import get_profiler
+from services.pr_import import import_prs, parse_csv, parse_json, ImportFormatError
+from services.rum import get_rum_buffer, get_rum_stats, parse_beacon, fetch_rum_report, RUM_MAX_BYTES
+from services.warmup import get_warmup_stats
+from services.progress import fetch_progress, PROGRESS_DEFAULT_POINTS, PROGRESS_MAX_POINTS, PROGRESS_MIN_POINTS
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from functools import wraps
+from itertools import chain
+import json
 import os
 import uuid
-import bcrypt
-from datetime import datetime
+from datetime import datetime, timezone
 import secrets
 import hashlib
-
-# DOTS Formula Constants
-DOTS_MEN = {
-    'a': 47.46178854,
-    'b': 8.472061379,
-    'c': 0.07369410346,
-    'd': -0.001395833811,
-    'e': 0.000007076659730
-}
-
-DOTS_WOMEN = {
-    'a': -125.4255398,
-    'b': 13.71219419,
-    'c': -0.03307250631,
-    'd': 0.0003872554572,
-    'e': -0.00000113708316
-}
-
-def calculate_dots_score(total_lifted, bodyweight, gender):
-    """
-    Calculate DOTS score based on total lifted weight, bodyweight, and gender
-    
-    Args:
-        total_lifted (float): Total weight lifted (bench + squat + deadlift) in kg
-        bodyweight (float): User's bodyweight in kg
-        gender (str): 'male' or 'female'
-    
-    Returns:
-        float: DOTS score
-    """
-    if not bodyweight or bodyweight <= 0:
-        return 0
-    
-    constants = DOTS_MEN if gender == 'male' else DOTS_WOMEN
-    
-    # DOTS formula: 500 * total_lifted / (a + b*W + c*W^2 + d*W^3 + e*W^4)
-    denominator = (constants['a'] + 
-                  constants['b'] * bodyweight + 
-                  constants['c'] * (bodyweight ** 2) + 
-                  constants['d'] * (bodyweight ** 3) + 
-                  constants['e'] * (bodyweight ** 4))
-    
-    dots_score = 500 * total_lifted / denominator
-    return round(dots_score, 2)
-
-def get_user_total_lifts(username):
-    """
-    Get the best lift for each type (bench, squat, deadlift) for a user
-    
-    Returns:
-        dict: {'bench': weight, 'squat': weight, 'deadlift': weight, 'total': total}
-    """
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT lift_type, MAX(weight) as max_weight
-                FROM prs 
-                WHERE username = %s
-                GROUP BY lift_type
-            """, (username,))
-            
-            lifts = cur.fetchall()
-            lift_data = {'bench': 0, 'squat': 0, 'deadlift': 0}
-            
-            for lift in lifts:
-                lift_data[lift['lift_type']] = float(lift['max_weight'])
-            
-            lift_data['total'] = lift_data['bench'] + lift_data['squat'] + lift_data['deadlift']
-            return lift_data
-    finally:
-        conn.close()
+import hmac
 
 api_blueprint = Blueprint('api', __name__)
 
-def create_performance_indexes():
-    """Create database indexes for better query performance"""
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            # Create indexes for better leaderboard performance
-            indexes = [
-                "CREATE INDEX IF NOT EXISTS idx_users_weight_gender ON users(weight, gender)",
-                "CREATE INDEX IF NOT EXISTS idx_users_team_active ON users(team, is_active)", 
-                "CREATE INDEX IF NOT EXISTS idx_prs_username_lift ON prs(username, lift_type)",
-                "CREATE INDEX IF NOT EXISTS idx_prs_weight ON prs(weight)",
-                "CREATE INDEX IF NOT EXISTS idx_prs_created_at ON prs(created_at)"
-            ]
-            
-            for index_sql in indexes:
-                try:
-                    cur.execute(index_sql)
-                    print(f"✓ Index created: {index_sql}")
-                except Exception as e:
-                    print(f"⚠ Index creation warning: {e}")
-            
-            conn.commit()
-            print("Database indexes optimization completed")
-    except Exception as e:
-        print(f"Error creating indexes: {e}")
-    finally:
-        conn.close()
-
-@api_blueprint.route('/api/init_db', methods=['POST'])
-def init_database():
-    """Initialize database with performance indexes - admin only"""
-    try:
-        create_performance_indexes()
-        return jsonify({'message': 'Database indexes created successfully'}), 200
-    except Exception as e:
-        return jsonify({'error': f'Failed to initialize database: {str(e)}'}), 500
-
 def auth_required(f):
     """
     Decorator to require JWT authentication and verify user owns the resource
@@ -147,6 +63,109 @@ def auth_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def hasher_busy_response():
+    """503 returned when the password hashing pool is saturated"""
+    response = jsonify({'error': 'Server is busy, please try again shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+def admin_required(f):
+    """
+    Decorator to restrict operational endpoints to holders of ADMIN_API_TOKEN,
+    sent in the X-Admin-Token header. Disabled entirely when the token is unset.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        expected = os.getenv('ADMIN_API_TOKEN')
+        provided = request.headers.get('X-Admin-Token', '')
+        if not expected or not hmac.compare_digest(provided.encode('utf-8'), expected.encode('utf-8')):
+            return jsonify({'error': 'Unauthorized'}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
+@api_blueprint.route('/api/init_db', methods=['POST'])
+@admin_required
+def init_database():
+    """Apply pending schema migrations - admin only"""
+    try:
+        applied = run_migrations()
+        return jsonify({'message': 'Database schema is up to date', 'applied': applied}), 200
+    except Exception as e:
+        return jsonify({'error': f'Failed to migrate database: {str(e)}'}), 500
+
+@api_blueprint.route('/api/admin/slow_queries', methods=['GET', 'DELETE'])
+@admin_required
+def slow_queries():
+    """This worker's statement timings, slow-query log and captured plans - admin only"""
+    profiler = get_profiler()
+    if request.method == 'DELETE':
+        profiler.reset()
+        return jsonify({'message': 'Query profile reset', 'pid': os.getpid()}), 200
+    return jsonify(profiler.report())
+
+@api_blueprint.route('/api/admin/stats', methods=['GET'])
+@admin_required
+def worker_stats():
+    """This worker's DB pool, cache, hashing, rank index, RUM and warm-up statistics - admin only"""
+    return jsonify({
+        'pid': os.getpid(),
+        'db_pool': get_pool_stats(),
+        'cache': get_cache_stats(),
+        'password_hashing': get_hasher_stats(),
+        'rank_index': get_rank_index_stats(),
+        'rum': get_rum_stats(),
+        'warmup': get_warmup_stats(),
+    })
+
+@api_blueprint.route('/api/admin/prs/import', methods=['POST'])
+@admin_required
+def bulk_import_prs():
+    """Import a CSV or JSON batch of PRs in one transaction - admin only (?dry_run=1&strict=1)"""
+    upload = request.files.get('file')
+    try:
+        if upload:
+            text = upload.read().decode('utf-8-sig')
+            rows = parse_json(json.loads(text)) if (upload.filename or '').endswith('.json') else parse_csv(text)
+        elif request.is_json:
+            rows = parse_json(request.get_json())
+        else:
+            rows = parse_csv(request.get_data(as_text=True))
+        report = import_prs(rows, dry_run=request.args.get('dry_run') == '1', strict=request.args.get('strict') == '1')
+    except (ImportFormatError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"PR import error: {str(e)}")
+        return jsonify({'error': 'Import failed'}), 500
+    
+    return jsonify(report), 200
+
+@api_blueprint.route('/api/rum', methods=['POST'])
+def ingest_rum():
+    """Accept a batch of real-user performance samples (static/src/performance-monitor.js)"""
+    if (request.content_length or 0) > RUM_MAX_BYTES:
+        return jsonify({'error': 'Beacon too large'}), 413
+    # sendBeacon may post JSON as text/plain to avoid a CORS preflight
+    payload = request.get_json(force=True, silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Invalid beacon'}), 400
+    
+    get_rum_buffer().add(parse_beacon(payload))
+    return '', 204
+
+@api_blueprint.route('/api/admin/rum', methods=['GET'])
+@admin_required
+def rum_report():
+    """Hourly real-user percentiles per page, metric and endpoint - admin only (?hours=&page=&device=)"""
+    try:
+        hours = max(1, min(int(request.args.get('hours', 24)), 24 * 90))
+    except ValueError:
+        hours = 24
+    try:
+        rows = fetch_rum_report(hours, request.args.get('page'), request.args.get('device'))
+    except Exception as e:
+        return jsonify({'error': f'Failed to load RUM report: {str(e)}'}), 500
+    return jsonify([dict(row) for row in rows])
+
 @api_blueprint.route('/api/register', methods=['POST'])
 def register_user():
     data = request.json
@@ -163,7 +182,10 @@ def register_user():
         return jsonify({'error': 'Username, password, email, flag, and gender are required'}), 400
     
     # Hash password
-    password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    try:
+        password_hash = hash_password(password)
+    except PasswordHasherBusy:
+        return hasher_busy_response()
     
     conn = get_db_connection()
     try:
@@ -184,7 +206,11 @@ def register_user():
             """, (username, password_hash, email, display_name, flag, team, gender))
             
             user = cur.fetchone()
+            
+            # New members change team counts and averages
+            refresh_team_standings(cur, teams=[team])
             conn.commit()
+            invalidate('teams')
             return jsonify(dict(user)), 201
     except Exception as e:
         return jsonify({'error': 'Registration failed'}), 500
@@ -209,16 +235,29 @@ def login_user():
             """, (username,))
             user = cur.fetchone()
             
+            # End the read transaction so none is open while bcrypt runs
+            conn.commit()
+            
             if not user:
                 return jsonify({'error': 'Invalid username or password'}), 401
             
             # Verify password
-            if not bcrypt.checkpw(password.encode('utf-8'), user['password_hash'].encode('utf-8')):
+            if not verify_password(password, user['password_hash']):
                 return jsonify({'error': 'Invalid username or password'}), 401
             
+            # Upgrade the stored hash if the configured work factor changed;
+            # a saturated pool just postpones it to a later login
+            try:
+                new_hash = rehash_if_needed(password, user['password_hash'])
+            except PasswordHasherBusy:
+                new_hash = None
+            
             # Update last login
             cur.execute("UPDATE users SET last_login = %s WHERE username = %s", 
                        (datetime.now(), username))
+            if new_hash:
+                cur.execute("UPDATE users SET password_hash = %s WHERE username = %s", (new_hash, username))
+            
             conn.commit()
             
             # Create JWT token
@@ -230,6 +269,8 @@ def login_user():
             user_data['access_token'] = access_token
             return jsonify(user_data), 200
             
+    except PasswordHasherBusy:
+        return hasher_busy_response()
     except Exception as e:
         print(f"Login error: {str(e)}")
         return jsonify({'error': 'Login failed'}), 500
@@ -238,75 +279,43 @@ def login_user():
 
 
 @api_blueprint.route('/api/leaderboard', methods=['GET'])
+@cached_response('leaderboard', ttl=300)
 def leaderboard():
     gender_filter = request.args.get('gender')  # Optional filter for gender
     country_filter = request.args.get('country')  # Optional filter for country (flag)
+    limit, offset = parse_page_args(request.args)
     
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            # Get users with weight and gender for DOTS calculation
-            query = """
-                SELECT username, display_name, email, flag, team, weight, gender, elo, created_at 
-                FROM users 
-                WHERE weight IS NOT NULL AND weight > 0 AND gender IS NOT NULL
-            """
-            params = []
-            
-            if gender_filter in ['male', 'female']:
-                query += " AND gender = %s"
-                params.append(gender_filter)
-            
-            if country_filter:
-                query += " AND flag = %s"
-                params.append(country_filter)
-            
-            cur.execute(query, tuple(params))
-            users = cur.fetchall()
-            
-            # Calculate DOTS scores for each user
-            leaderboard_data = []
-            for user in users:
-                user_dict = dict(user)
-                lift_data = get_user_total_lifts(user['username'])
-                
-                if lift_data['total'] > 0:  # Only include users with actual lifts
-                    dots_score = calculate_dots_score(
-                        lift_data['total'], 
-                        user['weight'], 
-                        user['gender']
-                    )
-                    
-                    user_dict['dots_score'] = dots_score
-                    user_dict['total_lifted'] = lift_data['total']
-                    user_dict['bench'] = lift_data['bench']
-                    user_dict['squat'] = lift_data['squat']
-                    user_dict['deadlift'] = lift_data['deadlift']
-                    
-                    leaderboard_data.append(user_dict)
-            
-            # Sort by DOTS score (descending) and limit to top 50
-            leaderboard_data.sort(key=lambda x: x['dots_score'], reverse=True)
-            return jsonify(leaderboard_data[:50])
-            
-    finally:
-        conn.close()
+    # Best lifts, totals, DOTS scores and ranking are all computed in one query
+    return jsonify(fetch_leaderboard(gender_filter, country_filter, limit, offset))
+
+def rank_segment_args():
+    """(gender, country) segment from the query string, matching the leaderboard filters"""
+    gender = request.args.get('gender')
+    return (gender if gender in ['male', 'female'] else None), (request.args.get('country') or None)
 
-def validate_video_file(file_path):
+@api_blueprint.route('/api/rank/<username>', methods=['GET'])
+def user_rank(username):
+    """A user's leaderboard rank in a segment plus the lifters around them"""
+    gender, country = rank_segment_args()
     try:
-        # Check file size (rough estimate: 30 seconds of video should be under 50MB)
-        file_size = os.path.getsize(file_path)
-        max_size = 50 * 1024 * 1024  # 50MB
-        
-        if file_size > max_size:
-            print(f"File too large: {file_size} bytes (max: {max_size})")
-            return False
-            
-        print(f"Video file size: {file_size} bytes - OK")
-        return True
-    except Exception as e:
-        print(f"Error validating video file: {e}")
-        return False
+        window = max(0, min(int(request.args.get('window', RANK_WINDOW)), RANK_MAX_WINDOW))
+    except ValueError:
+        window = RANK_WINDOW
+    
+    result = get_rank_index().neighbourhood(username, gender, country, window)
+    if result is None:
+        return jsonify({'error': 'User is not ranked in this leaderboard'}), 404
+    return jsonify(result)
+
+@api_blueprint.route('/api/ranks', methods=['GET'])
+def user_ranks():
+    """Overall, gender, country and gender+country ranks for up to 100 users (?usernames=a,b,c)"""
+    usernames = [name for name in request.args.get('usernames', '').split(',') if name]
+    if not usernames:
+        return jsonify({'error': 'usernames is required'}), 400
+    if len(usernames) > RANK_BULK_MAX_USERS:
+        return jsonify({'error': f'At most {RANK_BULK_MAX_USERS} usernames per request'}), 400
+    return jsonify(get_rank_index().badges(usernames))
 
 @api_blueprint.route('/api/submit_pr', methods=['POST'])
 @auth_required
@@ -315,14 +324,24 @@ def submit_pr():
     lift_type = request.form.get('lift_type')
     weight = request.form.get('weight')
     instagram_url = request.form.get('instagram_url')
+    video = request.files.get('video')
     
-    if not all([username, lift_type, weight, instagram_url]):
+    if not all([username, lift_type, weight]) or not (instagram_url or video):
         return jsonify({'error': 'Missing required fields'}), 400
     
     # Validate Instagram URL
-    if 'instagram.com' not in instagram_url:
+    if instagram_url and 'instagram.com' not in instagram_url:
         return jsonify({'error': 'Invalid Instagram URL'}), 400
     
+    # Uploaded videos are stored as-is and transcoded later by the video worker
+    source_path = None
+    if video:
+        try:
+            source_path = save_upload(video)
+        except VideoRejected as e:
+            return jsonify({'error': str(e)}), 400
+    video_url = upload_url(source_path) if source_path else instagram_url
+    
     # Save to database
     conn = get_db_connection()
     try:
@@ -330,100 +349,140 @@ def submit_pr():
             cur.execute("""
                 INSERT INTO prs (username, lift_type, weight, video_url) 
                 VALUES (%s, %s, %s, %s) RETURNING id
-            """, (username, lift_type, float(weight), instagram_url))
+            """, (username, lift_type, float(weight), video_url))
             
             pr_id = cur.fetchone()['id']
-            conn.commit()
+            video_job_id = enqueue_video_job(cur, pr_id, source_path) if source_path else None
             
-            # Update ELO
-            calculate_elo(username)
+            # Update ELO and standings in the same transaction as the PR
+            calculate_elo(username, cur)
+            refresh_user_standings(cur, [username])
+            refresh_team_standings(cur, usernames=[username])
+            conn.commit()
+            invalidate('leaderboard', 'videos', 'teams')
+            invalidate_profiles(username)
             
             return jsonify({
                 'message': 'PR submitted successfully',
                 'pr_id': pr_id,
-                'instagram_url': instagram_url
+                'instagram_url': instagram_url,
+                'video_url': video_url,
+                'video_job_id': video_job_id
             }), 201
     except Exception as e:
+        if source_path:
+            delete_uploads(upload_url(source_path))
         return jsonify({'error': 'Database error'}), 500
     finally:
         conn.close()
 
-@api_blueprint.route('/api/videos', methods=['GET'])
-def get_videos():
+def fetch_feed_page(where, params):
+    """
+    Fetch one keyset-paginated page of PRs, newest first
+
+    Reads ``limit`` and ``cursor`` from the query string and walks the
+    (created_at, id) index from the cursor position, so every page costs
+    the same no matter how deep it is.
+
+    Returns:
+        Response: JSON list of posts with X-Next-Cursor / Link headers
+    """
+    limit, _ = parse_page_args(request.args, FEED_PAGE_SIZE, FEED_MAX_PAGE_SIZE)
+    try:
+        cursor = decode_cursor(request.args.get('cursor'))
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT p.*, u.flag, u.team, u.elo 
-                FROM prs p 
-                JOIN users u ON p.username = u.username 
-                WHERE p.video_url IS NOT NULL AND p.video_url != '' 
-                ORDER BY p.created_at DESC
-            """)
-            videos = cur.fetchall()
-            return jsonify([dict(video) for video in videos])
+            cur.execute(*feed_query(where, params, cursor, limit))
+            rows = cur.fetchall()
     finally:
         conn.close()
+    
+    page, next_cursor = keyset_page(rows, limit)
+    return paginated_response(jsonify([dict(row) for row in page]), next_cursor)
+
+@api_blueprint.route('/api/videos', methods=['GET'])
+@cached_response('videos', ttl=60)
+def get_videos():
+    return fetch_feed_page(VIDEO_FEED_WHERE, ())
 
-@api_blueprint.route('/uploads/<filename>')
+@api_blueprint.route('/uploads/<path:filename>')
 def uploaded_file(filename):
-    from flask import send_from_directory, abort
-    import os
-    
-    upload_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
-    file_path = os.path.join(upload_dir, filename)
-    
-    # Check if file exists
-    if not os.path.exists(file_path):
-        print(f"File not found: {file_path}")
-        abort(404)
-    
-    print(f"Serving video file: {file_path}")
-    
-    # Set appropriate headers for video files
-    response = send_from_directory(upload_dir, filename)
-    response.headers['Content-Type'] = 'video/mp4'
-    response.headers['Accept-Ranges'] = 'bytes'
-    return response
+    """Serve an uploaded video with byte-range, If-Range and ETag support"""
+    return serve_media(UPLOAD_DIR, filename)
 
 @api_blueprint.route('/api/team_leaderboard', methods=['GET'])
+@cached_response('teams', ttl=300)
 def team_leaderboard():
+    """
+    One page of the team leaderboard
+
+    ``sort`` picks the order (see TEAM_SORT_COLUMNS) and ``q`` keeps only
+    teams whose name contains it; ``limit`` / ``offset`` page through the rest.
+    """
+    sort_column = TEAM_SORT_COLUMNS.get(request.args.get('sort', 'avg_elo'))
+    if not sort_column:
+        return jsonify({'error': 'Invalid sort, expected one of: ' + ', '.join(TEAM_SORT_COLUMNS)}), 400
+    limit, offset = parse_page_args(request.args, TEAM_PAGE_SIZE, TEAM_MAX_PAGE_SIZE)
+    
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT 
-                    team,
-                    COUNT(DISTINCT username) as member_count,
-                    AVG(elo) as avg_elo,
-                    MAX(elo) as top_elo,
-                    SUM(elo) as total_elo
-                FROM users 
-                WHERE team IS NOT NULL AND team != ''
-                GROUP BY team 
-                HAVING COUNT(DISTINCT username) > 0
-                ORDER BY avg_elo DESC
-            """)
+            cur.execute(*team_leaderboard_query(sort_column, request.args.get('q', '').strip(), limit, offset))
             teams = cur.fetchall()
             return jsonify([dict(team) for team in teams])
     finally:
         conn.close()
 
-@api_blueprint.route('/api/team_members/<team_name>', methods=['GET'])
-def team_members(team_name):
+@api_blueprint.route('/api/team/<team_name>', methods=['GET'])
+@cached_response('teams', ttl=300)
+def team_detail(team_name):
+    """Aggregates and average-ELO rank for one team"""
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
             cur.execute("""
-                SELECT username, display_name, flag, elo, team
-                FROM users 
-                WHERE team = %s 
-                ORDER BY elo DESC
+                SELECT t.team, t.member_count, t.avg_elo, t.top_elo, t.total_elo,
+                       (SELECT COUNT(*) FROM team_standings o
+                        WHERE (o.avg_elo, t.team) > (t.avg_elo, o.team)) + 1 AS rank
+                FROM team_standings t
+                WHERE t.team = %s
             """, (team_name,))
+            team = cur.fetchone()
+            if not team:
+                return jsonify({'error': 'Team not found'}), 404
+            return jsonify(dict(team))
+    finally:
+        conn.close()
+
+@api_blueprint.route('/api/team_members/<team_name>', methods=['GET'])
+@cached_response('teams', ttl=300)
+def team_members(team_name):
+    """
+    One keyset-paginated page of a team's members, highest ELO first and
+    members without an ELO last
+
+    Pass the ``X-Next-Cursor`` header of the previous page as ``cursor``.
+    """
+    limit, _ = parse_page_args(request.args, TEAM_MEMBERS_PAGE_SIZE, TEAM_MEMBERS_MAX_PAGE_SIZE)
+    try:
+        cursor = decode_team_member_cursor(request.args.get('cursor'))
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(*team_members_query(team_name, cursor, limit))
             members = cur.fetchall()
-            return jsonify([dict(member) for member in members])
     finally:
         conn.close()
+    
+    page, next_cursor = keyset_page(members, limit, team_member_cursor)
+    return paginated_response(jsonify([dict(member) for member in page]), next_cursor)
 
 @api_blueprint.route('/api/profile/update', methods=['PUT'])
 @auth_required
@@ -441,6 +500,11 @@ def update_profile():
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
+            # The old team loses a member if the user switches teams
+            cur.execute("SELECT team FROM users WHERE username = %s FOR UPDATE", (username,))
+            current = cur.fetchone()
+            old_team = current['team'] if current else None
+            
             # Check if new username already exists (if changing username)
             if username != new_username:
                 cur.execute("SELECT username FROM users WHERE username = %s", (new_username,))
@@ -463,10 +527,16 @@ def update_profile():
             if username != new_username:
                 cur.execute("UPDATE prs SET username = %s WHERE username = %s", (new_username, username))
             
-            conn.commit()
-            
             # Recalculate ELO for the user
-            calculate_elo(new_username)
+            calculate_elo(new_username, cur)
+            
+            # Weight/gender changes move the user's DOTS score and segment
+            refresh_user_standings(cur, [username, new_username])
+            refresh_team_standings(cur, teams=[old_team], usernames=[new_username])
+            
+            conn.commit()
+            invalidate('leaderboard', 'videos', 'teams')
+            invalidate_profiles(username, new_username)
             
             return jsonify(dict(user)), 200
     except Exception as e:
@@ -477,20 +547,7 @@ def update_profile():
 
 @api_blueprint.route('/api/user/<username>/posts', methods=['GET'])
 def get_user_posts(username):
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT p.*, u.flag, u.team, u.elo 
-                FROM prs p 
-                JOIN users u ON p.username = u.username 
-                WHERE p.username = %s 
-                ORDER BY p.created_at DESC
-            """, (username,))
-            posts = cur.fetchall()
-            return jsonify([dict(post) for post in posts])
-    finally:
-        conn.close()
+    return fetch_feed_page("p.username = %s", (username,))
 
 @api_blueprint.route('/api/posts/<int:post_id>', methods=['DELETE'])
 @auth_required
@@ -506,7 +563,7 @@ def delete_post(post_id):
         with conn.cursor() as cur:
             # Check if post exists and belongs to user
             cur.execute("""
-                SELECT id, video_url FROM prs 
+                SELECT id, video_url, poster_url, thumbnail_url FROM prs 
                 WHERE id = %s AND username = %s
             """, (post_id, username))
             post = cur.fetchone()
@@ -514,22 +571,27 @@ def delete_post(post_id):
             if not post:
                 return jsonify({'error': 'Post not found or not authorized'}), 404
             
-            # Delete the video file if it exists
-            if post['video_url']:
-                video_path = os.path.join(
-                    os.path.dirname(os.path.dirname(__file__)), 
-                    'uploads', 
-                    os.path.basename(post['video_url'])
-                )
-                if os.path.exists(video_path):
-                    os.remove(video_path)
+            # Unprocessed uploads are deleted below; processed originals are
+            # left to the transcoder's sweep_originals() (their job rows outlive the PR)
+            cur.execute("""
+                UPDATE video_jobs
+                SET status = 'failed', last_error = 'PR deleted', finished_at = NOW()
+                WHERE pr_id = %s AND status = 'pending'
+            """, (post_id,))
             
             # Delete the post
             cur.execute("DELETE FROM prs WHERE id = %s", (post_id,))
+            
+            # Recalculate ELO and standings in the same transaction
+            calculate_elo(username, cur)
+            refresh_user_standings(cur, [username])
+            refresh_team_standings(cur, usernames=[username])
             conn.commit()
             
-            # Recalculate ELO
-            calculate_elo(username)
+            # Remove the uploaded video and its poster/thumbnail once the delete is committed
+            delete_uploads(post['video_url'], post['poster_url'], post['thumbnail_url'])
+            invalidate('leaderboard', 'videos', 'teams')
+            invalidate_profiles(username)
             
             return jsonify({'message': 'Post deleted successfully'}), 200
     except Exception as e:
@@ -565,10 +627,14 @@ def edit_post(post_id):
             """, (lift_type, float(weight), post_id))
             
             post = cur.fetchone()
-            conn.commit()
             
-            # Recalculate ELO
-            calculate_elo(username)
+            # Recalculate ELO and standings in the same transaction
+            calculate_elo(username, cur)
+            refresh_user_standings(cur, [username])
+            refresh_team_standings(cur, usernames=[username])
+            conn.commit()
+            invalidate('leaderboard', 'videos', 'teams')
+            invalidate_profiles(username)
             
             return jsonify(dict(post)), 200
     except Exception as e:
@@ -577,123 +643,69 @@ def edit_post(post_id):
         conn.close()
 
 @api_blueprint.route('/api/user/<username>', methods=['GET'])
+@cached_response(profile_namespace, ttl=PROFILE_CACHE_TTL)
 def get_user_profile(username):
     """Get detailed user profile including PRs and videos"""
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cur:
-            # Get user basic info
-            cur.execute("""
-                SELECT username, display_name, email, flag, team, weight, gender, elo, created_at 
-                FROM users WHERE username = %s AND is_active = TRUE
-            """, (username,))
-            user = cur.fetchone()
-            
-            if not user:
-                return jsonify({'error': 'User not found'}), 404
-            
-            user_dict = dict(user)
-            
-            # Get user's PRs (get the record with max weight for each lift type)
-            cur.execute("""
-                SELECT DISTINCT ON (lift_type) lift_type, weight as max_weight, video_url, created_at
-                FROM prs 
-                WHERE username = %s 
-                ORDER BY lift_type, weight DESC, created_at DESC
-            """, (username,))
-            prs = cur.fetchall()
-            
-            # Get all user's PR history
-            cur.execute("""
-                SELECT id, lift_type, weight, video_url, created_at
-                FROM prs 
-                WHERE username = %s 
-                ORDER BY created_at DESC
-                LIMIT 20
-            """, (username,))
-            history = cur.fetchall()
-            
-            # Get user's videos
-            cur.execute("""
-                SELECT id, lift_type, weight, video_url, created_at
-                FROM prs 
-                WHERE username = %s AND video_url IS NOT NULL AND video_url != ''
-                ORDER BY created_at DESC
-                LIMIT 10
-            """, (username,))
-            videos = cur.fetchall()
-            
-            # Calculate DOTS score if user has all required data
-            dots_score = None
-            total_lifted = 0
-            current_prs = {'bench': 0, 'squat': 0, 'deadlift': 0}
-            
-            for pr in prs:
-                weight = pr['max_weight']
-                lift_type = pr['lift_type']
-                current_prs[lift_type] = weight
-                total_lifted += weight
-                print(f"Processing PR: {lift_type} = {weight}kg, running total = {total_lifted}kg")
-            
-            if user_dict['weight'] and user_dict['gender'] and all(current_prs.values()):
-                dots_score = calculate_dots_score(
-                    total_lifted, 
-                    user_dict['weight'], 
-                    user_dict['gender']
-                )
-            
-            return jsonify({
-                'user': user_dict,
-                'prs': [dict(pr) for pr in prs],
-                'history': [dict(record) for record in history],
-                'videos': [dict(video) for video in videos],
-                'dots_score': dots_score,
-                'total_lifted': total_lifted,
-                'current_prs': current_prs
-            })
-            
+        profile = fetch_profile(username)
     except Exception as e:
         return jsonify({'error': f'Failed to get user profile: {str(e)}'}), 500
-    finally:
-        conn.close()
+    
+    if not profile:
+        return jsonify({'error': 'User not found'}), 404
+    
+    return jsonify(profile)
+
+def parse_date_arg(name):
+    """Optional ISO 8601 date/datetime query parameter (naive values are UTC)"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
 
 @api_blueprint.route('/api/user/<username>/progress', methods=['GET'])
+@cached_response(profile_namespace, ttl=PROFILE_CACHE_TTL)
 def get_user_progress(username):
-    """Get user's progress data for charts"""
-    conn = get_db_connection()
+    """Get user's progress data for charts (?from=&to=&max_points=, downsampled per lift)"""
     try:
-        with conn.cursor() as cur:
-            # Check if user exists
-            cur.execute("SELECT username FROM users WHERE username = %s AND is_active = TRUE", (username,))
-            if not cur.fetchone():
-                return jsonify({'error': 'User not found'}), 404
-            
-            # Get progress data for each lift type
-            progress_data = {}
-            
-            for lift_type in ['bench', 'squat', 'deadlift']:
-                cur.execute("""
-                    SELECT weight, created_at
-                    FROM prs 
-                    WHERE username = %s AND lift_type = %s
-                    ORDER BY created_at ASC
-                """, (username, lift_type))
-                
-                records = cur.fetchall()
-                progress_data[lift_type] = [
-                    {
-                        'weight': record['weight'],
-                        'date': record['created_at'].isoformat() if record['created_at'] else None
-                    }
-                    for record in records
-                ]
-            
-            return jsonify(progress_data)
-            
+        start, end = parse_date_arg('from'), parse_date_arg('to')
+    except ValueError:
+        return jsonify({'error': 'from/to must be ISO 8601 dates'}), 400
+    try:
+        max_points = max(PROGRESS_MIN_POINTS, min(int(request.args.get('max_points', PROGRESS_DEFAULT_POINTS)), PROGRESS_MAX_POINTS))
+    except ValueError:
+        max_points = PROGRESS_DEFAULT_POINTS
+    
+    try:
+        progress_data = fetch_progress(username, start, end, max_points)
     except Exception as e:
         return jsonify({'error': f'Failed to get user progress: {str(e)}'}), 500
-    finally:
-        conn.close()
+    
+    if progress_data is None:
+        return jsonify({'error': 'User not found'}), 404
+    return jsonify(progress_data)
+
+@api_blueprint.route('/api/export/<dataset>.<fmt>', methods=['GET'])
+@admin_required
+def export_dataset(dataset, fmt):
+    """Stream a full dataset (prs, users, leaderboard) as NDJSON or CSV"""
+    if dataset not in EXPORT_QUERIES or fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'Unknown export'}), 404
+    
+    chunks = export_stream(dataset, fmt, request.args.get('gender'), request.args.get('country'))
+    try:
+        # Run the query now so failures still get a proper error status
+        first_chunk = next(chunks, '')
+    except Exception as e:
+        print(f"Export error: {str(e)}")
+        return jsonify({'error': 'Export failed'}), 500
+    
+    return Response(
+        chain([first_chunk], chunks),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={dataset}.{fmt}'}
+    )
 
 @api_blueprint.route('/api/forgot-password', methods=['POST'])
 def forgot_password():
@@ -723,17 +735,6 @@ def forgot_password():
                 reset_token = secrets.token_urlsafe(32)
                 token_hash = hashlib.sha256(reset_token.encode()).hexdigest()
                 
-                # Ensure password_reset_tokens table exists
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS password_reset_tokens (
-                        id SERIAL PRIMARY KEY,
-                        username VARCHAR(255) UNIQUE NOT NULL,
-                        token_hash VARCHAR(255) NOT NULL,
-                        expires_at TIMESTAMP NOT NULL,
-                        created_at TIMESTAMP DEFAULT NOW()
-                    )
-                """)
-                
                 # Store reset token (expires in 1 hour) - use the username from database
                 username = user['username']
                 cur.execute("""
@@ -746,39 +747,22 @@ def forgot_password():
                         created_at = EXCLUDED.created_at
                 """, (username, token_hash))
                 
-                conn.commit()
+                # Determine the base URL (use environment variable or default)
+                base_url = os.getenv('BASE_URL', 'http://localhost:5000')
+                reset_url = f"{base_url}/reset-password.html?token={reset_token}"
                 
-                # Send email with reset link
-                try:
-                    from app import mail
-                    
-                    # Validate email exists
-                    email = user.get('email')
-                    if not email:
-                        print(f"No email address found for user: {username}")
-                        return jsonify({'message': 'If your username or email exists, you will receive reset instructions.'}), 200
-                    
-                    # Determine the base URL (use environment variable or default)
-                    base_url = os.getenv('BASE_URL', 'http://localhost:5000')
-                    reset_url = f"{base_url}/reset-password.html?token={reset_token}"
-                    
-                    # Create email message
-                    msg = Message(
-                        subject="Reset Your GymRank Password",
-                        recipients=[email],
-                        html=render_template('password_reset_email.html', 
-                                           username=username, 
-                                           reset_url=reset_url)
-                    )
-                    
-                    # Send the email
-                    mail.send(msg)
-                    print(f"Password reset email sent to {email} for user: {username}")
-                    
-                except Exception as email_error:
-                    print(f"Failed to send email: {email_error}")
-                    print(f"User data: {user}")
-                    # Still return success to not reveal if user exists
+                # Queue the email with the token; the outbox sender delivers it after commit
+                enqueue_email(
+                    cur,
+                    user['email'],
+                    "Reset Your GymRank Password",
+                    render_template('password_reset_email.html', 
+                                    username=username, 
+                                    reset_url=reset_url)
+                )
+                
+                conn.commit()
+                wake_sender()
                 
                 return jsonify({'message': 'If your username or email exists, you will receive reset instructions.'}), 200
                 
@@ -808,6 +792,12 @@ def reset_password():
         
         token_hash = hashlib.sha256(token.encode()).hexdigest()
         
+        # Hash before checking out a connection, so no transaction is open during bcrypt
+        try:
+            password_hash = hash_password(new_password)
+        except PasswordHasherBusy:
+            return hasher_busy_response()
+        
         conn = get_db_connection()
         try:
             with conn.cursor() as cur:
@@ -823,9 +813,6 @@ def reset_password():
                 
                 username = result['username']
                 
-                # Hash new password
-                password_hash = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-                
                 # Update password
                 cur.execute("UPDATE users SET password_hash = %s WHERE username = %s", (password_hash, username))
                 
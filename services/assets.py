@@ -0,0 +1,236 @@
+"""
+Precompressed, content-hashed static assets
+
+``python -m services.assets build`` copies ``static/`` into the build
+directory, renaming every CSS/JS/image/font file to ``name.<hash>.ext`` and
+rewriting the references to it in HTML, CSS and JS. Every text file gets
+``.gz`` (and, with the optional ``brotli`` package, ``.br``) siblings. A
+``manifest.json`` maps the original paths to the hashed ones.
+
+At request time ``serve_asset`` picks the smallest encoding the client
+accepts. Hashed files are cached for a year as ``immutable``; HTML and
+other entry points (and the original un-hashed paths) are revalidated
+against a strong, content-derived ETag. Without a build the app serves
+``static/`` as before.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import sys
+import threading
+
+from flask import request, send_file
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATIC_DIR = os.path.join(ROOT_DIR, 'static')
+BUILD_DIR = os.getenv('STATIC_BUILD_DIR', os.path.join(ROOT_DIR, 'build', 'static'))
+MANIFEST_NAME = 'manifest.json'
+
+# Renamed to name.<hash>.ext; everything else (HTML, the service worker) keeps its URL
+HASHED_EXTENSIONS = {'.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico', '.webp',
+                     '.woff', '.woff2', '.ttf'}
+# Service workers must be served from a stable URL
+UNHASHED_FILES = {'sw.js'}
+# Files whose references to other assets are rewritten
+TEXT_EXTENSIONS = {'.html', '.css', '.js'}
+COMPRESSIBLE_EXTENSIONS = {'.html', '.css', '.js', '.svg', '.json', '.txt', '.xml'}
+# Build inputs that are never served
+EXCLUDED = {'node_modules', 'package.json', 'package-lock.json', 'tailwind.config.js', 'src/input.css'}
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# Served encodings in order of preference, with their file suffix
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+HASH_LENGTH = 12
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+def hashed_name(path, digest):
+    base, ext = os.path.splitext(path)
+    return f"{base}.{digest[:HASH_LENGTH]}{ext}"
+
+def collect_files(static_dir=STATIC_DIR):
+    """Relative, '/'-separated paths of every servable file under ``static_dir``"""
+    files = []
+    for dirpath, dirnames, filenames in os.walk(static_dir):
+        rel_dir = os.path.relpath(dirpath, static_dir).replace(os.sep, '/')
+        rel_dir = '' if rel_dir == '.' else rel_dir + '/'
+        dirnames[:] = sorted(d for d in dirnames if rel_dir + d not in EXCLUDED)
+        for filename in sorted(filenames):
+            path = rel_dir + filename
+            if path not in EXCLUDED:
+                files.append(path)
+    return files
+
+def build_order(path):
+    """Leaves first, so a file's references are hashed before the file itself is"""
+    ext = os.path.splitext(path)[1].lower()
+    if path in UNHASHED_FILES or ext not in HASHED_EXTENSIONS:
+        return 3
+    if ext == '.js':
+        return 2
+    if ext == '.css':
+        return 1
+    return 0
+
+def rewrite_references(text, assets):
+    """
+    Point references to built assets at their hashed names
+
+    Matches quoted or ``url(...)`` references written as ``path``, ``./path``
+    or ``/path``; query strings and fragments are kept.
+    """
+    if not assets:
+        return text
+    pattern = re.compile(
+        r'(?<=["\'(])(\./|/)?(' + '|'.join(re.escape(path) for path in sorted(assets, key=len, reverse=True)) +
+        r')(?=["\')?#])'
+    )
+    return pattern.sub(lambda match: (match.group(1) or '') + assets[match.group(2)], text)
+
+def compress(data):
+    """
+    Returns:
+        dict: encoding -> compressed bytes, only for encodings that are smaller
+    """
+    variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11)
+    return {encoding: body for encoding, body in variants.items() if len(body) < len(data)}
+
+def build_assets(static_dir=STATIC_DIR, build_dir=BUILD_DIR):
+    """
+    Fingerprint, rewrite and precompress ``static_dir`` into ``build_dir``
+
+    Returns:
+        dict: The manifest that was written
+    """
+    staging_dir = build_dir.rstrip(os.sep) + '.tmp'
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+    assets = {}     # original path -> hashed path
+    files = {}      # served path -> {'etag', 'encodings', 'immutable'}
+    for path in sorted(collect_files(static_dir), key=lambda p: (build_order(p), p)):
+        with open(os.path.join(static_dir, path), 'rb') as f:
+            data = f.read()
+
+        ext = os.path.splitext(path)[1].lower()
+        if ext in TEXT_EXTENSIONS:
+            data = rewrite_references(data.decode('utf-8'), assets).encode('utf-8')
+
+        digest = content_hash(data)
+        immutable = build_order(path) < 3
+        output = hashed_name(path, digest) if immutable else path
+        if immutable:
+            assets[path] = output
+
+        target = os.path.join(staging_dir, output)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+
+        encodings = []
+        if ext in COMPRESSIBLE_EXTENSIONS:
+            for encoding, body in compress(data).items():
+                with open(target + dict(ENCODINGS)[encoding], 'wb') as f:
+                    f.write(body)
+                encodings.append(encoding)
+
+        files[output] = {'etag': digest[:32], 'encodings': encodings, 'immutable': immutable}
+
+    manifest = {'assets': assets, 'files': files}
+    with open(os.path.join(staging_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    # Swap the finished build in so a running app never sees a half-written one
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(os.path.dirname(build_dir), exist_ok=True)
+    os.rename(staging_dir, build_dir)
+    return manifest
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+def get_manifest(build_dir=BUILD_DIR):
+    """The build manifest, or an empty one when no build exists"""
+    global _manifest
+    if _manifest is None:
+        with _manifest_lock:
+            if _manifest is None:
+                try:
+                    with open(os.path.join(build_dir, MANIFEST_NAME), encoding='utf-8') as f:
+                        _manifest = json.load(f)
+                except FileNotFoundError:
+                    print(f"No static build in {build_dir}; serving static/ unprocessed "
+                          f"(run: python -m services.assets build)")
+                    _manifest = {'assets': {}, 'files': {}}
+    return _manifest
+
+def choose_encoding(available):
+    """Best precompressed encoding the client accepts, or None for identity"""
+    for encoding, suffix in ENCODINGS:
+        if encoding in available and request.accept_encodings[encoding] > 0:
+            return encoding, suffix
+    return None, ''
+
+def serve_asset(filename, build_dir=BUILD_DIR):
+    """
+    Serve a built asset with content negotiation and strong ETags
+
+    Args:
+        filename (str): Path relative to the site root, e.g. ``src/output.<hash>.css``
+            or its original name ``src/output.css``
+
+    Returns:
+        Response: The asset, or None when the build does not contain it
+    """
+    manifest = get_manifest(build_dir)
+    entry = manifest['files'].get(filename)
+    output = filename
+    if entry is None and filename in manifest['assets']:
+        # Original name of a hashed file (e.g. a reference built at runtime in JS)
+        output = manifest['assets'][filename]
+        entry = manifest['files'].get(output)
+    if entry is None:
+        return None
+
+    encoding, suffix = choose_encoding(entry['encodings'])
+    mimetype = mimetypes.guess_type(output)[0] or 'application/octet-stream'
+    etag = entry['etag'] + (f"-{encoding}" if encoding else '')
+
+    response = send_file(os.path.join(build_dir, output + suffix), mimetype=mimetype,
+                         etag=etag, conditional=True, max_age=None)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if entry['encodings']:
+        response.headers['Vary'] = 'Accept-Encoding'
+    immutable = entry['immutable'] and output == filename
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+    return response
+
+def main(argv):
+    if len(argv) != 2 or argv[1] != 'build':
+        print("Usage: python -m services.assets build")
+        return 2
+
+    manifest = build_assets()
+    compressed = sum(1 for entry in manifest['files'].values() if entry['encodings'])
+    print(f"Built {len(manifest['files'])} static files into {BUILD_DIR} "
+          f"({len(manifest['assets'])} fingerprinted, {compressed} precompressed"
+          f"{'' if brotli else ', brotli not installed: gzip only'})")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,369 @@
+"""
+Async read path for the public GET endpoints
+
+Serves ``/api/leaderboard``, ``/api/videos``, ``/api/team_leaderboard``,
+``/api/team_members/<team>`` and ``/api/user/<username>`` from coroutines on
+an asyncpg pool, so one worker multiplexes thousands of concurrent readers
+instead of parking a whole sync worker on every DB round trip. Every other
+route and method (all writes and CORS preflights included) falls through to
+the unchanged Flask app, run on a thread pool inside the same process.
+
+Both paths share their SQL and post-processing (services.leaderboard,
+services.feeds, services.profiles), render JSON with the Flask app's own
+JSON provider, and read and write the same response-cache entries with the
+same ETags. A response therefore has the same bytes whichever path serves it,
+and writes made through Flask invalidate what the async path caches.
+
+    gunicorn -k uvicorn.workers.UvicornWorker asgi:app
+
+Settings: ``ASYNC_READS`` (true; false routes everything to Flask),
+``ASYNC_DB_POOL_MIN_SIZE`` / ``ASYNC_DB_POOL_MAX_SIZE`` (connections per
+worker), ``ASYNC_DB_STATEMENT_CACHE_SIZE`` (set 0 behind a transaction-mode
+pgbouncer, e.g. the Supabase pooler on port 6543) and ``ASYNC_WSGI_THREADS``
+(threads running Flask requests).
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+import asyncpg
+from a2wsgi import WSGIMiddleware
+from flask_cors.core import get_cors_headers, get_cors_options
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from starlette.routing import Match, Mount, Route
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import is_resource_modified
+
+from services.cache import get_cache, cache_key, response_entry, api_cache_control, SECURITY_HEADERS, CORS_OPTIONS
+from services.feeds import (
+    FEED_PAGE_SIZE, FEED_MAX_PAGE_SIZE, VIDEO_FEED_WHERE, TEAM_PAGE_SIZE, TEAM_MAX_PAGE_SIZE,
+    TEAM_MEMBERS_PAGE_SIZE, TEAM_MEMBERS_MAX_PAGE_SIZE, TEAM_SORT_COLUMNS,
+    feed_query, team_leaderboard_query, team_members_query, team_member_cursor, decode_team_member_cursor
+)
+from services.leaderboard import LEADERBOARD_SQL, segment_filters, score_leaderboard_rows
+from services.metrics import (
+    REQUEST_COUNT, REQUEST_DB_QUERIES, REQUEST_DB_TIME, REQUEST_LATENCY, REQUESTS_IN_FLIGHT, record_query
+)
+from services.pagination import (
+    parse_page_args, decode_cursor, keyset_page, next_page_headers, InvalidCursor
+)
+from services.profiles import (
+    PROFILE_SQL, PROFILE_HISTORY_LIMIT, PROFILE_VIDEOS_LIMIT, PROFILE_CACHE_TTL, build_profile, profile_namespace
+)
+
+ASYNC_READS = os.getenv('ASYNC_READS', 'true').lower() == 'true'
+
+_PLACEHOLDER = re.compile(r"%\((\w+)\)s|%s|%%")
+
+_pool = None
+_pool_lock = None
+_json = None
+# flask_cors options resolved against the Flask app, as CORS(app) in app.py does
+_cors = None
+# (statements, seconds) spent by the current request, like g.db_queries / g.db_time
+_db_work = ContextVar('db_work', default=None)
+# full cache key -> task computing it, so concurrent misses share one query
+_inflight = {}
+
+def to_asyncpg(sql, params):
+    """
+    Rewrite a psycopg2 (pyformat) statement for asyncpg
+
+    ``%s`` and ``%(name)s`` become ``$1``, ``$2``, ... so the sync path's SQL
+    constants are reused unchanged.
+
+    Returns:
+        tuple: (sql, args)
+    """
+    args = []
+    positions = {}
+    positional = None if isinstance(params, dict) else iter(params)
+
+    def replace(match):
+        if match.group(0) == '%%':
+            return '%'
+        name = match.group(1)
+        if name is None:
+            args.append(next(positional))
+            return f"${len(args)}"
+        if name not in positions:
+            args.append(params[name])
+            positions[name] = len(args)
+        return f"${positions[name]}"
+
+    return _PLACEHOLDER.sub(replace, sql), args
+
+async def init_connection(conn):
+    # Decode json/jsonb like psycopg2 does (the profile's json_agg columns)
+    for type_name in ('json', 'jsonb'):
+        await conn.set_type_codec(type_name, encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
+
+async def open_pool():
+    global _pool
+    pool = await asyncpg.create_pool(
+        os.getenv('DATABASE_URL'),
+        min_size=int(os.getenv('ASYNC_DB_POOL_MIN_SIZE', 2)),
+        max_size=int(os.getenv('ASYNC_DB_POOL_MAX_SIZE', 20)),
+        max_inactive_connection_lifetime=float(os.getenv('DB_POOL_MAX_LIFETIME', 1800)),
+        statement_cache_size=int(os.getenv('ASYNC_DB_STATEMENT_CACHE_SIZE', 100)),
+        command_timeout=float(os.getenv('ASYNC_DB_COMMAND_TIMEOUT', 30)),
+        init=init_connection,
+    )
+    print(f"Async read pool ready ({pool.get_min_size()}-{pool.get_max_size()} connections)")
+    _pool = pool
+    return pool
+
+async def get_async_pool():
+    """This worker's asyncpg pool, opened on first use if startup could not open it"""
+    global _pool_lock
+    if _pool is not None:
+        return _pool
+    if _pool_lock is None:
+        _pool_lock = asyncio.Lock()
+    async with _pool_lock:
+        return _pool or await open_pool()
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.close()
+
+@asynccontextmanager
+async def lifespan(app):
+    # One pool per worker, opened on its own event loop after the fork. Like
+    # the psycopg2 pool, an unreachable database must not keep the worker
+    # (and the Flask routes it serves) from booting; reads retry on demand.
+    if ASYNC_READS:
+        try:
+            await open_pool()
+        except (OSError, asyncpg.PostgresError) as e:
+            print(f"Async read pool unavailable at startup: {e}")
+    try:
+        yield
+    finally:
+        await close_pool()
+
+async def fetch(sql, params=()):
+    """Run one read on the async pool, measured like InstrumentedCursor statements"""
+    query, args = to_asyncpg(sql, params)
+    start = time.perf_counter()
+    try:
+        pool = await get_async_pool()
+        return await pool.fetch(query, *args)
+    finally:
+        duration = time.perf_counter() - start
+        # No cursor: the profiler aggregates the statement but cannot EXPLAIN it
+        record_query(None, sql, params, duration)
+        work = _db_work.get()
+        if work is not None:
+            work[0] += 1
+            work[1] += duration
+
+def json_body(data):
+    # The Flask app's provider, so key order, separators and datetime/Decimal
+    # rendering match jsonify() byte for byte
+    return _json.response(data).get_data(as_text=True)
+
+def json_response(data, status):
+    return Response(json_body(data), status_code=status, media_type='application/json')
+
+def entry_response(request, entry):
+    """Build the response for a cache entry, answering If-None-Match with 304"""
+    headers = dict(entry.get('headers') or [])
+    headers['ETag'] = f'"{entry["etag"]}"'
+    environ = {'REQUEST_METHOD': request.method, 'HTTP_IF_NONE_MATCH': request.headers.get('if-none-match', '')}
+    if not is_resource_modified(environ, etag=entry['etag']):
+        return Response(status_code=304, headers=headers)
+    return Response(entry['body'], status_code=entry['status'], media_type=entry['mimetype'], headers=headers)
+
+def cors_headers(request):
+    # flask_cors's own header logic, so both paths answer every Origin alike
+    return [(k, str(v)) for k, v in get_cors_headers(_cors, request.headers, request.method).items(multi=True)]
+
+async def single_flight(full_key, compute):
+    task = _inflight.get(full_key)
+    if task is None:
+        task = asyncio.ensure_future(compute())
+        _inflight[full_key] = task
+        task.add_done_callback(lambda _: _inflight.pop(full_key, None))
+    return await asyncio.shield(task)
+
+async def cached(request, args, namespace, ttl, view):
+    """
+    Async counterpart of services.cache.cached_response()
+
+    Args:
+        view: Coroutine function returning ``(data, headers)`` for a 200, or a
+            Response (never cached)
+    """
+    cache = get_cache()
+    key = cache_key(request.url.path, args)
+    # Redis calls block; keep them off the event loop
+    if cache.backend.shared:
+        full_key, entry = await run_in_threadpool(cache.lookup, namespace, key)
+    else:
+        full_key, entry = cache.lookup(namespace, key)
+    if entry is not None:
+        return entry_response(request, entry)
+
+    async def compute():
+        result = await view()
+        if isinstance(result, Response):
+            return result
+        data, headers = result
+        entry = response_entry(json_body(data), 'application/json', headers.items())
+        if full_key is not None:
+            if cache.backend.shared:
+                await run_in_threadpool(cache.store, full_key, entry, ttl)
+            else:
+                cache.store(full_key, entry, ttl)
+        return entry
+
+    result = await (single_flight(full_key, compute) if full_key is not None else compute())
+    if isinstance(result, Response):
+        return result
+    return entry_response(request, result)
+
+def instrumented(endpoint):
+    """
+    Record the Flask request metrics under the Flask endpoint name and add
+    the headers app.py adds to every API response
+    """
+    def decorator(f):
+        @wraps(f)
+        async def handler(request):
+            start = time.perf_counter()
+            work = [0, 0.0]
+            token = _db_work.set(work)
+            REQUESTS_IN_FLIGHT.inc()
+            status = 500
+            try:
+                response = await f(request, MultiDict(request.query_params.multi_items()))
+                status = response.status_code
+                if 'cache-control' not in response.headers:
+                    response.headers['Cache-Control'] = api_cache_control(request.url.path)
+                response.headers.update(SECURITY_HEADERS)
+                for name, value in cors_headers(request):
+                    response.headers.append(name, value)
+                return response
+            finally:
+                _db_work.reset(token)
+                REQUESTS_IN_FLIGHT.dec()
+                REQUEST_LATENCY.labels(request.method, endpoint).observe(time.perf_counter() - start)
+                REQUEST_COUNT.labels(request.method, endpoint, str(status)).inc()
+                REQUEST_DB_QUERIES.labels(endpoint).observe(work[0])
+                REQUEST_DB_TIME.labels(endpoint).observe(work[1])
+        return handler
+    return decorator
+
+@instrumented('api.leaderboard')
+async def leaderboard(request, args):
+    async def view():
+        where, params = segment_filters(args.get('gender'), args.get('country'))
+        limit, offset = parse_page_args(args)
+        rows = await fetch(LEADERBOARD_SQL.format(where=where), tuple(params) + (limit, offset))
+        return score_leaderboard_rows(rows), {}
+    return await cached(request, args, 'leaderboard', 300, view)
+
+@instrumented('api.get_videos')
+async def get_videos(request, args):
+    async def view():
+        limit, _ = parse_page_args(args, FEED_PAGE_SIZE, FEED_MAX_PAGE_SIZE)
+        try:
+            cursor = decode_cursor(args.get('cursor'))
+        except InvalidCursor:
+            return json_response({'error': 'Invalid cursor'}, 400)
+        rows = await fetch(*feed_query(VIDEO_FEED_WHERE, (), cursor, limit))
+        page, next_cursor = keyset_page(rows, limit)
+        return [dict(row) for row in page], next_page_headers(request.url.path, args, next_cursor)
+    return await cached(request, args, 'videos', 60, view)
+
+@instrumented('api.team_leaderboard')
+async def team_leaderboard(request, args):
+    async def view():
+        sort_column = TEAM_SORT_COLUMNS.get(args.get('sort', 'avg_elo'))
+        if not sort_column:
+            return json_response({'error': 'Invalid sort, expected one of: ' + ', '.join(TEAM_SORT_COLUMNS)}, 400)
+        limit, offset = parse_page_args(args, TEAM_PAGE_SIZE, TEAM_MAX_PAGE_SIZE)
+        rows = await fetch(*team_leaderboard_query(sort_column, args.get('q', '').strip(), limit, offset))
+        return [dict(row) for row in rows], {}
+    return await cached(request, args, 'teams', 300, view)
+
+@instrumented('api.team_members')
+async def team_members(request, args):
+    team_name = request.path_params['team_name']
+
+    async def view():
+        limit, _ = parse_page_args(args, TEAM_MEMBERS_PAGE_SIZE, TEAM_MEMBERS_MAX_PAGE_SIZE)
+        try:
+            cursor = decode_team_member_cursor(args.get('cursor'))
+        except InvalidCursor:
+            return json_response({'error': 'Invalid cursor'}, 400)
+        rows = await fetch(*team_members_query(team_name, cursor, limit))
+        page, next_cursor = keyset_page(rows, limit, team_member_cursor)
+        return [dict(row) for row in page], next_page_headers(request.url.path, args, next_cursor)
+    return await cached(request, args, 'teams', 300, view)
+
+@instrumented('api.get_user_profile')
+async def get_user_profile(request, args):
+    username = request.path_params['username']
+
+    async def view():
+        try:
+            rows = await fetch(PROFILE_SQL, {
+                'username': username,
+                'history_limit': PROFILE_HISTORY_LIMIT,
+                'videos_limit': PROFILE_VIDEOS_LIMIT,
+            })
+            profile = build_profile(rows[0] if rows else None)
+        except Exception as e:
+            return json_response({'error': f'Failed to get user profile: {str(e)}'}, 500)
+        if not profile:
+            return json_response({'error': 'User not found'}, 404)
+        return profile, {}
+    return await cached(request, args, profile_namespace(username), PROFILE_CACHE_TTL, view)
+
+class ReadRoute(Route):
+    """
+    A GET route that leaves every other method (CORS preflights included) to
+    the Flask mount instead of answering 405
+    """
+    def matches(self, scope):
+        match, child_scope = super().matches(scope)
+        if match is Match.PARTIAL:
+            return Match.NONE, {}
+        return match, child_scope
+
+READ_ROUTES = [
+    ReadRoute('/api/leaderboard', leaderboard, methods=['GET']),
+    ReadRoute('/api/videos', get_videos, methods=['GET']),
+    ReadRoute('/api/team_leaderboard', team_leaderboard, methods=['GET']),
+    ReadRoute('/api/team_members/{team_name}', team_members, methods=['GET']),
+    ReadRoute('/api/user/{username}', get_user_profile, methods=['GET']),
+]
+
+def create_app(flask_app):
+    """
+    Wrap the Flask app in an ASGI app serving the public reads asynchronously
+
+    Args:
+        flask_app: The Flask application; it handles every other request and
+            provides the JSON rendering
+
+    Returns:
+        Starlette: The ASGI application
+    """
+    global _json, _cors
+    _json = flask_app.json
+    _cors = get_cors_options(flask_app, CORS_OPTIONS)
+    routes = READ_ROUTES if ASYNC_READS else []
+    wsgi = WSGIMiddleware(flask_app, workers=int(os.getenv('ASYNC_WSGI_THREADS', 10)))
+    return Starlette(routes=routes + [Mount('/', app=wsgi)], lifespan=lifespan)
@@ -0,0 +1,354 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import Response, current_app, request
+
+class MemoryBackend:
+    """
+    In-process cache backend: size-bounded LRU with per-entry TTL
+
+    Each gunicorn worker holds its own copy, so an invalidation only reaches
+    the worker that performed the write; other workers fall back to the TTL.
+    """
+
+    shared = False
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._counters = {}             # namespace generations, never evicted
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            # Entries of the old generation can never be read again; drop them now
+            prefix = key.split(':', 1)[1] + ':'
+            for stale in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[stale]
+            return self._counters[key]
+
+    def acquire_lock(self, key, ttl):
+        # Threads of this process are already serialized by ResponseCache
+        return True
+
+    def release_lock(self, key, token=None):
+        pass
+
+    def size(self):
+        return len(self._entries)
+
+class RedisBackend:
+    """
+    Shared cache backend on Redis, seen by every gunicorn worker
+
+    Size bounding/LRU eviction is delegated to the server
+    (``maxmemory`` + ``maxmemory-policy allkeys-lru``).
+    """
+
+    shared = True
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_URL points at Redis but the 'redis' package is not installed")
+        self._client = redis.Redis.from_url(url)
+        self._lock_tokens = threading.local()
+        self.evictions = 0
+
+    def get(self, key):
+        raw = self._client.get(key)
+        return None if raw is None else json.loads(zlib.decompress(raw))
+
+    def set(self, key, value, ttl):
+        self._client.set(key, zlib.compress(json.dumps(value).encode('utf-8')), ex=max(1, int(ttl)))
+
+    def get_counter(self, key):
+        value = self._client.get(key)
+        return int(value) if value is not None else 0
+
+    def incr(self, key):
+        return self._client.incr(key)
+
+    def acquire_lock(self, key, ttl):
+        token = uuid.uuid4().hex
+        if self._client.set(key, token, nx=True, px=int(ttl * 1000)):
+            return token
+        return None
+
+    def release_lock(self, key, token=None):
+        # Only delete the lock if we still own it
+        self._client.eval(
+            "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0",
+            1, key, token or ''
+        )
+
+    def size(self):
+        return None
+
+class ResponseCache:
+    """
+    Namespaced cache with TTL and single-flight recompute
+
+    Keys are versioned by a per-namespace generation counter stored in the
+    backend, so ``invalidate(namespace)`` is a single increment that every
+    worker sharing the backend observes immediately.
+    """
+
+    LOCK_STRIPES = 64
+
+    def __init__(self, backend, default_ttl=300, lock_timeout=10):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.lock_timeout = lock_timeout
+        self._locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'computes': 0, 'shared_waits': 0, 'invalidations': 0, 'errors': 0}
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _key(self, namespace, key):
+        generation = self.backend.get_counter(f"gen:{namespace}")
+        return f"{namespace}:{generation}:{key}"
+
+    def get_or_compute(self, namespace, key, compute, ttl=None):
+        """
+        Return the cached value for ``key`` or compute it once.
+
+        Concurrent misses for the same key wait for a single computation:
+        threads of this worker via a striped lock, other workers via a
+        backend lock when the backend is shared.
+
+        Args:
+            compute: callable returning ``(value, cacheable)``
+        """
+        ttl = ttl or self.default_ttl
+        try:
+            full_key = self._key(namespace, key)
+            value = self.backend.get(full_key)
+        except Exception as e:
+            # A cache outage must never take the endpoint down with it
+            print(f"Cache read error: {e}")
+            self._count('errors')
+            return compute()[0]
+
+        if value is not None:
+            self._count('hits')
+            return value
+
+        self._count('misses')
+        with self._locks[hash(full_key) % self.LOCK_STRIPES]:
+            value = self.backend.get(full_key)
+            if value is not None:
+                self._count('hits')
+                return value
+
+            lock_key = f"lock:{full_key}"
+            token = self.backend.acquire_lock(lock_key, self.lock_timeout)
+            if not token:
+                value = self._wait_for_peer(full_key)
+                if value is not None:
+                    return value
+
+            try:
+                self._count('computes')
+                value, cacheable = compute()
+                if cacheable:
+                    self.backend.set(full_key, value, ttl)
+                return value
+            finally:
+                if token:
+                    self.backend.release_lock(lock_key, token)
+
+    def lookup(self, namespace, key):
+        """
+        Non-blocking half of get_or_compute() for callers that compute
+        asynchronously (services.async_reads)
+
+        Returns:
+            tuple: (full_key, cached value or None); full_key is None when the
+                backend is unreachable and the value should not be stored
+        """
+        try:
+            full_key = self._key(namespace, key)
+            value = self.backend.get(full_key)
+        except Exception as e:
+            print(f"Cache read error: {e}")
+            self._count('errors')
+            return None, None
+        self._count('hits' if value is not None else 'misses')
+        return full_key, value
+
+    def store(self, full_key, value, ttl=None):
+        """Store a value computed after a lookup() miss"""
+        self._count('computes')
+        try:
+            self.backend.set(full_key, value, ttl or self.default_ttl)
+        except Exception as e:
+            print(f"Cache write error: {e}")
+            self._count('errors')
+
+    def _wait_for_peer(self, full_key):
+        # Another worker is computing this key; poll for its result
+        self._count('shared_waits')
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            value = self.backend.get(full_key)
+            if value is not None:
+                self._count('hits')
+                return value
+        return None
+
+    def invalidate(self, *namespaces):
+        for namespace in namespaces:
+            try:
+                self.backend.incr(f"gen:{namespace}")
+                self._count('invalidations')
+            except Exception as e:
+                print(f"Cache invalidation error for {namespace}: {e}")
+                self._count('errors')
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update({
+            'backend': type(self.backend).__name__,
+            'entries': self.backend.size(),
+            'evictions': self.backend.evictions,
+        })
+        return stats
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Return the process-wide response cache configured from CACHE_URL"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                url = os.getenv('CACHE_URL', 'memory://')
+                if url.startswith(('redis://', 'rediss://', 'unix://')):
+                    backend = RedisBackend(url)
+                else:
+                    backend = MemoryBackend(max_entries=int(os.getenv('CACHE_MAX_ENTRIES', 1024)))
+                _cache = ResponseCache(backend, default_ttl=int(os.getenv('CACHE_DEFAULT_TTL', 300)))
+    return _cache
+
+def get_cache_stats():
+    """Cache statistics for this worker, or None if the cache was never used"""
+    return _cache.stats() if _cache is not None else None
+
+def invalidate(*namespaces):
+    """Drop every cached response in the given namespaces"""
+    get_cache().invalidate(*namespaces)
+
+def body_etag(body):
+    return hashlib.sha1(body.encode('utf-8')).hexdigest()
+
+def cache_key(path, args):
+    """Cache key of a request: its path plus sorted query arguments (a MultiDict)"""
+    if args:
+        return path + '?' + urlencode(sorted(args.items(multi=True)))
+    return path
+
+def response_entry(body, mimetype, headers):
+    """The cached form of a 200 response, as stored by both read paths"""
+    return {
+        'status': 200,
+        'mimetype': mimetype,
+        'headers': [[name, value] for name, value in headers if name not in ('Content-Type', 'Content-Length')],
+        'body': body,
+        'etag': body_etag(body),
+    }
+
+# Security headers added to every response
+# flask_cors settings, shared by app.py and the async read path
+CORS_OPTIONS = {'expose_headers': ['X-Next-Cursor', 'Link']}
+
+SECURITY_HEADERS = {
+    'X-Content-Type-Options': 'nosniff',
+    'X-Frame-Options': 'DENY',
+    'X-XSS-Protection': '1; mode=block',
+}
+
+def api_cache_control(path):
+    """Cache-Control for an API response whose view did not choose its own"""
+    # API responses get shorter cache times than static files
+    if 'leaderboard' in path:
+        return 'public, max-age=300'  # 5 minutes
+    if 'videos' in path:
+        return 'public, max-age=60'   # 1 minute
+    return 'no-cache'
+
+def cached_response(namespace, ttl=None):
+    """
+    Cache a view's successful response, keyed by path and query arguments
+
+    Only 200 responses are stored. Writes that change the underlying data
+    must call ``invalidate(namespace)`` after committing. ``namespace`` may
+    also be a callable taking the view's keyword arguments, for per-object
+    namespaces that can be invalidated individually.
+
+    Cached responses carry a strong ETag derived from the body, so
+    conditional GETs are answered with 304.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            view_namespace = namespace(**kwargs) if callable(namespace) else namespace
+            key = cache_key(request.path, request.args)
+
+            def compute():
+                response = current_app.make_response(f(*args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough or response.is_streamed:
+                    return response, False
+                return response_entry(response.get_data(as_text=True), response.mimetype,
+                                      response.headers.items()), True
+
+            value = get_cache().get_or_compute(view_namespace, key, compute, ttl)
+            if isinstance(value, Response):
+                return value
+            response = Response(value['body'], status=value['status'], mimetype=value['mimetype'],
+                                headers=value.get('headers'))
+            response.set_etag(value.get('etag') or body_etag(value['body']))
+            return response.make_conditional(request)
+        return decorated_function
+    return decorator
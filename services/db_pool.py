@@ -0,0 +1,235 @@
+import os
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the checkout timeout"""
+
+
+class ConnectionPool:
+    """
+    Thread-safe Postgres connection pool
+
+    Keeps between ``minconn`` and ``maxconn`` open connections, health-checks
+    connections that have been idle for a while, recycles connections older
+    than ``max_lifetime`` seconds and drops every inherited connection when
+    used from a forked child process (gunicorn workers).
+    """
+
+    def __init__(self, dsn, minconn=1, maxconn=10, max_lifetime=1800,
+                 health_check_after=30, timeout=10, **connect_kwargs):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError('Invalid pool size: minconn=%s maxconn=%s' % (minconn, maxconn))
+
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+        self.timeout = timeout
+        self.connect_kwargs = connect_kwargs
+
+        self._cond = threading.Condition()
+        self._reset_state()
+
+    def _reset_state(self):
+        self._pid = os.getpid()
+        self._idle = []          # [(conn, created_at, returned_at)]
+        self._in_use = {}        # id(conn) -> created_at
+        self._pending = 0        # slots reserved by checkouts that are connecting
+        self._closed = False
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'connections_opened': 0,
+            'connections_recycled': 0,
+            'health_check_failures': 0,
+            'peak_in_use': 0,
+        }
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, **self.connect_kwargs)
+        self._stats['connections_opened'] += 1
+        return conn, time.monotonic()
+
+    def _size(self):
+        return len(self._idle) + len(self._in_use) + self._pending
+
+    def _check_pid(self):
+        # Connections inherited over fork() share their socket with the parent;
+        # closing them here would terminate the parent's session, so just forget them.
+        if self._pid != os.getpid():
+            self._reset_state()
+
+    def reset_after_fork(self):
+        """Forget every connection inherited from the parent process"""
+        with self._cond:
+            self._reset_state()
+
+    def _is_expired(self, created_at, now):
+        return bool(self.max_lifetime) and now - created_at >= self.max_lifetime
+
+    def _is_healthy(self, conn, returned_at, now):
+        if conn.closed:
+            return False
+        if now - returned_at < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            self._stats['health_check_failures'] += 1
+            return False
+
+    def _discard(self, conn):
+        try:
+            if not conn.closed:
+                conn.close()
+        except psycopg2.Error:
+            pass
+
+    def prefill(self):
+        """Open connections until the pool holds at least ``minconn``"""
+        with self._cond:
+            self._check_pid()
+            while self._size() < self.minconn:
+                conn, created_at = self._connect()
+                self._idle.append((conn, created_at, created_at))
+
+    def getconn(self, timeout=None):
+        """
+        Check a connection out of the pool, waiting up to ``timeout`` seconds
+        when the pool is saturated.
+
+        Raises:
+            PoolTimeout: if no connection became available in time
+        """
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        waited = False
+
+        while True:
+            with self._cond:
+                self._check_pid()
+                if self._closed:
+                    raise psycopg2.InterfaceError('connection pool is closed')
+
+                candidate = None
+                while candidate is None:
+                    if self._idle:
+                        candidate = self._idle.pop()
+                        self._pending += 1
+                    elif self._size() < self.maxconn:
+                        self._pending += 1
+                        break
+                    else:
+                        remaining = timeout - (time.monotonic() - started)
+                        if remaining <= 0:
+                            self._stats['timeouts'] += 1
+                            raise PoolTimeout('Timed out after %.1fs waiting for a database connection' % timeout)
+                        if not waited:
+                            waited = True
+                            self._stats['waits'] += 1
+                        self._cond.wait(remaining)
+
+            # Validate or open the connection outside the lock so a slow
+            # handshake does not stall every other checkout.
+            conn = None
+            try:
+                if candidate is None:
+                    conn, created_at = self._connect()
+                else:
+                    conn, created_at, returned_at = candidate
+                    now = time.monotonic()
+                    if self._is_expired(created_at, now):
+                        self._stats['connections_recycled'] += 1
+                        self._discard(conn)
+                        conn = None
+                    elif not self._is_healthy(conn, returned_at, now):
+                        self._discard(conn)
+                        conn = None
+            except BaseException:
+                with self._cond:
+                    self._pending -= 1
+                    self._cond.notify()
+                raise
+
+            with self._cond:
+                self._pending -= 1
+                if conn is not None:
+                    return self._checkout(conn, created_at, started, waited)
+                self._cond.notify()
+
+    def _checkout(self, conn, created_at, started, waited):
+        self._in_use[id(conn)] = created_at
+        wait_time = time.monotonic() - started if waited else 0.0
+        self._stats['checkouts'] += 1
+        self._stats['wait_time_total'] += wait_time
+        self._stats['wait_time_max'] = max(self._stats['wait_time_max'], wait_time)
+        self._stats['peak_in_use'] = max(self._stats['peak_in_use'], len(self._in_use))
+        return conn
+
+    def putconn(self, conn, discard=False):
+        """Return a connection to the pool, rolling back any open transaction"""
+        with self._cond:
+            if self._pid != os.getpid():
+                # Checked out before a fork; the parent still owns the socket.
+                return
+            created_at = self._in_use.pop(id(conn), None)
+            if created_at is None:
+                return
+
+            if not discard and not conn.closed:
+                status = conn.info.transaction_status
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    discard = True
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    try:
+                        conn.rollback()
+                    except psycopg2.Error:
+                        discard = True
+
+            now = time.monotonic()
+            if discard or conn.closed or self._closed or self._is_expired(created_at, now):
+                if not discard and not conn.closed and self._is_expired(created_at, now):
+                    self._stats['connections_recycled'] += 1
+                self._discard(conn)
+            else:
+                self._idle.append((conn, created_at, now))
+            self._cond.notify()
+
+    def closeall(self):
+        """Close every idle connection and refuse further checkouts"""
+        with self._cond:
+            self._check_pid()
+            self._closed = True
+            for conn, _, _ in self._idle:
+                self._discard(conn)
+            self._idle = []
+            self._cond.notify_all()
+
+    def stats(self):
+        """Snapshot of pool size, saturation and checkout wait times"""
+        with self._cond:
+            self._check_pid()
+            stats = dict(self._stats)
+            stats.update({
+                'pid': self._pid,
+                'min_size': self.minconn,
+                'max_size': self.maxconn,
+                'size': self._size(),
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'saturation': round(len(self._in_use) / self.maxconn, 3),
+                'wait_time_avg': (stats['wait_time_total'] / stats['checkouts']) if stats['checkouts'] else 0.0,
+            })
+            return stats
@@ -0,0 +1,140 @@
+import csv
+import io
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+from psycopg2 import extensions
+
+from services.supabase import get_pool
+from services.leaderboard import segment_filters
+
+EXPORT_ITERSIZE = 2000
+EXPORT_CHUNK_ROWS = 500
+
+EXPORT_QUERIES = {
+    'prs': """
+        SELECT id, username, lift_type, weight, video_url, created_at
+        FROM prs
+        ORDER BY id
+    """,
+    'users': """
+        SELECT username, display_name, email, flag, team, weight, gender, elo, is_active, created_at, last_login
+        FROM users
+        ORDER BY username
+    """,
+    'leaderboard': """
+        SELECT RANK() OVER (ORDER BY s.dots_score DESC) AS rank,
+               s.username, u.display_name, s.flag, u.team, s.gender, s.bodyweight,
+               s.bench, s.squat, s.deadlift, s.total_lifted,
+               ROUND(s.dots_score::numeric, 2) AS dots_score
+        FROM user_standings s
+        JOIN users u ON u.username = s.username
+        {where}
+        ORDER BY s.dots_score DESC, s.username
+    """,
+}
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+def export_query(dataset, gender=None, country=None):
+    """
+    Build the SQL for an export dataset
+
+    Returns:
+        tuple: (sql, params)
+
+    Raises:
+        KeyError: if the dataset is unknown
+    """
+    sql = EXPORT_QUERIES[dataset]
+    if dataset == 'leaderboard':
+        where, params = segment_filters(gender, country)
+        return sql.format(where=where), tuple(params)
+    return sql, ()
+
+def stream_rows(sql, params=(), itersize=EXPORT_ITERSIZE):
+    """
+    Yield ``(columns, rows)`` batches from a server-side (named) cursor
+
+    Uses its own pooled connection rather than the request-scoped one, since
+    the generator keeps running after the view has returned. Postgres only
+    materializes ``itersize`` rows at a time, so memory stays flat.
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        with conn.cursor() as setup:
+            setup.execute("SET TRANSACTION READ ONLY")
+
+        cur = conn.cursor(name=f"export_{uuid.uuid4().hex}", cursor_factory=extensions.cursor)
+        cur.itersize = itersize
+        try:
+            cur.execute(sql, params)
+            rows = cur.fetchmany(itersize)
+            # Named cursors only know their description after the first fetch
+            columns = [column.name for column in cur.description]
+            yield columns, rows
+            while rows:
+                rows = cur.fetchmany(itersize)
+                if rows:
+                    yield columns, rows
+        finally:
+            cur.close()
+    finally:
+        pool.putconn(conn)
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+def _csv_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def encode_ndjson(batches):
+    """Encode row batches as newline-delimited JSON, one chunk per batch slice"""
+    for columns, rows in batches:
+        for start in range(0, len(rows), EXPORT_CHUNK_ROWS):
+            yield ''.join(
+                json.dumps(dict(zip(columns, row)), default=_json_default, separators=(',', ':')) + '\n'
+                for row in rows[start:start + EXPORT_CHUNK_ROWS]
+            )
+
+def encode_csv(batches):
+    """Encode row batches as CSV with a header row"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header_written = False
+    for columns, rows in batches:
+        if not header_written:
+            writer.writerow(columns)
+            header_written = True
+        for start in range(0, len(rows), EXPORT_CHUNK_ROWS):
+            for row in rows[start:start + EXPORT_CHUNK_ROWS]:
+                writer.writerow([_csv_value(value) for value in row])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+        if not rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+ENCODERS = {
+    'ndjson': encode_ndjson,
+    'csv': encode_csv,
+}
+
+def export_stream(dataset, fmt, gender=None, country=None):
+    """Generator of encoded chunks for ``dataset`` in format ``fmt``"""
+    sql, params = export_query(dataset, gender, country)
+    return ENCODERS[fmt](stream_rows(sql, params))
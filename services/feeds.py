@@ -0,0 +1,127 @@
+from services.pagination import encode_keyset_cursor, decode_keyset_cursor
+
+FEED_PAGE_SIZE = 20
+FEED_MAX_PAGE_SIZE = 50
+
+# Columns returned by the video and posts feeds
+FEED_COLUMNS = "p.id, p.username, p.lift_type, p.weight, p.video_url, p.poster_url, p.thumbnail_url, p.created_at, u.flag, u.team, u.elo"
+
+VIDEO_FEED_WHERE = "p.video_url IS NOT NULL AND p.video_url != ''"
+
+TEAM_PAGE_SIZE = 100
+TEAM_MAX_PAGE_SIZE = 500
+TEAM_MEMBERS_PAGE_SIZE = 50
+TEAM_MEMBERS_MAX_PAGE_SIZE = 100
+
+# Server-side sort orders for the team leaderboard, each backed by an index on team_standings
+TEAM_SORT_COLUMNS = {
+    'avg_elo': 'avg_elo',
+    'total_elo': 'total_elo',
+    'top_elo': 'top_elo',
+    'member_count': 'member_count',
+}
+
+TEAM_LEADERBOARD_SQL = """
+    SELECT team, member_count, avg_elo, top_elo, total_elo
+    FROM team_standings
+    {where}
+    ORDER BY {sort_column} DESC, team
+    LIMIT %s OFFSET %s
+"""
+
+# Columns returned by the team members list
+TEAM_MEMBER_COLUMNS = "username, display_name, flag, elo, team"
+
+def feed_query(where, params, cursor, limit):
+    """
+    Build the keyset query for one page of PRs, newest first
+
+    Walks the (created_at, id) index from the cursor position and fetches
+    one extra row so keyset_page() can tell whether another page follows.
+
+    Returns:
+        tuple: (sql, params)
+    """
+    if cursor:
+        where += " AND (p.created_at, p.id) < (%s, %s)"
+        params = tuple(params) + cursor
+    sql = f"""
+        SELECT {FEED_COLUMNS}
+        FROM prs p
+        JOIN users u ON p.username = u.username
+        WHERE {where}
+        ORDER BY p.created_at DESC, p.id DESC
+        LIMIT %s
+    """
+    return sql, tuple(params) + (limit + 1,)
+
+def team_leaderboard_query(sort_column, search, limit, offset):
+    """
+    Build the query for one page of the team leaderboard
+
+    Args:
+        sort_column (str): A value of TEAM_SORT_COLUMNS
+        search (str): Only teams whose name contains this (case-insensitive), if given
+
+    Returns:
+        tuple: (sql, params)
+    """
+    where = ""
+    params = ()
+    if search:
+        where = "WHERE team ILIKE %s"
+        escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        params = (f"%{escaped}%",)
+    return TEAM_LEADERBOARD_SQL.format(where=where, sort_column=sort_column), params + (limit, offset)
+
+def team_members_query(team_name, cursor, limit):
+    """
+    Build the keyset query for one page of a team's members
+
+    Highest ELO first, then members without an ELO (counted in member_count
+    too). Each half walks idx_users_team_elo from the cursor position, so a
+    deep page costs the same as the first.
+
+    Returns:
+        tuple: (sql, params)
+    """
+    rated, rated_params = "team = %s AND elo IS NOT NULL", (team_name,)
+    unrated, unrated_params = "team = %s AND elo IS NULL", (team_name,)
+    if cursor and cursor[0] is None:
+        # Past every rated member already
+        rated, rated_params = "FALSE", ()
+        unrated += " AND username < %s"
+        unrated_params += (cursor[1],)
+    elif cursor:
+        rated = "team = %s AND (elo, username) < (%s, %s)"
+        rated_params += cursor
+    sql = f"""
+        (SELECT {TEAM_MEMBER_COLUMNS} FROM users WHERE {rated}
+         ORDER BY elo DESC, username DESC LIMIT %s)
+        UNION ALL
+        (SELECT {TEAM_MEMBER_COLUMNS} FROM users WHERE {unrated}
+         ORDER BY username DESC LIMIT %s)
+        ORDER BY elo DESC NULLS LAST, username DESC
+        LIMIT %s
+    """
+    return sql, rated_params + (limit + 1,) + unrated_params + (limit + 1, limit + 1)
+
+def team_member_cursor(last):
+    """Cursor token for the page after the member row ``last``"""
+    elo = float(last['elo']) if last['elo'] is not None else None
+    return encode_keyset_cursor(elo, last['username'])
+
+def _optional_float(value):
+    return float(value) if value is not None else None
+
+def decode_team_member_cursor(token):
+    """
+    Decode a token produced by team_member_cursor()
+
+    Returns:
+        tuple: (elo or None, username), or None when no cursor was given
+
+    Raises:
+        InvalidCursor: if the token is malformed
+    """
+    return decode_keyset_cursor(token, _optional_float, str)
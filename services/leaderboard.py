@@ -0,0 +1,88 @@
+from services.supabase import get_db_connection
+from services.scoring import calculate_dots_scores, round_dots_scores
+
+LEADERBOARD_PAGE_SIZE = 50
+LEADERBOARD_MAX_PAGE_SIZE = 100
+
+# Top-K scan over user_standings (maintained by services.standings); each
+# segment filter has a matching (segment, dots_score DESC, username) index.
+LEADERBOARD_SQL = """
+    SELECT u.username, u.display_name, u.email, u.flag, u.team, u.weight, u.gender, u.elo, u.created_at,
+           s.bench, s.squat, s.deadlift, s.total_lifted
+    FROM user_standings s
+    JOIN users u ON u.username = s.username
+    {where}
+    ORDER BY s.dots_score DESC, s.username
+    LIMIT %s OFFSET %s
+"""
+
+def segment_filters(gender=None, country=None, alias='s'):
+    """
+    Build the WHERE clause selecting one leaderboard segment
+
+    Returns:
+        tuple: (sql, params)
+    """
+    clauses = []
+    params = []
+
+    if gender in ['male', 'female']:
+        clauses.append(f"{alias}.gender = %s")
+        params.append(gender)
+
+    if country:
+        clauses.append(f"{alias}.flag = %s")
+        params.append(country)
+
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    return where, params
+
+def fetch_leaderboard(gender=None, country=None, limit=LEADERBOARD_PAGE_SIZE, offset=0):
+    """
+    Get one page of the DOTS leaderboard from the precomputed standings
+
+    Args:
+        gender (str): Optional 'male' / 'female' filter
+        country (str): Optional flag filter
+        limit (int): Page size
+        offset (int): Number of ranked rows to skip
+
+    Returns:
+        list: Leaderboard rows, best DOTS score first
+    """
+    where, params = segment_filters(gender, country)
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(LEADERBOARD_SQL.format(where=where), tuple(params) + (limit, offset))
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+
+    return score_leaderboard_rows(rows)
+
+def score_leaderboard_rows(rows):
+    """
+    Turn LEADERBOARD_SQL rows into the leaderboard response rows
+
+    Shared by the sync and async (services.async_reads) read paths so both
+    render identical documents.
+
+    Returns:
+        list: Row dicts with missing lifts as 0 and a 'dots_score'
+    """
+    leaderboard_data = [dict(row) for row in rows]
+    # Score the page in one batch; rounding matches calculate_dots_score exactly
+    scores = round_dots_scores(calculate_dots_scores(
+        [row['total_lifted'] for row in leaderboard_data],
+        [row['weight'] for row in leaderboard_data],
+        [row['gender'] for row in leaderboard_data]
+    ))
+    for user_dict, dots_score in zip(leaderboard_data, scores):
+        # Missing lifts count as 0
+        for lift_type in ['bench', 'squat', 'deadlift']:
+            if user_dict[lift_type] is None:
+                user_dict[lift_type] = 0
+        user_dict['dots_score'] = dots_score
+    return leaderboard_data
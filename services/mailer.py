@@ -0,0 +1,211 @@
+"""
+Transactional email outbox
+
+Requests only INSERT into ``email_outbox`` (inside their own transaction);
+a background sender thread in each worker drains due messages in batches
+over one reused SMTP connection, with exponential backoff on failure.
+``FOR UPDATE SKIP LOCKED`` lets every worker run a sender safely.
+
+The sender can also run as its own process:
+
+    python -m services.mailer            # loop forever
+    python -m services.mailer --once     # drain what is due and exit
+
+For local testing point MAIL_SERVER/MAIL_PORT at an SMTP stand-in, e.g.
+``python -m aiosmtpd -n -l localhost:1025`` with MAIL_USE_TLS=false.
+"""
+import os
+import smtplib
+import sys
+import threading
+
+from flask import current_app
+from flask_mail import Message
+
+from services.supabase import get_db_connection
+
+OUTBOX_BATCH_SIZE = int(os.getenv('MAIL_OUTBOX_BATCH_SIZE', 20))
+OUTBOX_POLL_INTERVAL = float(os.getenv('MAIL_OUTBOX_POLL_INTERVAL', 10))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('MAIL_OUTBOX_MAX_ATTEMPTS', 6))
+OUTBOX_BACKOFF_SECONDS = int(os.getenv('MAIL_OUTBOX_BACKOFF_SECONDS', 30))
+
+def is_connection_error(error):
+    """True when the SMTP connection itself is unusable, not just one message"""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    # SMTPException subclasses OSError; plain OSErrors are socket failures
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+def enqueue_email(cur, recipient, subject, html):
+    """
+    Queue an email on the caller's cursor; it is sent once the transaction commits
+
+    Returns:
+        int: Outbox message id
+    """
+    cur.execute("""
+        INSERT INTO email_outbox (recipient, subject, html)
+        VALUES (%s, %s, %s) RETURNING id
+    """, (recipient, subject, html))
+    return cur.fetchone()['id']
+
+def _schedule_retry(cur, message, error):
+    attempts = message['attempts'] + 1
+    if attempts >= OUTBOX_MAX_ATTEMPTS:
+        cur.execute("""
+            UPDATE email_outbox SET status = 'failed', attempts = %s, last_error = %s
+            WHERE id = %s
+        """, (attempts, str(error)[:1000], message['id']))
+    else:
+        cur.execute("""
+            UPDATE email_outbox
+            SET attempts = %s, last_error = %s,
+                next_attempt_at = NOW() + make_interval(secs => %s)
+            WHERE id = %s
+        """, (attempts, str(error)[:1000], OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1), message['id']))
+
+def drain_outbox_batch(batch_size=OUTBOX_BATCH_SIZE):
+    """
+    Send one batch of due messages over a single SMTP connection
+
+    Must run inside an app context (mail settings come from the app config).
+
+    Returns:
+        tuple: (sent, failed) counts; (0, 0) when nothing was due
+    """
+    sent = failed = 0
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT id, recipient, subject, html, attempts
+                FROM email_outbox
+                WHERE status = 'pending' AND next_attempt_at <= NOW()
+                ORDER BY next_attempt_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (batch_size,))
+            messages = cur.fetchall()
+            if not messages:
+                conn.rollback()
+                return 0, 0
+
+            pending = list(messages)
+            try:
+                with current_app.extensions['mail'].connect() as smtp:
+                    while pending:
+                        message = pending[0]
+                        try:
+                            smtp.send(Message(
+                                subject=message['subject'],
+                                recipients=[message['recipient']],
+                                html=message['html']
+                            ))
+                        except Exception as e:
+                            if is_connection_error(e):
+                                raise
+                            # Rejected recipient, bad headers...: retry this message only
+                            _schedule_retry(cur, message, e)
+                            failed += 1
+                        else:
+                            # Drop the body once delivered: it holds a live reset link
+                            cur.execute("""
+                                UPDATE email_outbox
+                                SET status = 'sent', sent_at = NOW(), attempts = attempts + 1, last_error = NULL,
+                                    html = ''
+                                WHERE id = %s
+                            """, (message['id'],))
+                            sent += 1
+                        pending.pop(0)
+            except (smtplib.SMTPException, OSError) as e:
+                # Could not connect/authenticate, or the connection dropped mid-batch
+                print(f"Email outbox: SMTP connection failed: {e}")
+                for message in pending:
+                    _schedule_retry(cur, message, e)
+                    failed += 1
+
+            conn.commit()
+            return sent, failed
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def drain_outbox(app, batch_size=OUTBOX_BATCH_SIZE):
+    """Send batches until nothing is due; returns total (sent, failed)"""
+    total_sent = total_failed = 0
+    while True:
+        with app.app_context():
+            sent, failed = drain_outbox_batch(batch_size)
+        total_sent += sent
+        total_failed += failed
+        if not sent and not failed:
+            return total_sent, total_failed
+
+class OutboxSender(threading.Thread):
+    """Daemon thread draining the outbox every poll interval or when woken"""
+
+    def __init__(self, app, poll_interval=OUTBOX_POLL_INTERVAL):
+        super().__init__(name='email-outbox', daemon=True)
+        self.app = app
+        self.poll_interval = poll_interval
+        self.wake_event = threading.Event()
+
+    def run(self):
+        while True:
+            self.wake_event.wait(self.poll_interval)
+            self.wake_event.clear()
+            try:
+                sent, failed = drain_outbox(self.app)
+                if sent or failed:
+                    print(f"Email outbox: sent {sent}, will retry {failed}")
+            except Exception as e:
+                print(f"Email outbox error: {e}")
+
+_sender = None
+_sender_pid = None
+_sender_lock = threading.Lock()
+
+def ensure_sender_started(app):
+    """Start this process's sender thread (threads do not survive fork)"""
+    global _sender, _sender_pid
+    if _sender is not None and _sender_pid == os.getpid():
+        return _sender
+    with _sender_lock:
+        if _sender is None or _sender_pid != os.getpid():
+            _sender = OutboxSender(app)
+            _sender_pid = os.getpid()
+            _sender.start()
+    return _sender
+
+def wake_sender():
+    """Ask the sender to drain now instead of at its next poll (call after commit)"""
+    if _sender is not None and _sender_pid == os.getpid():
+        _sender.wake_event.set()
+
+def init_app(app):
+    """Run a background sender in every worker unless MAIL_OUTBOX_WORKER=false"""
+    if os.getenv('MAIL_OUTBOX_WORKER', 'true').lower() != 'true':
+        return
+
+    @app.before_request
+    def start_outbox_sender():
+        ensure_sender_started(app)
+
+def main(argv):
+    from app import app
+
+    if '--once' in argv:
+        sent, failed = drain_outbox(app)
+        print(f"Email outbox: sent {sent}, will retry {failed}")
+        return 0
+
+    sender = OutboxSender(app)
+    sender.daemon = False
+    sender.start()
+    sender.join()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
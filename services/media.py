@@ -0,0 +1,212 @@
+"""
+Byte-range media serving for uploaded videos
+
+Handles single and multi-range requests (206, ``multipart/byteranges``),
+``If-Range``, ``If-None-Match`` / ``If-Modified-Since`` (304) and 416 for
+unsatisfiable ranges, so a seek only transfers the bytes being watched.
+
+Bodies are never read through Python when avoidable: behind nginx, set
+``MEDIA_ACCEL_REDIRECT`` (e.g. ``/protected-uploads/``, an ``internal``
+location aliased to the uploads directory) and nginx serves the file and
+its ranges itself. Under gunicorn, whole files and single ranges go out
+via ``wsgi.file_wrapper``, which gunicorn turns into ``sendfile()``.
+Otherwise ranges are sliced from an ``mmap``.
+"""
+import mimetypes
+import mmap
+import os
+import uuid
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+from flask import Response, abort, request
+from werkzeug.http import http_date, is_resource_modified, parse_date, parse_range_header, quote_etag, unquote_etag
+from werkzeug.security import safe_join
+
+UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'uploads')
+
+MEDIA_CACHE_CONTROL = 'public, max-age=86400'
+CHUNK_SIZE = 256 * 1024
+# More ranges than this (or overlapping ones adding up past the file size)
+# are answered with the whole file instead
+MAX_RANGES = 16
+
+for _type, _ext in [('video/mp4', '.mp4'), ('video/quicktime', '.mov'), ('video/webm', '.webm'),
+                    ('video/x-m4v', '.m4v'), ('image/webp', '.webp')]:
+    mimetypes.add_type(_type, _ext)
+
+def sniff_mimetype(path):
+    """Guess a media type from the file's magic bytes"""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(16)
+    except OSError:
+        return None
+    if head[4:8] == b'ftyp':
+        return 'video/quicktime' if head[8:12] == b'qt  ' else 'video/mp4'
+    if head.startswith(b'\x1a\x45\xdf\xa3'):
+        return 'video/webm'
+    if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith(b'\x89PNG'):
+        return 'image/png'
+    return None
+
+def detect_mimetype(path):
+    return mimetypes.guess_type(path)[0] or sniff_mimetype(path) or 'application/octet-stream'
+
+def file_etag(stat):
+    # Uploads are written once under unique names, so size + mtime identify the content
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+def resolve_ranges(header, size):
+    """
+    Turn a Range header into absolute, merged ``(start, stop)`` byte ranges
+
+    Returns:
+        list: Satisfiable ranges (stop exclusive), [] if none are satisfiable,
+            or None when the header should be ignored (absent, malformed or abusive)
+    """
+    parsed = parse_range_header(header)
+    if parsed is None or parsed.units != 'bytes' or len(parsed.ranges) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for start, stop in parsed.ranges:
+        if start < 0:
+            start, stop = max(0, size + start), size
+        else:
+            stop = size if stop is None else min(stop, size)
+        if start < stop:
+            ranges.append((start, stop))
+
+    # Merge overlapping and adjacent ranges, as RFC 9110 recommends
+    merged = []
+    for start, stop in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    if sum(stop - start for start, stop in ranges) > size:
+        return None
+    return merged
+
+def if_range_matches(etag, last_modified):
+    """False when If-Range names another version, in which case the whole file is sent"""
+    value = request.headers.get('If-Range')
+    if not value:
+        return True
+    if value.startswith(('"', 'W/')):
+        tag, weak = unquote_etag(value)
+        return not weak and tag == etag
+    date = parse_date(value)
+    return date is not None and date == last_modified
+
+def iter_range(f, start, stop):
+    """Yield bytes ``[start, stop)`` of an open file from an mmap, then close it"""
+    try:
+        if start >= stop:
+            # mmap cannot map an empty file, and there is nothing to send
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for offset in range(start, stop, CHUNK_SIZE):
+                yield mapped[offset:min(offset + CHUNK_SIZE, stop)]
+    finally:
+        f.close()
+
+def iter_multipart(f, ranges, size, mimetype, boundary):
+    try:
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for start, stop in ranges:
+                yield (f"\r\n--{boundary}\r\nContent-Type: {mimetype}\r\n"
+                       f"Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n").encode('ascii')
+                for offset in range(start, stop, CHUNK_SIZE):
+                    yield mapped[offset:min(offset + CHUNK_SIZE, stop)]
+            yield f"\r\n--{boundary}--\r\n".encode('ascii')
+    finally:
+        f.close()
+
+def multipart_length(ranges, size, mimetype, boundary):
+    length = len(f"\r\n--{boundary}--\r\n")
+    for start, stop in ranges:
+        length += len(f"\r\n--{boundary}\r\nContent-Type: {mimetype}\r\n"
+                      f"Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n") + stop - start
+    return length
+
+def file_body(f, start, stop, size):
+    """Body for bytes ``[start, stop)``, zero-copy under gunicorn when possible"""
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    if file_wrapper is not None and request.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn'):
+        # gunicorn sendfile()s exactly Content-Length bytes from the current offset
+        f.seek(start)
+        return file_wrapper(f, CHUNK_SIZE)
+    if start == 0 and stop == size:
+        return file_wrapper(f, CHUNK_SIZE) if file_wrapper is not None else iter_range(f, 0, size)
+    return iter_range(f, start, stop)
+
+def serve_media(directory, filename):
+    """
+    Serve ``directory/filename`` with full HTTP range and validator support
+
+    Returns:
+        Response: 200, 206, 304 or 416; aborts with 404 when the file is missing
+    """
+    path = safe_join(directory, filename)
+    if path is None:
+        abort(404)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        abort(404)
+    if not os.path.isfile(path):
+        abort(404)
+
+    size = stat.st_size
+    etag = file_etag(stat)
+    last_modified = datetime.fromtimestamp(int(stat.st_mtime), timezone.utc)
+    mimetype = detect_mimetype(path)
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': quote_etag(etag),
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': MEDIA_CACHE_CONTROL,
+    }
+
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return Response(status=304, headers=headers)
+
+    accel_prefix = os.getenv('MEDIA_ACCEL_REDIRECT')
+    if accel_prefix:
+        # nginx applies Range/If-Range itself and streams the file with sendfile
+        headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + quote(filename)
+        return Response(status=200, headers=headers, mimetype=mimetype)
+
+    ranges = None
+    if request.headers.get('Range') and if_range_matches(etag, last_modified):
+        ranges = resolve_ranges(request.headers['Range'], size)
+
+    if ranges == []:
+        headers['Content-Range'] = f"bytes */{size}"
+        return Response(status=416, headers=headers)
+
+    f = open(path, 'rb')
+    if not ranges:
+        headers['Content-Length'] = str(size)
+        return Response(file_body(f, 0, size, size), status=200, headers=headers,
+                        mimetype=mimetype, direct_passthrough=True)
+
+    if len(ranges) == 1:
+        start, stop = ranges[0]
+        headers['Content-Range'] = f"bytes {start}-{stop - 1}/{size}"
+        headers['Content-Length'] = str(stop - start)
+        return Response(file_body(f, start, stop, size), status=206, headers=headers,
+                        mimetype=mimetype, direct_passthrough=True)
+
+    boundary = uuid.uuid4().hex
+    headers['Content-Length'] = str(multipart_length(ranges, size, mimetype, boundary))
+    return Response(iter_multipart(f, ranges, size, mimetype, boundary), status=206, headers=headers,
+                    content_type=f"multipart/byteranges; boundary={boundary}", direct_passthrough=True)
@@ -0,0 +1,130 @@
+"""
+Prometheus metrics for requests and database work
+
+``init_app`` records, per endpoint: request latency, response status
+counts, in-flight requests, and the number of SQL statements and total DB
+time each request spent. DB work is measured by ``InstrumentedCursor``, the
+cursor class every pooled connection hands out, so no query site needs to
+change. ``/metrics`` serves everything in the Prometheus text format.
+
+Under gunicorn set ``PROMETHEUS_MULTIPROC_DIR`` to an empty, writable
+directory before the app is imported (see gunicorn.conf.py): each worker
+then writes its samples there and a scrape of any worker aggregates all of
+them, instead of returning whichever worker happened to answer.
+"""
+import os
+import time
+
+from flask import Response, g, has_app_context, request
+from psycopg2.extras import RealDictCursor
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Request latency by endpoint',
+    ['method', 'endpoint'], buckets=LATENCY_BUCKETS
+)
+REQUEST_COUNT = Counter(
+    'http_requests_total', 'Responses by endpoint and status code',
+    ['method', 'endpoint', 'status']
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight', 'Requests currently being handled',
+    multiprocess_mode='livesum'
+)
+REQUEST_DB_QUERIES = Histogram(
+    'http_request_db_queries', 'SQL statements executed per request',
+    ['endpoint'], buckets=QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_TIME = Histogram(
+    'http_request_db_duration_seconds', 'Cumulative DB time per request',
+    ['endpoint'], buckets=LATENCY_BUCKETS
+)
+DB_QUERY_LATENCY = Histogram(
+    'db_query_duration_seconds', 'Latency of individual SQL statements',
+    buckets=LATENCY_BUCKETS
+)
+
+# Callables invoked as hook(cursor, query, vars, duration) after every statement
+query_hooks = []
+
+def record_query(cursor, query, vars, duration):
+    DB_QUERY_LATENCY.observe(duration)
+    if has_app_context():
+        g.db_queries = g.get('db_queries', 0) + 1
+        g.db_time = g.get('db_time', 0.0) + duration
+    for hook in query_hooks:
+        try:
+            hook(cursor, query, vars, duration)
+        except Exception as e:
+            # Instrumentation must never fail the query it observed
+            print(f"Query hook error: {e}")
+
+class InstrumentedCursor(RealDictCursor):
+    """RealDictCursor that times every statement and reports it to record_query"""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record_query(self, query, vars, time.perf_counter() - start)
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            record_query(self, query, None, time.perf_counter() - start)
+
+def endpoint_label():
+    # Unmatched URLs share one label so 404 scans cannot blow up cardinality
+    return request.endpoint or 'unmatched'
+
+def start_request():
+    g.metrics_start = time.perf_counter()
+    g.db_queries = 0
+    g.db_time = 0.0
+    REQUESTS_IN_FLIGHT.inc()
+
+def finish_request(response):
+    start = g.get('metrics_start')
+    if start is not None:
+        endpoint = endpoint_label()
+        REQUEST_LATENCY.labels(request.method, endpoint).observe(time.perf_counter() - start)
+        REQUEST_COUNT.labels(request.method, endpoint, str(response.status_code)).inc()
+        REQUEST_DB_QUERIES.labels(endpoint).observe(g.get('db_queries', 0))
+        REQUEST_DB_TIME.labels(endpoint).observe(g.get('db_time', 0.0))
+    return response
+
+def end_request(exc=None):
+    if g.pop('metrics_start', None) is not None:
+        REQUESTS_IN_FLIGHT.dec()
+
+def metrics_response():
+    """Prometheus exposition of this process, or of every worker in multiprocess mode"""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        data = generate_latest(registry)
+    else:
+        data = generate_latest()
+    return Response(data, mimetype=CONTENT_TYPE_LATEST, headers={'Cache-Control': 'no-store'})
+
+def mark_worker_dead(pid):
+    """Drop a dead worker's live gauges (call from gunicorn's child_exit)"""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
+
+def init_app(app):
+    """Register request instrumentation and the /metrics route on the Flask app"""
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    app.teardown_request(end_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_response)
@@ -0,0 +1,264 @@
+"""
+Versioned schema migrations
+
+Migrations live in ``migrations/`` as ``NNNN_description.sql`` or
+``NNNN_description.py`` (defining ``upgrade(cur)``) and are applied in
+version order, each recorded in ``schema_version``. A migration runs in
+one transaction unless it starts with ``-- migrate: no-transaction`` (or
+sets ``NO_TRANSACTION = True``), in which case every statement commits on
+its own; that is required for ``CREATE INDEX CONCURRENTLY``.
+
+Run once per deploy, as a release step before the new app version starts
+(not in every replica's start command, and never at app import):
+
+    python -m services.migrations            # apply pending migrations
+    python -m services.migrations status     # list applied / pending
+
+Concurrent runs are serialized by an advisory lock; ``MIGRATION_LOCK_TIMEOUT``
+(seconds, default 600) bounds how long a second run waits for the first.
+"""
+import importlib.util
+import os
+import re
+import sys
+import time
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+NO_TRANSACTION_MARKER = '-- migrate: no-transaction'
+
+# Arbitrary constant identifying the migration advisory lock
+MIGRATION_LOCK_ID = 727274
+MIGRATION_LOCK_TIMEOUT = float(os.getenv('MIGRATION_LOCK_TIMEOUT', 600))
+MIGRATION_LOCK_POLL_SECONDS = 2
+
+_FILENAME_PATTERN = re.compile(r'^(\d+)_([\w-]+)\.(sql|py)$')
+_CONCURRENT_INDEX_PATTERN = re.compile(
+    r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)', re.IGNORECASE
+)
+
+class Migration:
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        self.kind = path.rsplit('.', 1)[1]
+
+    def load_sql(self):
+        with open(self.path, encoding='utf-8') as f:
+            return f.read()
+
+    def load_module(self):
+        spec = importlib.util.spec_from_file_location(f"migration_{self.version:04d}", self.path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    @property
+    def transactional(self):
+        if self.kind == 'sql':
+            return not self.load_sql().lstrip().lower().startswith(NO_TRANSACTION_MARKER)
+        return not getattr(self.load_module(), 'NO_TRANSACTION', False)
+
+def discover_migrations(directory=MIGRATIONS_DIR):
+    """
+    List migration files in version order
+
+    Raises:
+        ValueError: if two files share a version number
+    """
+    migrations = {}
+    for filename in sorted(os.listdir(directory)):
+        match = _FILENAME_PATTERN.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(f"Duplicate migration version {version}: {filename}")
+        migrations[version] = Migration(version, match.group(2), os.path.join(directory, filename))
+    return [migrations[version] for version in sorted(migrations)]
+
+def split_statements(sql):
+    """Split a no-transaction SQL file into statements (no function bodies allowed)"""
+    statements = []
+    for chunk in sql.split(';'):
+        lines = [line for line in chunk.splitlines() if line.strip() and not line.strip().startswith('--')]
+        if lines:
+            statements.append('\n'.join(lines))
+    return statements
+
+def get_connection():
+    return psycopg2.connect(os.getenv("DATABASE_URL"), cursor_factory=RealDictCursor)
+
+def ensure_version_table(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                applied_at TIMESTAMP DEFAULT NOW(),
+                duration_ms INTEGER
+            )
+        """)
+    conn.commit()
+
+def applied_versions(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT version FROM schema_version")
+        versions = {row['version'] for row in cur.fetchall()}
+    conn.commit()
+    return versions
+
+def _drop_invalid_index(cur, statement):
+    # A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind, which
+    # IF NOT EXISTS would then silently accept; drop it so the retry rebuilds it.
+    match = _CONCURRENT_INDEX_PATTERN.search(statement)
+    if not match:
+        return
+    cur.execute("""
+        SELECT 1 FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = %s AND NOT i.indisvalid
+    """, (match.group(1),))
+    if cur.fetchone():
+        print(f"  dropping invalid index {match.group(1)}")
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {match.group(1)}")
+
+def acquire_lock(conn, timeout=MIGRATION_LOCK_TIMEOUT):
+    """
+    Take the session advisory lock serializing migration runs
+
+    Polls pg_try_advisory_lock() in autocommit mode instead of blocking in
+    pg_advisory_lock(): a statement waiting on the lock holds a snapshot the
+    whole time, and CREATE INDEX CONCURRENTLY in the run holding the lock
+    waits for every older snapshot, so the two runs would wait on each other.
+    Between attempts this session has no statement or transaction open.
+
+    Raises:
+        TimeoutError: if another run still holds the lock after ``timeout`` seconds
+    """
+    deadline = time.time() + timeout
+    waiting = False
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            while True:
+                cur.execute("SELECT pg_try_advisory_lock(%s) AS locked", (MIGRATION_LOCK_ID,))
+                if cur.fetchone()['locked']:
+                    return
+                if time.time() >= deadline:
+                    raise TimeoutError(f"Another migration run still holds the lock after {timeout:g}s")
+                if not waiting:
+                    print("Waiting for another migration run to finish...")
+                    waiting = True
+                time.sleep(MIGRATION_LOCK_POLL_SECONDS)
+    finally:
+        conn.autocommit = False
+
+def apply_migration(conn, migration):
+    started = time.time()
+    transactional = migration.transactional
+
+    if transactional:
+        with conn.cursor() as cur:
+            if migration.kind == 'sql':
+                cur.execute(migration.load_sql())
+            else:
+                migration.load_module().upgrade(cur)
+    else:
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                if migration.kind == 'sql':
+                    for statement in split_statements(migration.load_sql()):
+                        _drop_invalid_index(cur, statement)
+                        cur.execute(statement)
+                else:
+                    migration.load_module().upgrade(cur)
+        finally:
+            conn.autocommit = False
+
+    duration_ms = int((time.time() - started) * 1000)
+    with conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO schema_version (version, name, duration_ms) VALUES (%s, %s, %s)",
+            (migration.version, migration.name, duration_ms)
+        )
+    conn.commit()
+    return duration_ms
+
+def run_migrations(directory=MIGRATIONS_DIR):
+    """
+    Apply every pending migration in order
+
+    Holds a session advisory lock (see acquire_lock) so concurrent deploys
+    apply each migration once.
+
+    Returns:
+        list: Versions applied by this run
+    """
+    migrations = discover_migrations(directory)
+    conn = get_connection()
+    try:
+        acquire_lock(conn)
+        ensure_version_table(conn)
+        done = applied_versions(conn)
+        applied = []
+        for migration in migrations:
+            if migration.version in done:
+                continue
+            print(f"Applying migration {migration.version:04d}_{migration.name}...")
+            try:
+                duration_ms = apply_migration(conn, migration)
+            except Exception:
+                if not conn.autocommit:
+                    conn.rollback()
+                raise
+            print(f"✓ {migration.version:04d}_{migration.name} ({duration_ms} ms)")
+            applied.append(migration.version)
+
+        if not applied:
+            print("Database schema is up to date")
+        return applied
+    finally:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+            conn.commit()
+        except psycopg2.Error:
+            pass
+        conn.close()
+
+def migration_status(directory=MIGRATIONS_DIR):
+    """
+    Returns:
+        list: (version, name, applied) for every migration file
+    """
+    migrations = discover_migrations(directory)
+    conn = get_connection()
+    try:
+        ensure_version_table(conn)
+        done = applied_versions(conn)
+    finally:
+        conn.close()
+    return [(migration.version, migration.name, migration.version in done) for migration in migrations]
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else 'upgrade'
+    if command == 'upgrade':
+        run_migrations()
+        return 0
+    if command == 'status':
+        for version, name, applied in migration_status():
+            print(f"{'applied' if applied else 'pending'}  {version:04d}_{name}")
+        return 0
+    print("Usage: python -m services.migrations [upgrade|status]")
+    return 2
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
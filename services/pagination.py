@@ -0,0 +1,117 @@
+import base64
+import json
+from datetime import datetime
+from urllib.parse import urlencode
+
+from flask import request
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+def parse_page_args(args, default_limit=50, max_limit=100):
+    """
+    Read ``limit`` / ``offset`` query parameters, clamped to sane bounds
+
+    Returns:
+        tuple: (limit, offset)
+    """
+    try:
+        limit = int(args.get('limit', default_limit))
+    except (TypeError, ValueError):
+        limit = default_limit
+    try:
+        offset = int(args.get('offset', 0))
+    except (TypeError, ValueError):
+        offset = 0
+    return max(1, min(limit, max_limit)), max(0, offset)
+
+def encode_keyset_cursor(*values):
+    """Encode a keyset position (JSON-serializable values) as an opaque URL-safe token"""
+    payload = json.dumps(list(values), separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_keyset_cursor(token, *types):
+    """
+    Decode a token produced by encode_keyset_cursor()
+
+    Args:
+        types: One converter per value, e.g. ``float, str``
+
+    Returns:
+        tuple: The converted values, or None when no cursor was given
+
+    Raises:
+        InvalidCursor: if the token is malformed
+    """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError('Wrong cursor arity')
+        return tuple(convert(value) for convert, value in zip(types, values))
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+def encode_cursor(created_at, row_id):
+    """Encode a (created_at, id) keyset position as an opaque URL-safe token"""
+    return encode_keyset_cursor(created_at.isoformat(), row_id)
+
+def decode_cursor(token):
+    """
+    Decode a token produced by encode_cursor()
+
+    Returns:
+        tuple: (created_at, id), or None when no cursor was given
+
+    Raises:
+        InvalidCursor: if the token is malformed
+    """
+    return decode_keyset_cursor(token, datetime.fromisoformat, int)
+
+def keyset_page(rows, limit, cursor_for=None):
+    """
+    Split a ``LIMIT limit + 1`` result into the page and the next cursor
+
+    Args:
+        cursor_for: Callable turning the last row into a cursor token;
+            defaults to the row's (created_at, id)
+
+    Returns:
+        tuple: (page rows, next_cursor or None)
+    """
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit and page:
+        last = page[-1]
+        if cursor_for is None:
+            next_cursor = encode_cursor(last['created_at'], last['id'])
+        else:
+            next_cursor = cursor_for(last)
+    return page, next_cursor
+
+def paginated_response(response, next_cursor):
+    """
+    Attach the next page to a list response without changing its JSON body
+
+    Sets ``X-Next-Cursor`` and an RFC 8288 ``Link: <...>; rel="next"`` header.
+    """
+    response.headers.update(next_page_headers(request.path, request.args, next_cursor))
+    return response
+
+def next_page_headers(path, args, next_cursor):
+    """
+    Headers pointing at the next page (empty on the last page)
+
+    Args:
+        args: Query arguments of the current request (a MultiDict)
+    """
+    if not next_cursor:
+        return {}
+    params = [(key, value) for key, value in args.items(multi=True) if key != 'cursor']
+    params.append(('cursor', next_cursor))
+    return {
+        'X-Next-Cursor': next_cursor,
+        'Link': f'<{path}?{urlencode(params)}>; rel="next"',
+    }
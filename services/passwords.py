@@ -0,0 +1,151 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import bcrypt
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool's queue is full; callers should answer 503"""
+
+_COST_PATTERN = re.compile(r'^\$2[abxy]?\$(\d{2})\$')
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a bounded thread pool
+
+    bcrypt releases the GIL while hashing, so a small pool keeps CPU-heavy
+    hashes off the request threads. At most ``workers + max_queue`` hashes
+    may be running or waiting; beyond that new requests are rejected
+    immediately instead of piling up behind slow logins.
+    """
+
+    def __init__(self, rounds=12, workers=2, max_queue=16, timeout=10):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stats = {
+            'hashes': 0,
+            'verifies': 0,
+            'rehashes': 0,
+            'rejected': 0,
+            'hash_time_total': 0.0,
+            'hash_time_max': 0.0,
+            'queue_wait_total': 0.0,
+            'queue_depth_max': 0,
+        }
+
+    def _run(self, operation, fn, *args):
+        # ``operation`` is the stats counter, bumped only once bcrypt has run
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise PasswordHasherBusy('Password hashing queue is full')
+
+        submitted = time.monotonic()
+        with self._lock:
+            self._pending += 1
+            self._stats['queue_depth_max'] = max(self._stats['queue_depth_max'], self._pending)
+
+        def timed():
+            started = time.monotonic()
+            try:
+                result = fn(*args)
+                with self._lock:
+                    self._stats[operation] += 1
+                return result
+            finally:
+                elapsed = time.monotonic() - started
+                with self._lock:
+                    self._stats['hash_time_total'] += elapsed
+                    self._stats['hash_time_max'] = max(self._stats['hash_time_max'], elapsed)
+                    self._stats['queue_wait_total'] += started - submitted
+
+        def done(_):
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+
+        future = self._executor.submit(timed)
+        future.add_done_callback(done)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise PasswordHasherBusy('Timed out waiting for password hashing')
+
+    def hash(self, password, rehash=False):
+        """Hash a password with the configured work factor"""
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        operation = 'rehashes' if rehash else 'hashes'
+        return self._run(operation, bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+    def verify(self, password, password_hash):
+        """Check a password against a stored bcrypt hash"""
+        return self._run('verifies', bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+
+    def needs_rehash(self, password_hash):
+        """True when a stored hash was made with a different work factor"""
+        match = _COST_PATTERN.match(password_hash or '')
+        return not match or int(match.group(1)) != self.rounds
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['queue_depth'] = self._pending
+        operations = stats['hashes'] + stats['rehashes'] + stats['verifies']
+        stats.update({
+            'rounds': self.rounds,
+            'workers': self.workers,
+            'max_queue': self.max_queue,
+            'hash_time_avg': (stats['hash_time_total'] / operations) if operations else 0.0,
+        })
+        return stats
+
+_hasher = None
+_hasher_pid = None
+_hasher_lock = threading.Lock()
+
+def get_hasher():
+    """Return this process's hasher; a forked worker gets a fresh thread pool"""
+    global _hasher, _hasher_pid
+    if _hasher is None or _hasher_pid != os.getpid():
+        with _hasher_lock:
+            if _hasher is None or _hasher_pid != os.getpid():
+                _hasher = PasswordHasher(
+                    rounds=int(os.getenv('BCRYPT_ROUNDS', 12)),
+                    workers=int(os.getenv('PASSWORD_HASH_WORKERS', 2)),
+                    max_queue=int(os.getenv('PASSWORD_HASH_QUEUE', 16)),
+                    timeout=float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+                )
+                _hasher_pid = os.getpid()
+    return _hasher
+
+def get_hasher_stats():
+    """Hashing statistics for this worker, or None if nothing was hashed yet"""
+    return _hasher.stats() if _hasher is not None and _hasher_pid == os.getpid() else None
+
+def hash_password(password):
+    return get_hasher().hash(password)
+
+def verify_password(password, password_hash):
+    return get_hasher().verify(password, password_hash)
+
+def rehash_if_needed(password, password_hash):
+    """
+    Return a new hash when ``password_hash`` uses an outdated work factor
+
+    Only call after ``password`` was verified against ``password_hash``.
+
+    Returns:
+        str: The new hash, or None if the stored one is current
+    """
+    hasher = get_hasher()
+    if not hasher.needs_rehash(password_hash):
+        return None
+    return hasher.hash(password, rehash=True)
@@ -0,0 +1,220 @@
+"""
+Bulk PR import
+
+Validates a whole CSV or JSON batch up front (one query checks every
+username), inserts the valid rows with a single multi-row INSERT in one
+transaction, and recomputes ELO, user standings and team standings once for
+the affected users at the end, instead of once per PR as ``submit_pr`` does.
+Rows carrying a ``created_at`` that already exist (same user, lift, weight
+and time) are skipped, so a failed or repeated import can be re-run.
+
+CSV columns / JSON keys: ``username``, ``lift_type``, ``weight`` and optional
+``video_url`` (an Instagram link) and ``created_at`` (ISO 8601 date or
+datetime; defaults to now).
+
+    python -m services.pr_import FILE.csv|FILE.json|- [--dry-run] [--strict]
+"""
+import csv
+import io
+import json
+import sys
+import time
+from datetime import datetime, timezone
+
+from psycopg2.extras import execute_values
+
+from services.supabase import get_db_connection, recalculate_elo
+from services.standings import refresh_user_standings, refresh_team_standings
+from services.cache import invalidate
+from services.profiles import invalidate_profiles
+
+LIFT_TYPES = {'bench', 'squat', 'deadlift'}
+MAX_WEIGHT = 1000
+PR_IMPORT_MAX_ROWS = 50000
+# Per-row errors included in a report; the counts always cover every row
+MAX_REPORTED_ERRORS = 1000
+
+class ImportFormatError(ValueError):
+    """Raised when a batch cannot be parsed at all"""
+
+def parse_csv(text):
+    reader = csv.DictReader(io.StringIO(text))
+    if not reader.fieldnames or not {'username', 'lift_type', 'weight'} <= {name.strip() for name in reader.fieldnames}:
+        raise ImportFormatError('CSV header must include username, lift_type and weight')
+    return [{(key or '').strip(): value for key, value in row.items()} for row in reader]
+
+def parse_json(data):
+    """Accept a list of PR objects or {"prs": [...]}"""
+    if isinstance(data, dict):
+        data = data.get('prs')
+    if not isinstance(data, list):
+        raise ImportFormatError('JSON body must be a list of PRs or {"prs": [...]}')
+    return data
+
+def parse_created_at(value):
+    created_at = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    if created_at.tzinfo:
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    if created_at > datetime.now(timezone.utc).replace(tzinfo=None):
+        raise ValueError('created_at is in the future')
+    return created_at
+
+def validate_row(row):
+    """
+    Returns:
+        tuple: (values, errors) where values is (username, lift_type, weight, video_url, created_at)
+    """
+    if not isinstance(row, dict):
+        return None, ['not an object']
+    errors = []
+    username = str(row.get('username') or '').strip()
+    if not username:
+        errors.append('username is required')
+    lift_type = str(row.get('lift_type') or '').strip().lower()
+    if lift_type not in LIFT_TYPES:
+        errors.append(f"lift_type must be one of {', '.join(sorted(LIFT_TYPES))}")
+    weight = None
+    try:
+        weight = float(row.get('weight'))
+        if not 0 < weight <= MAX_WEIGHT:
+            errors.append(f'weight must be between 0 and {MAX_WEIGHT}')
+    except (TypeError, ValueError):
+        errors.append('weight must be a number')
+    video_url = str(row.get('video_url') or row.get('instagram_url') or '').strip() or None
+    if video_url and 'instagram.com' not in video_url:
+        errors.append('video_url must be an Instagram URL')
+    created_at = None
+    if row.get('created_at'):
+        try:
+            created_at = parse_created_at(row['created_at'])
+        except ValueError as e:
+            errors.append(f'invalid created_at: {e}')
+    return (username, lift_type, weight, video_url, created_at), errors
+
+def import_prs(rows, dry_run=False, strict=False):
+    """
+    Validate and insert a batch of PRs in one transaction
+
+    Args:
+        rows (list): Parsed rows (dicts)
+        dry_run (bool): Validate only; nothing is written
+        strict (bool): Import nothing if any row is invalid
+
+    Returns:
+        dict: {'received', 'valid', 'imported', 'duplicates', 'rejected', 'users', 'errors',
+            'dry_run', 'duration_ms', 'rows_per_second'}
+    """
+    started = time.perf_counter()
+    if len(rows) > PR_IMPORT_MAX_ROWS:
+        raise ImportFormatError(f'At most {PR_IMPORT_MAX_ROWS} rows per batch')
+
+    errors = []
+    candidates = []     # (row number, values)
+    for number, row in enumerate(rows, start=1):
+        values, row_errors = validate_row(row)
+        if row_errors:
+            errors.append({'row': number, 'errors': row_errors})
+        else:
+            candidates.append((number, values))
+
+    imported = duplicates = 0
+    valid = []
+    usernames = []
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT username FROM users WHERE username = ANY(%s) AND is_active = TRUE",
+                        (list({values[0] for _, values in candidates}),))
+            known = {row['username'] for row in cur.fetchall()}
+
+            seen = {}
+            for number, values in candidates:
+                if values[0] not in known:
+                    errors.append({'row': number, 'errors': [f"unknown user '{values[0]}'"]})
+                    continue
+                if values[4] is not None:
+                    key = values[:3] + (values[4],)
+                    if key in seen:
+                        errors.append({'row': number, 'errors': [f'duplicate of row {seen[key]}']})
+                        continue
+                    seen[key] = number
+                valid.append(values)
+
+            if valid and not dry_run and not (strict and errors):
+                inserted = execute_values(cur, """
+                    INSERT INTO prs (username, lift_type, weight, video_url, created_at)
+                    SELECT v.username, v.lift_type, v.weight, v.video_url, COALESCE(v.created_at, NOW())
+                    FROM (VALUES %s) AS v(username, lift_type, weight, video_url, created_at)
+                    WHERE v.created_at IS NULL OR NOT EXISTS (
+                        SELECT 1 FROM prs p
+                        WHERE p.username = v.username AND p.lift_type = v.lift_type
+                          AND p.weight = v.weight AND p.created_at = v.created_at
+                    )
+                    RETURNING username
+                """, valid, template='(%s::varchar, %s::varchar, %s::float8, %s::text, %s::timestamp)',
+                    page_size=1000, fetch=True)
+                imported = len(inserted)
+                duplicates = len(valid) - imported
+                usernames = list({row['username'] for row in inserted})
+
+                # Rescore every affected user once, in the same transaction as the PRs
+                recalculate_elo(cur, usernames)
+                refresh_user_standings(cur, usernames)
+                refresh_team_standings(cur, usernames=usernames)
+                conn.commit()
+            else:
+                conn.rollback()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    if imported:
+        invalidate('leaderboard', 'videos', 'teams')
+        invalidate_profiles(*usernames)
+
+    errors.sort(key=lambda error: error['row'])
+    duration = time.perf_counter() - started
+    return {
+        'received': len(rows),
+        'valid': len(valid),
+        'imported': imported,
+        'duplicates': duplicates,
+        'rejected': len(errors),
+        'users': len(usernames),
+        'errors': errors[:MAX_REPORTED_ERRORS],
+        'dry_run': dry_run,
+        'duration_ms': round(duration * 1000, 1),
+        'rows_per_second': round(len(rows) / duration, 1) if duration > 0 else None,
+    }
+
+def main(argv):
+    paths = [arg for arg in argv[1:] if not arg.startswith('--')]
+    if len(paths) != 1:
+        print("Usage: python -m services.pr_import FILE.csv|FILE.json|- [--dry-run] [--strict]")
+        return 2
+
+    path = paths[0]
+    if path == '-':
+        text = sys.stdin.read()
+    else:
+        with open(path, encoding='utf-8-sig') as f:
+            text = f.read()
+    try:
+        rows = parse_json(json.loads(text)) if path.endswith('.json') else parse_csv(text)
+        report = import_prs(rows, dry_run='--dry-run' in argv, strict='--strict' in argv)
+    except (ImportFormatError, json.JSONDecodeError) as e:
+        print(f"Cannot import {path}: {e}")
+        return 1
+
+    for error in report['errors']:
+        print(f"row {error['row']}: {'; '.join(error['errors'])}")
+    imported = report['valid'] if report['dry_run'] else report['imported']
+    print(f"{'Validated' if report['dry_run'] else 'Imported'} {imported} of {report['received']} PRs "
+          f"({report['rejected']} rejected, {report['duplicates']} already present) for {report['users']} users "
+          f"in {report['duration_ms']:.0f}ms ({report['rows_per_second']} rows/s)")
+    return 1 if report['rejected'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
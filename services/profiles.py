@@ -0,0 +1,115 @@
+from datetime import datetime
+
+from services.supabase import get_db_connection
+from services.scoring import calculate_dots_score
+from services.cache import invalidate
+
+PROFILE_CACHE_TTL = 300
+PROFILE_HISTORY_LIMIT = 20
+PROFILE_VIDEOS_LIMIT = 10
+
+# The user, best lift per type, recent history and recent videos in one round trip
+PROFILE_SQL = """
+    WITH target AS (
+        SELECT username, display_name, email, flag, team, weight, gender, elo, created_at
+        FROM users
+        WHERE username = %(username)s AND is_active = TRUE
+    ), best AS (
+        SELECT DISTINCT ON (lift_type) lift_type, weight AS max_weight, video_url, created_at
+        FROM prs
+        WHERE username = %(username)s
+        ORDER BY lift_type, weight DESC, created_at DESC
+    ), history AS (
+        SELECT id, lift_type, weight, video_url, created_at
+        FROM prs
+        WHERE username = %(username)s
+        ORDER BY created_at DESC
+        LIMIT %(history_limit)s
+    ), videos AS (
+        SELECT id, lift_type, weight, video_url, poster_url, thumbnail_url, created_at
+        FROM prs
+        WHERE username = %(username)s AND video_url IS NOT NULL AND video_url != ''
+        ORDER BY created_at DESC
+        LIMIT %(videos_limit)s
+    )
+    SELECT t.*,
+           (SELECT COALESCE(json_agg(b ORDER BY b.lift_type), '[]') FROM best b) AS prs,
+           (SELECT COALESCE(json_agg(h ORDER BY h.created_at DESC), '[]') FROM history h) AS history,
+           (SELECT COALESCE(json_agg(v ORDER BY v.created_at DESC), '[]') FROM videos v) AS videos
+    FROM target t
+"""
+
+USER_COLUMNS = ['username', 'display_name', 'email', 'flag', 'team', 'weight', 'gender', 'elo', 'created_at']
+
+def profile_namespace(username):
+    """Cache namespace holding one user's profile document"""
+    return f"profile:{username}"
+
+def invalidate_profiles(*usernames):
+    """Drop the cached profile documents of users whose users/prs rows changed (call after commit)"""
+    namespaces = [profile_namespace(username) for username in set(usernames) if username]
+    if namespaces:
+        invalidate(*namespaces)
+
+def _parse_timestamps(rows):
+    # json_agg renders timestamps as ISO strings; restore datetimes so the
+    # document serializes exactly like rows fetched directly
+    for row in rows:
+        if row.get('created_at'):
+            row['created_at'] = datetime.fromisoformat(row['created_at'])
+    return rows
+
+def fetch_profile(username):
+    """
+    Build a user's profile document with a single query
+
+    Returns:
+        dict: {'user', 'prs', 'history', 'videos', 'dots_score', 'total_lifted', 'current_prs'},
+            or None if the user does not exist or is inactive
+    """
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(PROFILE_SQL, {
+                'username': username,
+                'history_limit': PROFILE_HISTORY_LIMIT,
+                'videos_limit': PROFILE_VIDEOS_LIMIT,
+            })
+            row = cur.fetchone()
+    finally:
+        conn.close()
+
+    return build_profile(row)
+
+def build_profile(row):
+    """
+    Turn the PROFILE_SQL row into the profile document (None when there is no row)
+
+    Shared by the sync and async (services.async_reads) read paths.
+    """
+    if not row:
+        return None
+
+    user_dict = {column: row[column] for column in USER_COLUMNS}
+    prs = _parse_timestamps(row['prs'])
+
+    # Calculate DOTS score if user has all required data
+    dots_score = None
+    total_lifted = 0
+    current_prs = {'bench': 0, 'squat': 0, 'deadlift': 0}
+    for pr in prs:
+        current_prs[pr['lift_type']] = pr['max_weight']
+        total_lifted += pr['max_weight']
+
+    if user_dict['weight'] and user_dict['gender'] and all(current_prs.values()):
+        dots_score = calculate_dots_score(total_lifted, user_dict['weight'], user_dict['gender'])
+
+    return {
+        'user': user_dict,
+        'prs': prs,
+        'history': _parse_timestamps(row['history']),
+        'videos': _parse_timestamps(row['videos']),
+        'dots_score': dots_score,
+        'total_lifted': total_lifted,
+        'current_prs': current_prs
+    }
@@ -0,0 +1,110 @@
+"""
+Per-lift progress series for the profile charts
+
+All three series come from one query over ``idx_prs_username_created`` and
+are bounded by an optional date range. Series longer than ``max_points``
+are downsampled with Largest-Triangle-Three-Buckets, which keeps the first
+and last points and the peaks and dips that give the curve its shape, so
+the payload and chart render time stay flat however long a user has logged.
+"""
+from services.supabase import get_db_connection
+
+LIFT_TYPES = ['bench', 'squat', 'deadlift']
+
+PROGRESS_DEFAULT_POINTS = 200
+PROGRESS_MAX_POINTS = 1000
+# Below this there is not enough room for LTTB's first/last points plus buckets
+PROGRESS_MIN_POINTS = 3
+
+def lttb(points, threshold):
+    """
+    Downsample ``(x, y, value)`` points with Largest-Triangle-Three-Buckets
+
+    Args:
+        points (list): Tuples sorted by x; x and y must be numbers
+        threshold (int): Number of points to keep
+
+    Returns:
+        list: At most ``threshold`` of the input tuples, in order
+    """
+    if threshold >= len(points) or threshold < PROGRESS_MIN_POINTS:
+        return list(points)
+
+    sampled = [points[0]]
+    bucket_size = (len(points) - 2) / (threshold - 2)
+    selected = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        stop = int((bucket + 1) * bucket_size) + 1
+
+        # Average of the next bucket (the last point for the final bucket)
+        next_start = stop
+        next_stop = min(int((bucket + 2) * bucket_size) + 1, len(points))
+        if next_start >= next_stop:
+            next_start, next_stop = len(points) - 1, len(points)
+        count = next_stop - next_start
+        avg_x = sum(point[0] for point in points[next_start:next_stop]) / count
+        avg_y = sum(point[1] for point in points[next_start:next_stop]) / count
+
+        # Keep the point forming the largest triangle with the last kept point and that average
+        ax, ay = points[selected][0], points[selected][1]
+        best_area = -1
+        best = start
+        for i in range(start, stop):
+            area = abs((ax - avg_x) * (points[i][1] - ay) - (ax - points[i][0]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = i
+        sampled.append(points[best])
+        selected = best
+
+    sampled.append(points[-1])
+    return sampled
+
+def fetch_progress(username, start=None, end=None, max_points=PROGRESS_DEFAULT_POINTS):
+    """
+    Load a user's bench/squat/deadlift series in one query and downsample them
+
+    Args:
+        start (datetime): Only PRs logged at or after this time
+        end (datetime): Only PRs logged before this time
+
+    Returns:
+        dict: lift_type -> [{'weight', 'date'}] in date order,
+            or None if the user does not exist or is inactive
+    """
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            # LEFT JOIN keeps one row for a user without matching PRs, telling them apart from a missing user
+            cur.execute("""
+                SELECT p.lift_type, p.weight, p.created_at
+                FROM users u
+                LEFT JOIN prs p
+                  ON p.username = u.username
+                 AND p.lift_type = ANY(%(lift_types)s)
+                 AND (%(start)s::timestamptz IS NULL OR p.created_at >= %(start)s)
+                 AND (%(end)s::timestamptz IS NULL OR p.created_at < %(end)s)
+                WHERE u.username = %(username)s AND u.is_active = TRUE
+                ORDER BY p.created_at ASC, p.id ASC
+            """, {'username': username, 'lift_types': LIFT_TYPES, 'start': start, 'end': end})
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+
+    if not rows:
+        return None
+
+    series = {lift_type: [] for lift_type in LIFT_TYPES}
+    for row in rows:
+        if row['lift_type'] is None or row['created_at'] is None:
+            continue
+        series[row['lift_type']].append((row['created_at'].timestamp(), row['weight'], row['created_at']))
+
+    return {
+        lift_type: [
+            {'weight': weight, 'date': created_at.isoformat()}
+            for _, weight, created_at in lttb(points, max_points)
+        ]
+        for lift_type, points in series.items()
+    }
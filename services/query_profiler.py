@@ -0,0 +1,263 @@
+"""
+Slow-query log with sampled EXPLAIN plans
+
+Every statement run through ``InstrumentedCursor`` is timed and aggregated
+under its normalized text (literals and parameters replaced by ``?``).
+Executions slower than ``SLOW_QUERY_THRESHOLD_MS`` go into a ring buffer of
+the last ``SLOW_QUERY_TOP_N`` slow queries; a sample of the slow SELECTs is
+re-run by a background thread as ``EXPLAIN (ANALYZE, BUFFERS)`` on its own
+connection, inside a read-only transaction that is rolled back, so the
+request never waits for the plan and nothing can be written twice. The
+index names found in captured plans are counted, showing which indexes the
+slow paths actually use.
+
+Each gunicorn worker keeps its own log. Read it with the admin endpoint
+``GET /api/admin/slow_queries`` (``DELETE`` resets it) or:
+
+    python -m services.query_profiler dump [BASE_URL]   # a running worker's log
+    python -m services.query_profiler indexes           # pg_stat_user_indexes scan counts
+"""
+import json
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import urllib.request
+from collections import deque
+from datetime import datetime, timezone
+
+from psycopg2 import extensions
+
+from services.supabase import get_db_connection, get_pool
+from services.metrics import query_hooks
+
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 200))
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.getenv('SLOW_QUERY_EXPLAIN_SAMPLE_RATE', 0.1))
+SLOW_QUERY_TOP_N = int(os.getenv('SLOW_QUERY_TOP_N', 50))
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.getenv('SLOW_QUERY_EXPLAIN_TIMEOUT_MS', 5000))
+
+# Distinct normalized statements tracked; the cheapest are dropped beyond this
+MAX_STATEMENTS = 500
+EXPLAIN_QUEUE_SIZE = 20
+MAX_STATEMENT_LENGTH = 2000
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'|%\(\w+\)s|%s|\b\d+(?:\.\d+)?\b")
+_VALUE_LIST = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_PLAN_INDEX = re.compile(r"(?:Index(?: Only)? Scan(?: Backward)? using|Bitmap Index Scan on) (\S+)")
+
+def statement_text(cursor, query):
+    if isinstance(query, bytes):
+        return query.decode('utf-8', 'replace')
+    if hasattr(query, 'as_string'):
+        return query.as_string(cursor)
+    return str(query)
+
+def normalize(sql):
+    """Collapse whitespace and replace literals and parameters with ``?``"""
+    normalized = _LITERAL.sub('?', ' '.join(sql.split()))
+    return _VALUE_LIST.sub('(...)', normalized)[:MAX_STATEMENT_LENGTH]
+
+def is_explainable(normalized):
+    # Only reads are re-run; the read-only transaction rejects anything else regardless
+    return normalized.split(' ', 1)[0].upper() in ('SELECT', 'WITH')
+
+class QueryProfiler:
+    """Per-process statement statistics, slow-query ring buffer and EXPLAIN sampler"""
+
+    def __init__(self, threshold_ms=SLOW_QUERY_THRESHOLD_MS, sample_rate=SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+                 top_n=SLOW_QUERY_TOP_N):
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.top_n = top_n
+        self._lock = threading.Lock()
+        self._statements = {}   # normalized -> {'calls', 'total_ms', 'max_ms', 'slow_calls'}
+        self._slow = deque(maxlen=top_n)
+        self._index_usage = {}
+        self._explain_queue = queue.Queue(maxsize=EXPLAIN_QUEUE_SIZE)
+        self._explainer = None
+        self._stats = {'statements_seen': 0, 'slow': 0, 'explains': 0, 'explain_errors': 0, 'explains_dropped': 0}
+
+    def observe(self, cursor, query, vars, duration):
+        sql = statement_text(cursor, query)
+        if sql.lstrip()[:7].upper() == 'EXPLAIN':
+            return
+        normalized = normalize(sql)
+        duration_ms = duration * 1000
+        slow = duration_ms >= self.threshold_ms
+
+        with self._lock:
+            self._stats['statements_seen'] += 1
+            entry = self._statements.get(normalized)
+            if entry is None:
+                if len(self._statements) >= MAX_STATEMENTS:
+                    cheapest = min(self._statements, key=lambda key: self._statements[key]['total_ms'])
+                    del self._statements[cheapest]
+                entry = self._statements[normalized] = {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'slow_calls': 0}
+            entry['calls'] += 1
+            entry['total_ms'] += duration_ms
+            entry['max_ms'] = max(entry['max_ms'], duration_ms)
+            if not slow:
+                return
+            entry['slow_calls'] += 1
+            self._stats['slow'] += 1
+            sample = {
+                'statement': normalized,
+                'duration_ms': round(duration_ms, 2),
+                'at': datetime.now(timezone.utc).isoformat(),
+                'plan': None,
+            }
+            self._slow.append(sample)
+
+        bound = getattr(cursor, 'query', None)
+        if bound and is_explainable(normalized) and random.random() < self.sample_rate:
+            self._start_explainer()
+            try:
+                self._explain_queue.put_nowait((sample, bound))
+            except queue.Full:
+                with self._lock:
+                    self._stats['explains_dropped'] += 1
+
+    def _start_explainer(self):
+        if self._explainer is None:
+            with self._lock:
+                if self._explainer is None:
+                    self._explainer = threading.Thread(target=self._run_explainer, name='query-explainer', daemon=True)
+                    self._explainer.start()
+
+    def _run_explainer(self):
+        while True:
+            sample, bound = self._explain_queue.get()
+            try:
+                plan = self.explain(bound)
+            except Exception as e:
+                with self._lock:
+                    self._stats['explain_errors'] += 1
+                    sample['plan'] = f"EXPLAIN failed: {e}"
+                continue
+            with self._lock:
+                self._stats['explains'] += 1
+                sample['plan'] = plan
+                for index in _PLAN_INDEX.findall(plan):
+                    self._index_usage[index] = self._index_usage.get(index, 0) + 1
+
+    def explain(self, bound):
+        """EXPLAIN (ANALYZE, BUFFERS) a bound statement in a read-only transaction that is rolled back"""
+        pool = get_pool()
+        conn = pool.getconn()
+        discard = False
+        try:
+            # A plain cursor: the explain itself is neither timed nor profiled
+            with conn.cursor(cursor_factory=extensions.cursor) as cur:
+                cur.execute("SET TRANSACTION READ ONLY")
+                cur.execute("SELECT set_config('statement_timeout', %s, true)", (str(SLOW_QUERY_EXPLAIN_TIMEOUT_MS),))
+                cur.execute(b"EXPLAIN (ANALYZE, BUFFERS) " + bound)
+                return '\n'.join(row[0] for row in cur.fetchall())
+        except Exception:
+            discard = conn.closed != 0
+            raise
+        finally:
+            if not conn.closed:
+                conn.rollback()
+            pool.putconn(conn, discard=discard)
+
+    def report(self):
+        """Top statements by total time, recent slow executions (newest first) and plan index usage"""
+        with self._lock:
+            statements = sorted(self._statements.items(), key=lambda item: item[1]['total_ms'], reverse=True)
+            return {
+                'pid': os.getpid(),
+                'threshold_ms': self.threshold_ms,
+                'explain_sample_rate': self.sample_rate,
+                'stats': dict(self._stats),
+                'statements': [
+                    {'statement': statement, 'calls': entry['calls'], 'slow_calls': entry['slow_calls'],
+                     'total_ms': round(entry['total_ms'], 2), 'mean_ms': round(entry['total_ms'] / entry['calls'], 2),
+                     'max_ms': round(entry['max_ms'], 2)}
+                    for statement, entry in statements[:self.top_n]
+                ],
+                'slow': [dict(sample) for sample in reversed(self._slow)],
+                'index_usage': dict(sorted(self._index_usage.items(), key=lambda item: -item[1])),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._slow.clear()
+            self._index_usage.clear()
+
+_profiler = None
+_profiler_pid = None
+_profiler_lock = threading.Lock()
+
+def get_profiler():
+    """Return this process's query profiler (threads and buffers do not survive fork)"""
+    global _profiler, _profiler_pid
+    if _profiler is None or _profiler_pid != os.getpid():
+        with _profiler_lock:
+            if _profiler is None or _profiler_pid != os.getpid():
+                _profiler = QueryProfiler()
+                _profiler_pid = os.getpid()
+    return _profiler
+
+def observe_query(cursor, query, vars, duration):
+    get_profiler().observe(cursor, query, vars, duration)
+
+def init_app(app):
+    """Profile every statement unless QUERY_PROFILER=false"""
+    if os.getenv('QUERY_PROFILER', 'true').lower() != 'true':
+        return
+    if observe_query not in query_hooks:
+        query_hooks.append(observe_query)
+
+def print_report(report):
+    print(f"Worker {report['pid']}: {report['stats']['statements_seen']} statements, "
+          f"{report['stats']['slow']} slower than {report['threshold_ms']:.0f}ms, "
+          f"{report['stats']['explains']} explained")
+    print(f"\n{'calls':>8} {'slow':>6} {'total ms':>11} {'mean ms':>9} {'max ms':>9}  statement")
+    for entry in report['statements']:
+        print(f"{entry['calls']:>8} {entry['slow_calls']:>6} {entry['total_ms']:>11.1f} {entry['mean_ms']:>9.2f} "
+              f"{entry['max_ms']:>9.1f}  {entry['statement'][:120]}")
+    if report['index_usage']:
+        print("\nIndexes in captured plans:")
+        for index, count in report['index_usage'].items():
+            print(f"  {count:>5}  {index}")
+    for sample in report['slow']:
+        if sample['plan']:
+            print(f"\n-- {sample['duration_ms']}ms at {sample['at']}\n-- {sample['statement']}\n{sample['plan']}")
+
+def print_index_usage():
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT relname AS table_name, indexrelname AS index_name, idx_scan, idx_tup_read,
+                       pg_size_pretty(pg_relation_size(indexrelid)) AS size
+                FROM pg_stat_user_indexes
+                ORDER BY idx_scan ASC, relname, indexrelname
+            """)
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+    print(f"{'scans':>10} {'tuples read':>12} {'size':>9}  index")
+    for row in rows:
+        print(f"{row['idx_scan']:>10} {row['idx_tup_read']:>12} {row['size']:>9}  {row['table_name']}.{row['index_name']}")
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else None
+    if command == 'dump':
+        base_url = argv[2] if len(argv) > 2 else f"http://localhost:{os.getenv('PORT', 8000)}"
+        request = urllib.request.Request(base_url.rstrip('/') + '/api/admin/slow_queries',
+                                         headers={'X-Admin-Token': os.getenv('ADMIN_API_TOKEN', '')})
+        with urllib.request.urlopen(request, timeout=10) as response:
+            print_report(json.load(response))
+        return 0
+    if command == 'indexes':
+        print_index_usage()
+        return 0
+    print("Usage: python -m services.query_profiler [dump [BASE_URL] | indexes]")
+    return 2
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
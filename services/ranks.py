@@ -0,0 +1,270 @@
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+from services.supabase import get_db_connection
+from services.cache import get_cache
+
+RANK_WINDOW = 10
+RANK_MAX_WINDOW = 50
+RANK_BULK_MAX_USERS = 100
+
+# Re-read standings written this long before the last sync as well, so rows
+# from transactions that started earlier but committed later are not missed
+SYNC_OVERLAP = timedelta(seconds=60)
+
+class SegmentIndex:
+    """
+    Users of one leaderboard segment, sorted like the leaderboard
+
+    Keys are ``(-dots_score, username)`` so list position equals leaderboard
+    position; rank lookups are a binary search.
+    """
+
+    def __init__(self):
+        self.keys = []
+
+    def add(self, key):
+        insort(self.keys, key)
+
+    def remove(self, key):
+        position = bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            del self.keys[position]
+
+    def position(self, key):
+        """Zero-based leaderboard position of ``key``, or None if absent"""
+        position = bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            return position
+        return None
+
+    def __len__(self):
+        return len(self.keys)
+
+def segments_of(gender, flag):
+    """Every (gender, country) segment a user belongs to; None means 'all'"""
+    return {(None, None), (gender, None), (None, flag), (gender, flag)}
+
+class RankIndex:
+    """
+    In-memory rank index over user_standings, one sorted list per segment
+
+    The overall segment is built on load; gender/country segments are built
+    the first time they are asked for. The index is kept current by applying
+    the standings rows changed since the last sync: immediately after a write
+    that bumped the 'leaderboard' cache generation, and otherwise at most
+    every ``sync_interval`` seconds. Users removed from the standings are
+    picked up from user_standings_removals in the same sync. A full reload
+    every ``max_age`` seconds bounds any remaining drift (e.g. rows changed
+    by hand).
+    """
+
+    def __init__(self, sync_interval=5, max_age=600):
+        self.sync_interval = sync_interval
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._rows = {}         # username -> (gender, flag, dots_score)
+        self._segments = {}     # (gender, flag) -> SegmentIndex
+        self._loaded_at = None
+        self._synced_at = 0.0
+        self._watermark = None
+        self._generation = None
+        self._stats = {'loads': 0, 'syncs': 0, 'rows_applied': 0, 'lookups': 0}
+
+    @staticmethod
+    def _key(row):
+        return (-row[2], row[0])
+
+    def _fetch(self, since=None):
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                if since is None:
+                    cur.execute("SELECT username, gender, flag, dots_score, updated_at FROM user_standings")
+                else:
+                    # Upserts and removals in commit order; a removal has no dots_score
+                    cur.execute("""
+                        SELECT username, gender, flag, dots_score, updated_at
+                        FROM user_standings
+                        WHERE updated_at > %s
+                        UNION ALL
+                        SELECT username, NULL, NULL, NULL, removed_at
+                        FROM user_standings_removals
+                        WHERE removed_at > %s
+                        ORDER BY updated_at
+                    """, (since, since))
+                return cur.fetchall()
+        finally:
+            conn.close()
+
+    def _load(self):
+        rows = self._fetch()
+        self._rows = {row['username']: (row['gender'], row['flag'], row['dots_score']) for row in rows}
+        overall = SegmentIndex()
+        overall.keys = sorted((-score, username) for username, (_, _, score) in self._rows.items())
+        self._segments = {(None, None): overall}
+        self._watermark = max((row['updated_at'] for row in rows if row['updated_at']), default=None)
+        self._loaded_at = self._synced_at = time.monotonic()
+        self._stats['loads'] += 1
+
+    def _apply(self, rows):
+        for row in rows:
+            username = row['username']
+            old = self._rows.get(username)
+            if old is not None:
+                for segment in segments_of(old[0], old[1]):
+                    if segment in self._segments:
+                        self._segments[segment].remove((-old[2], username))
+            if row['dots_score'] is None:
+                self._rows.pop(username, None)
+            else:
+                self._rows[username] = (row['gender'], row['flag'], row['dots_score'])
+                for segment in segments_of(row['gender'], row['flag']):
+                    if segment in self._segments:
+                        self._segments[segment].add((-row['dots_score'], username))
+            if row['updated_at'] and (self._watermark is None or row['updated_at'] > self._watermark):
+                self._watermark = row['updated_at']
+        self._stats['rows_applied'] += len(rows)
+
+    def _sync(self):
+        since = self._watermark - SYNC_OVERLAP if self._watermark else None
+        # Re-applied rows are first removed, so overlap is harmless
+        rows = self._fetch(since)
+        self._apply(rows)
+        self._synced_at = time.monotonic()
+        self._stats['syncs'] += 1
+
+    def _current_generation(self):
+        try:
+            return get_cache().backend.get_counter('gen:leaderboard')
+        except Exception:
+            return None
+
+    def refresh(self):
+        """Bring the index up to date if it may be stale"""
+        generation = self._current_generation()
+        with self._lock:
+            now = time.monotonic()
+            if self._loaded_at is None or now - self._loaded_at >= self.max_age:
+                self._load()
+            elif generation != self._generation or now - self._synced_at >= self.sync_interval:
+                self._sync()
+            self._generation = generation
+
+    def _segment(self, gender, flag):
+        segment = self._segments.get((gender, flag))
+        if segment is None:
+            # Built once from the overall order, which is already sorted
+            segment = SegmentIndex()
+            segment.keys = [
+                key for key in self._segments[(None, None)].keys
+                if (gender is None or self._rows[key[1]][0] == gender)
+                and (flag is None or self._rows[key[1]][1] == flag)
+            ]
+            self._segments[(gender, flag)] = segment
+        return segment
+
+    def _entry(self, key, position):
+        gender, flag, score = self._rows[key[1]]
+        return {'rank': position + 1, 'username': key[1], 'gender': gender, 'flag': flag,
+                'dots_score': round(score, 2)}
+
+    def rank(self, username, gender=None, country=None):
+        """
+        Leaderboard position of ``username`` within a segment
+
+        Returns:
+            dict: {'rank', 'total', 'dots_score'}, or None if the user is not ranked in it
+        """
+        with self._lock:
+            self._stats['lookups'] += 1
+            row = self._rows.get(username)
+            if row is None:
+                return None
+            segment = self._segment(gender, country)
+            position = segment.position((-row[2], username))
+            if position is None:
+                return None
+            return {'rank': position + 1, 'total': len(segment), 'dots_score': round(row[2], 2)}
+
+    def neighbourhood(self, username, gender=None, country=None, window=RANK_WINDOW):
+        """
+        A user's rank plus the ``window`` lifters directly above and below
+
+        Returns:
+            dict: {'username', 'rank', 'total', 'dots_score', 'above', 'below'}, or None
+        """
+        with self._lock:
+            self._stats['lookups'] += 1
+            row = self._rows.get(username)
+            if row is None:
+                return None
+            segment = self._segment(gender, country)
+            key = (-row[2], username)
+            position = segment.position(key)
+            if position is None:
+                return None
+            start = max(0, position - window)
+            above = [self._entry(k, start + i) for i, k in enumerate(segment.keys[start:position])]
+            below = [self._entry(k, position + 1 + i)
+                     for i, k in enumerate(segment.keys[position + 1:position + 1 + window])]
+            return {'username': username, 'rank': position + 1, 'total': len(segment),
+                    'dots_score': round(row[2], 2), 'above': above, 'below': below}
+
+    def badges(self, usernames):
+        """
+        Ranks of several users in their overall, gender, country and gender+country segments
+
+        Returns:
+            dict: username -> {'overall', 'gender', 'country', 'gender_country'} (None if unranked)
+        """
+        result = {}
+        with self._lock:
+            for username in usernames:
+                row = self._rows.get(username)
+                if row is None:
+                    result[username] = None
+                    continue
+                gender, flag, _ = row
+                result[username] = {
+                    'overall': self.rank(username),
+                    'gender': self.rank(username, gender=gender),
+                    'country': self.rank(username, country=flag) if flag else None,
+                    'gender_country': self.rank(username, gender=gender, country=flag) if flag else None,
+                }
+        return result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'users': len(self._rows),
+                'segments': len(self._segments),
+                'age': (time.monotonic() - self._loaded_at) if self._loaded_at is not None else None,
+            })
+        return stats
+
+_rank_index = None
+_rank_index_pid = None
+_rank_index_lock = threading.Lock()
+
+def get_rank_index():
+    """Return this process's rank index, brought up to date"""
+    global _rank_index, _rank_index_pid
+    if _rank_index is None or _rank_index_pid != os.getpid():
+        with _rank_index_lock:
+            if _rank_index is None or _rank_index_pid != os.getpid():
+                _rank_index = RankIndex(
+                    sync_interval=float(os.getenv('RANK_SYNC_INTERVAL', 5)),
+                    max_age=float(os.getenv('RANK_MAX_AGE', 600))
+                )
+                _rank_index_pid = os.getpid()
+    _rank_index.refresh()
+    return _rank_index
+
+def get_rank_index_stats():
+    """Rank index statistics for this worker, or None if it was never loaded"""
+    return _rank_index.stats() if _rank_index is not None and _rank_index_pid == os.getpid() else None
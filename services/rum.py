@@ -0,0 +1,331 @@
+"""
+Real-user monitoring ingestion
+
+``static/src/performance-monitor.js`` batches navigation timings, Web
+Vitals and API call durations and posts them to ``/api/rum`` with
+``navigator.sendBeacon``. The endpoint only validates the batch and appends
+it to an in-memory buffer in the worker; a background thread writes the
+buffer to ``rum_events`` with one multi-row INSERT every
+``RUM_FLUSH_INTERVAL`` seconds (or as soon as ``RUM_FLUSH_SIZE`` samples are
+waiting), so a beacon never costs a database round trip. The same thread
+periodically rolls recent samples up into hourly p50/p75/p95/p99 per page,
+metric, endpoint and device class in ``rum_rollups`` and prunes old raw rows.
+
+    python -m services.rum rollup [HOURS]    # roll up the last HOURS (default 2) now
+    python -m services.rum report [HOURS]    # print the rollups of the last HOURS (default 24)
+"""
+import atexit
+import math
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+from flask import current_app
+from psycopg2.extras import execute_values
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import RequestRedirect
+
+from services.supabase import get_db_connection
+
+RUM_FLUSH_SIZE = int(os.getenv('RUM_FLUSH_SIZE', 500))
+RUM_FLUSH_INTERVAL = float(os.getenv('RUM_FLUSH_INTERVAL', 10))
+# Samples held per worker while the database is unreachable; newer ones are dropped beyond this
+RUM_MAX_BUFFER = int(os.getenv('RUM_MAX_BUFFER', 20000))
+RUM_ROLLUP_INTERVAL = float(os.getenv('RUM_ROLLUP_INTERVAL', 300))
+RUM_ROLLUP_HOURS = 2
+RUM_RETENTION_DAYS = int(os.getenv('RUM_RETENTION_DAYS', 7))
+
+RUM_MAX_EVENTS = 50
+RUM_MAX_BYTES = 64 * 1024
+ROLLUP_LOCK_ID = 727275
+
+# Accepted metrics and the largest plausible value of each (ms, or unitless for CLS)
+METRIC_LIMITS = {
+    'ttfb': 120000, 'dom_interactive': 120000, 'load': 300000,
+    'fcp': 120000, 'lcp': 120000, 'fid': 60000, 'inp': 60000, 'cls': 100,
+    'api': 600000,
+}
+DEVICES = {'mobile', 'tablet', 'desktop'}
+CONNECTIONS = {'slow-2g', '2g', '3g', '4g'}
+
+def normalize_page(path):
+    """Page label: '/' or an .html page, so arbitrary URLs cannot create new series"""
+    path = urlparse(str(path or '')).path
+    if path in ('', '/'):
+        return '/'
+    if path.endswith('.html') and len(path) <= 100:
+        return path
+    return 'other'
+
+def resolve_endpoint(url, method):
+    """Flask endpoint an API URL is routed to, e.g. 'api.get_user_profile' for /api/user/alice"""
+    path = urlparse(str(url or '')).path
+    if not path.startswith('/api/'):
+        return 'external'
+    try:
+        endpoint, _ = current_app.url_map.bind('localhost').match(path, method=method)
+    except (HTTPException, RequestRedirect):
+        return 'unmatched'
+    # Unknown /api/ paths fall through to the static catch-all route
+    return endpoint[:100] if endpoint.startswith('api.') else 'unmatched'
+
+def parse_beacon(payload):
+    """
+    Validate a beacon and turn it into rum_events rows
+
+    Unknown metrics and implausible values are skipped rather than rejected,
+    so one bad sample does not lose the rest of the batch.
+
+    Returns:
+        list: (recorded_at, page, metric, name, value, device, connection, status) tuples
+    """
+    events = payload.get('events')
+    if not isinstance(events, list):
+        return []
+    page = normalize_page(payload.get('page'))
+    device = payload.get('device') if payload.get('device') in DEVICES else 'desktop'
+    connection = payload.get('connection') if payload.get('connection') in CONNECTIONS else None
+    recorded_at = datetime.now(timezone.utc)
+
+    rows = []
+    for event in events[:RUM_MAX_EVENTS]:
+        if not isinstance(event, dict) or event.get('metric') not in METRIC_LIMITS:
+            continue
+        metric = event['metric']
+        try:
+            value = float(event.get('value'))
+        except (TypeError, ValueError):
+            continue
+        if not math.isfinite(value) or value < 0 or value > METRIC_LIMITS[metric]:
+            continue
+        name = ''
+        status = None
+        if metric == 'api':
+            method = str(event.get('method') or 'GET').upper()
+            name = resolve_endpoint(event.get('name'), method)
+            try:
+                status = int(event.get('status'))
+            except (TypeError, ValueError):
+                status = None
+            if status is not None and not 0 <= status <= 599:
+                status = None
+        rows.append((recorded_at, page, metric, name, value, device, connection, status))
+    return rows
+
+def insert_events(rows):
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            execute_values(cur, """
+                INSERT INTO rum_events (recorded_at, page, metric, name, value, device, connection, status)
+                VALUES %s
+            """, rows, page_size=1000)
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def rollup(hours=RUM_ROLLUP_HOURS):
+    """
+    Recompute the hourly percentiles of the last ``hours`` and prune expired raw samples
+
+    Idempotent, and skipped when another worker is already rolling up.
+
+    Returns:
+        int: Rollup rows written, or None when skipped
+    """
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_xact_lock(%s) AS locked", (ROLLUP_LOCK_ID,))
+            if not cur.fetchone()['locked']:
+                conn.rollback()
+                return None
+            cur.execute("""
+                INSERT INTO rum_rollups (bucket, page, metric, name, device, samples, p50, p75, p95, p99, updated_at)
+                SELECT bucket, page, metric, name, device, samples, p[1], p[2], p[3], p[4], NOW()
+                FROM (
+                    SELECT date_trunc('hour', recorded_at) AS bucket, page, metric, name, device,
+                           COUNT(*) AS samples,
+                           percentile_cont(ARRAY[0.5, 0.75, 0.95, 0.99]) WITHIN GROUP (ORDER BY value) AS p
+                    FROM rum_events
+                    WHERE recorded_at >= date_trunc('hour', NOW() - make_interval(hours => %s))
+                    GROUP BY 1, 2, 3, 4, 5
+                ) computed
+                ON CONFLICT (bucket, page, metric, name, device) DO UPDATE
+                SET samples = EXCLUDED.samples, p50 = EXCLUDED.p50, p75 = EXCLUDED.p75,
+                    p95 = EXCLUDED.p95, p99 = EXCLUDED.p99, updated_at = EXCLUDED.updated_at
+            """, (hours,))
+            count = cur.rowcount
+            cur.execute("DELETE FROM rum_events WHERE recorded_at < NOW() - make_interval(days => %s)",
+                        (RUM_RETENTION_DAYS,))
+            conn.commit()
+            return count
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def fetch_rum_report(hours=24, page=None, device=None):
+    """
+    Hourly rollups of the last ``hours``, newest first
+
+    Returns:
+        list: dicts with bucket, page, metric, name, device, samples and p50/p75/p95/p99
+    """
+    filters = ["bucket >= NOW() - make_interval(hours => %s)"]
+    params = [hours]
+    if page:
+        filters.append("page = %s")
+        params.append(page)
+    if device:
+        filters.append("device = %s")
+        params.append(device)
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                SELECT bucket, page, metric, name, device, samples, p50, p75, p95, p99
+                FROM rum_rollups
+                WHERE {' AND '.join(filters)}
+                ORDER BY bucket DESC, page, metric, name, device
+            """, params)
+            return cur.fetchall()
+    finally:
+        conn.close()
+
+class RumBuffer:
+    """Per-worker sample buffer, drained by a daemon thread with bulk inserts"""
+
+    def __init__(self, flush_size=RUM_FLUSH_SIZE, flush_interval=RUM_FLUSH_INTERVAL, max_buffer=RUM_MAX_BUFFER,
+                 rollup_interval=RUM_ROLLUP_INTERVAL):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.rollup_interval = rollup_interval
+        self._rows = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._last_rollup = time.monotonic()
+        self._stats = {'received': 0, 'dropped': 0, 'flushed': 0, 'flushes': 0, 'flush_errors': 0, 'rollups': 0}
+
+    def add(self, rows):
+        with self._lock:
+            room = self.max_buffer - len(self._rows)
+            if len(rows) > room:
+                self._stats['dropped'] += len(rows) - max(room, 0)
+                rows = rows[:max(room, 0)]
+            self._rows.extend(rows)
+            self._stats['received'] += len(rows)
+            full = len(self._rows) >= self.flush_size
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Write everything buffered in one statement; samples are kept for the next try on failure"""
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return 0
+        try:
+            insert_events(rows)
+        except Exception:
+            with self._lock:
+                keep = rows[:max(self.max_buffer - len(self._rows), 0)]
+                self._stats['dropped'] += len(rows) - len(keep)
+                self._stats['flush_errors'] += 1
+                self._rows[:0] = keep
+            raise
+        with self._lock:
+            self._stats['flushed'] += len(rows)
+            self._stats['flushes'] += 1
+        return len(rows)
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='rum-flusher', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"RUM flush error: {e}")
+            if time.monotonic() - self._last_rollup >= self.rollup_interval:
+                self._last_rollup = time.monotonic()
+                try:
+                    if rollup() is not None:
+                        with self._lock:
+                            self._stats['rollups'] += 1
+                except Exception as e:
+                    print(f"RUM rollup error: {e}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['buffered'] = len(self._rows)
+        return stats
+
+_buffer = None
+_buffer_pid = None
+_buffer_lock = threading.Lock()
+
+def _flush_at_exit():
+    if _buffer is not None and _buffer_pid == os.getpid():
+        try:
+            _buffer.flush()
+        except Exception as e:
+            print(f"RUM flush at exit failed: {e}")
+
+atexit.register(_flush_at_exit)
+
+def get_rum_buffer():
+    """Return this process's RUM buffer (threads do not survive fork)"""
+    global _buffer, _buffer_pid
+    if _buffer is None or _buffer_pid != os.getpid():
+        with _buffer_lock:
+            if _buffer is None or _buffer_pid != os.getpid():
+                _buffer = RumBuffer()
+                _buffer_pid = os.getpid()
+    return _buffer
+
+def get_rum_stats():
+    """RUM buffer statistics for this worker, or None if no beacon was received"""
+    return _buffer.stats() if _buffer is not None and _buffer_pid == os.getpid() else None
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else None
+    if command not in ('rollup', 'report'):
+        print("Usage: python -m services.rum [rollup [HOURS] | report [HOURS]]")
+        return 2
+
+    if command == 'rollup':
+        hours = int(argv[2]) if len(argv) > 2 else RUM_ROLLUP_HOURS
+        count = rollup(hours)
+        print("Another process is rolling up; skipped" if count is None else f"Wrote {count} rollup rows")
+        return 0
+
+    hours = int(argv[2]) if len(argv) > 2 else 24
+    print(f"{'hour':<17} {'page':<20} {'metric':<16} {'endpoint':<28} {'device':<8} {'n':>6} "
+          f"{'p50':>8} {'p75':>8} {'p95':>8} {'p99':>8}")
+    for row in fetch_rum_report(hours):
+        print(f"{row['bucket']:%Y-%m-%d %H:%M} {row['page'][:20]:<20} {row['metric']:<16} {row['name'][:28]:<28} "
+              f"{row['device']:<8} {row['samples']:>6} {row['p50']:>8.1f} {row['p75']:>8.1f} "
+              f"{row['p95']:>8.1f} {row['p99']:>8.1f}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,132 @@
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - batch scoring falls back to the scalar path
+    np = None
+
+# DOTS Formula Constants
+DOTS_MEN = {
+    'a': 47.46178854,
+    'b': 8.472061379,
+    'c': 0.07369410346,
+    'd': -0.001395833811,
+    'e': 0.000007076659730
+}
+
+DOTS_WOMEN = {
+    'a': -125.4255398,
+    'b': 13.71219419,
+    'c': -0.03307250631,
+    'd': 0.0003872554572,
+    'e': -0.00000113708316
+}
+
+# Denominator coefficients in Horner order (e, d, c, b, a):
+# a + b*W + c*W^2 + d*W^3 + e*W^4 == (((e*W + d)*W + c)*W + b)*W + a
+DOTS_MEN_HORNER = tuple(DOTS_MEN[k] for k in 'edcba')
+DOTS_WOMEN_HORNER = tuple(DOTS_WOMEN[k] for k in 'edcba')
+
+if np is not None:
+    _MEN_COEFFS = np.array(DOTS_MEN_HORNER, dtype=np.float64)
+    _WOMEN_COEFFS = np.array(DOTS_WOMEN_HORNER, dtype=np.float64)
+
+def _dots_denominator(bodyweight, coefficients):
+    denominator = coefficients[0]
+    for coefficient in coefficients[1:]:
+        denominator = denominator * bodyweight + coefficient
+    return denominator
+
+def calculate_dots_score(total_lifted, bodyweight, gender):
+    """
+    Calculate DOTS score based on total lifted weight, bodyweight, and gender
+    
+    Args:
+        total_lifted (float): Total weight lifted (bench + squat + deadlift) in kg
+        bodyweight (float): User's bodyweight in kg
+        gender (str): 'male' or 'female'
+    
+    Returns:
+        float: DOTS score
+    """
+    if not bodyweight or bodyweight <= 0:
+        return 0
+    
+    coefficients = DOTS_MEN_HORNER if gender == 'male' else DOTS_WOMEN_HORNER
+    
+    # DOTS formula: 500 * total_lifted / (a + b*W + c*W^2 + d*W^3 + e*W^4)
+    dots_score = 500 * total_lifted / _dots_denominator(bodyweight, coefficients)
+    return round(dots_score, 2)
+
+def calculate_dots_scores(totals, bodyweights, genders):
+    """
+    Calculate unrounded DOTS scores for many lifters at once
+    
+    Evaluates the same Horner-form polynomial as calculate_dots_score(), in the
+    same operation order, so ``round(score, 2)`` of each element equals the
+    scalar result. Missing or non-positive bodyweights score 0.
+    
+    Args:
+        totals (sequence): Totals lifted in kg
+        bodyweights (sequence): Bodyweights in kg (None allowed)
+        genders (sequence): 'male' / 'female' per lifter
+    
+    Returns:
+        numpy.ndarray: float64 DOTS scores (a list when NumPy is unavailable)
+    """
+    if np is None:
+        return [
+            500 * total / _dots_denominator(bodyweight, DOTS_MEN_HORNER if gender == 'male' else DOTS_WOMEN_HORNER)
+            if bodyweight and bodyweight > 0 else 0.0
+            for total, bodyweight, gender in zip(totals, bodyweights, genders)
+        ]
+    
+    totals = np.asarray(totals, dtype=np.float64)
+    bodyweights = np.asarray(bodyweights, dtype=np.float64)  # None becomes NaN
+    is_male = np.asarray(genders, dtype=object) == 'male'
+    
+    denominator = np.where(is_male, _MEN_COEFFS[0], _WOMEN_COEFFS[0])
+    for index in range(1, len(_MEN_COEFFS)):
+        denominator = denominator * bodyweights + np.where(is_male, _MEN_COEFFS[index], _WOMEN_COEFFS[index])
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = 500 * totals / denominator
+    valid = bodyweights > 0  # False for NaN
+    return np.where(valid, scores, 0.0)
+
+def round_dots_scores(scores):
+    """
+    Round batch scores to 2 decimals exactly like calculate_dots_score() does
+    
+    np.round scales by 100 and rounds half-to-even, which can only disagree
+    with Python's correctly rounded round() when the scaled value sits on a
+    .5 boundary; those few elements are re-rounded in Python.
+    
+    Returns:
+        list: Python floats
+    """
+    if np is None:
+        return [round(float(score), 2) for score in scores]
+    
+    scores = np.asarray(scores, dtype=np.float64)
+    rounded = np.round(scores, 2)
+    scaled = scores * 100
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for index in np.flatnonzero(near_tie):
+        rounded[index] = round(float(scores[index]), 2)
+    return rounded.tolist()
+
+def dots_sql_expression(total_column, bodyweight_column, gender_column):
+    """
+    SQL expression computing the (unrounded) DOTS score, for ranking in the database
+
+    Uses the same constants as calculate_dots_score(); the denominator is
+    evaluated in Horner form and guarded against division by zero.
+    """
+    def polynomial(coefficients):
+        sql = "%r" % coefficients[0]
+        for coefficient in coefficients[1:]:
+            sql = "(%s * %s + %r)" % (sql, bodyweight_column, coefficient)
+        return sql
+
+    return "(500 * %s / NULLIF(CASE WHEN %s = 'male' THEN %s ELSE %s END, 0))" % (
+        total_column, gender_column, polynomial(DOTS_MEN_HORNER), polynomial(DOTS_WOMEN_HORNER)
+    )
@@ -0,0 +1,269 @@
+import sys
+import time
+from services.supabase import get_db_connection, recalculate_elo
+from services.scoring import dots_sql_expression
+
+# Users that can appear on the leaderboard at all
+ELIGIBLE_USERS_SQL = "u.weight IS NOT NULL AND u.weight > 0 AND u.gender IS NOT NULL"
+
+# Best bench/squat/deadlift, total and DOTS score for every eligible user
+# matching {filters}, computed straight from the prs table.
+STANDINGS_SOURCE_SQL = """
+    WITH best AS (
+        SELECT p.username,
+               (MAX(p.weight) FILTER (WHERE p.lift_type = 'bench'))::float8 AS bench,
+               (MAX(p.weight) FILTER (WHERE p.lift_type = 'squat'))::float8 AS squat,
+               (MAX(p.weight) FILTER (WHERE p.lift_type = 'deadlift'))::float8 AS deadlift
+        FROM prs p
+        JOIN users u ON u.username = p.username
+        WHERE {filters}
+        GROUP BY p.username
+    ), totals AS (
+        SELECT u.username, u.gender, u.flag, u.weight::float8 AS bodyweight,
+               b.bench, b.squat, b.deadlift,
+               COALESCE(b.bench, 0) + COALESCE(b.squat, 0) + COALESCE(b.deadlift, 0) AS total_lifted
+        FROM best b
+        JOIN users u ON u.username = b.username
+    )
+    SELECT username, gender, flag, bodyweight, bench, squat, deadlift, total_lifted,
+           {dots} AS dots_score
+    FROM totals
+    WHERE total_lifted > 0
+""".format(
+    filters="{filters}",
+    dots=dots_sql_expression('total_lifted', 'bodyweight', 'gender')
+)
+
+STANDINGS_COLUMNS = "username, gender, flag, bodyweight, bench, squat, deadlift, total_lifted, dots_score"
+
+# Removal tombstones only need to outlive the rank index's full reload (RANK_MAX_AGE)
+REMOVALS_RETENTION = "1 day"
+
+def refresh_user_standings(cur, usernames):
+    """
+    Recompute the standings rows for the given users on the caller's cursor
+
+    Runs inside the caller's transaction so the standings commit (or roll back)
+    together with the PR/profile write that changed them. Users that are no
+    longer eligible (no lifts, missing weight or gender) or no longer exist
+    (renamed) are removed and recorded in user_standings_removals, so
+    incremental readers such as the rank index drop them too.
+
+    Args:
+        cur: Cursor of the connection performing the write
+        usernames (list): Users whose PRs or profile changed
+    """
+    usernames = [username for username in set(usernames) if username]
+    if not usernames:
+        return
+
+    source = STANDINGS_SOURCE_SQL.format(filters=f"{ELIGIBLE_USERS_SQL} AND u.username = ANY(%s)")
+    cur.execute(f"""
+        WITH computed AS ({source}),
+        upserted AS (
+            INSERT INTO user_standings ({STANDINGS_COLUMNS}, updated_at)
+            SELECT {STANDINGS_COLUMNS}, NOW()
+            FROM computed
+            WHERE dots_score IS NOT NULL
+            ON CONFLICT (username) DO UPDATE SET
+                gender = EXCLUDED.gender,
+                flag = EXCLUDED.flag,
+                bodyweight = EXCLUDED.bodyweight,
+                bench = EXCLUDED.bench,
+                squat = EXCLUDED.squat,
+                deadlift = EXCLUDED.deadlift,
+                total_lifted = EXCLUDED.total_lifted,
+                dots_score = EXCLUDED.dots_score,
+                updated_at = EXCLUDED.updated_at
+            RETURNING username
+        ),
+        deleted AS (
+            DELETE FROM user_standings
+            WHERE username = ANY(%s) AND username NOT IN (SELECT username FROM upserted)
+        ),
+        pruned AS (
+            DELETE FROM user_standings_removals WHERE removed_at < NOW() - INTERVAL '{REMOVALS_RETENTION}'
+        )
+        INSERT INTO user_standings_removals (username, removed_at)
+        SELECT username, NOW()
+        FROM unnest(%s::varchar[]) AS removed(username)
+        WHERE username NOT IN (SELECT username FROM upserted)
+    """, (usernames, usernames, usernames))
+
+# Member count and ELO aggregates per team; {filters} narrows the users scanned.
+# Every member is counted; members without an ELO are left out of the ELO
+# aggregates, and a team where nobody has one has no aggregates to list.
+TEAM_STANDINGS_SOURCE_SQL = """
+    SELECT team, COUNT(*) AS member_count, AVG(elo) AS avg_elo, MAX(elo) AS top_elo, SUM(elo) AS total_elo
+    FROM users
+    WHERE team IS NOT NULL AND team != '' AND {filters}
+    GROUP BY team
+    HAVING COUNT(elo) > 0
+"""
+
+TEAM_STANDINGS_COLUMNS = "team, member_count, avg_elo, top_elo, total_elo"
+
+def refresh_team_standings(cur, teams=(), usernames=()):
+    """
+    Recompute the team_standings rows touched by a write on the caller's cursor
+
+    Only the affected teams are re-aggregated (an index range scan over their
+    members), so the cost is independent of the total number of users.
+    Teams left without members are removed.
+
+    Args:
+        cur: Cursor of the connection performing the write
+        teams (list): Teams whose membership changed (e.g. a user's old team)
+        usernames (list): Users whose ELO or team changed; their current team is refreshed
+    """
+    teams = [team for team in set(teams) if team]
+    usernames = [username for username in set(usernames) if username]
+    if not teams and not usernames:
+        return
+
+    source = TEAM_STANDINGS_SOURCE_SQL.format(filters="team IN (SELECT team FROM affected)")
+    cur.execute(f"""
+        WITH affected AS (
+            SELECT unnest(%s::varchar[]) AS team
+            UNION
+            SELECT team FROM users WHERE username = ANY(%s)
+        ),
+        computed AS ({source}),
+        upserted AS (
+            INSERT INTO team_standings ({TEAM_STANDINGS_COLUMNS}, updated_at)
+            SELECT {TEAM_STANDINGS_COLUMNS}, NOW()
+            FROM computed
+            ON CONFLICT (team) DO UPDATE SET
+                member_count = EXCLUDED.member_count,
+                avg_elo = EXCLUDED.avg_elo,
+                top_elo = EXCLUDED.top_elo,
+                total_elo = EXCLUDED.total_elo,
+                updated_at = EXCLUDED.updated_at
+            RETURNING team
+        )
+        DELETE FROM team_standings
+        WHERE team IN (SELECT team FROM affected) AND team NOT IN (SELECT team FROM upserted)
+    """, (teams, usernames))
+
+def rebuild_team_standings_rows(cur):
+    """
+    Replace every team_standings row with aggregates recomputed from users
+
+    Returns:
+        int: Number of team rows written
+    """
+    source = TEAM_STANDINGS_SOURCE_SQL.format(filters="TRUE")
+    cur.execute("DELETE FROM team_standings")
+    cur.execute(f"""
+        INSERT INTO team_standings ({TEAM_STANDINGS_COLUMNS}, updated_at)
+        SELECT {TEAM_STANDINGS_COLUMNS}, NOW()
+        FROM ({source}) computed
+    """)
+    return cur.rowcount
+
+def rebuild_standings_rows(cur):
+    """
+    Replace every user_standings row with values recomputed from prs and users
+
+    Returns:
+        int: Number of standings rows written
+    """
+    source = STANDINGS_SOURCE_SQL.format(filters=ELIGIBLE_USERS_SQL)
+    cur.execute("CREATE TEMPORARY TABLE previous_standings ON COMMIT DROP AS SELECT username FROM user_standings")
+    cur.execute("DELETE FROM user_standings")
+    cur.execute(f"""
+        INSERT INTO user_standings ({STANDINGS_COLUMNS}, updated_at)
+        SELECT {STANDINGS_COLUMNS}, NOW()
+        FROM ({source}) computed
+        WHERE dots_score IS NOT NULL
+    """)
+    count = cur.rowcount
+    cur.execute("""
+        INSERT INTO user_standings_removals (username, removed_at)
+        SELECT username, NOW() FROM previous_standings
+        WHERE username NOT IN (SELECT username FROM user_standings)
+    """)
+    cur.execute("DROP TABLE previous_standings")
+    return count
+
+def rebuild_standings():
+    """
+    Rebuild the whole user_standings table in one transaction
+
+    Returns:
+        int: Number of standings rows written
+    """
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            count = rebuild_standings_rows(cur)
+            conn.commit()
+            return count
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def rebuild_team_standings():
+    """
+    Rebuild the whole team_standings table in one transaction
+
+    Returns:
+        int: Number of team rows written
+    """
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            count = rebuild_team_standings_rows(cur)
+            conn.commit()
+            return count
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def recompute_all_elo():
+    """
+    Recompute every user's ELO in one set-based statement and transaction
+
+    Use after bulk edits instead of recomputing row by row. Team aggregates
+    are rebuilt in the same transaction.
+
+    Returns:
+        int: Number of users whose ELO changed
+    """
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            count = recalculate_elo(cur)
+            if count:
+                rebuild_team_standings_rows(cur)
+            conn.commit()
+            return count
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+COMMANDS = {
+    'rebuild': (rebuild_standings, "Rebuilt user_standings: {count} rows"),
+    'teams': (rebuild_team_standings, "Rebuilt team_standings: {count} teams"),
+    'elo': (recompute_all_elo, "Recomputed ELO: {count} users changed"),
+}
+
+def main(argv):
+    if len(argv) != 2 or argv[1] not in COMMANDS:
+        print("Usage: python -m services.standings [rebuild|teams|elo]")
+        return 2
+
+    command, message = COMMANDS[argv[1]]
+    started = time.time()
+    count = command()
+    print(message.format(count=count) + f" in {time.time() - started:.2f}s")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
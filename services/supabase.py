@@ -1,30 +1,158 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from flask import g, has_app_context
 import os
+import threading
 from dotenv import load_dotenv
+from services.db_pool import ConnectionPool
+from services.metrics import InstrumentedCursor
 
 load_dotenv()
 
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    os.getenv("DATABASE_URL"),
+                    minconn=int(os.getenv("DB_POOL_MIN_SIZE", 1)),
+                    maxconn=int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+                    max_lifetime=int(os.getenv("DB_POOL_MAX_LIFETIME", 1800)),
+                    health_check_after=int(os.getenv("DB_POOL_HEALTH_CHECK_AFTER", 30)),
+                    timeout=float(os.getenv("DB_POOL_TIMEOUT", 10)),
+                    # Bounds a connect to an unreachable database (worker warm-up included)
+                    connect_timeout=int(os.getenv("DB_CONNECT_TIMEOUT", 10)),
+                    cursor_factory=InstrumentedCursor
+                )
+    return _pool
+
+def get_pool_stats():
+    """Pool statistics for this worker, or None if the pool was never used"""
+    return _pool.stats() if _pool is not None else None
+
+def reset_pool_after_fork():
+    """Drop connections inherited from the parent process (gunicorn preload)"""
+    if _pool is not None:
+        _pool.reset_after_fork()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_pool_after_fork)
+
+class PooledConnection:
+    """
+    Proxy around a pooled psycopg2 connection.
+
+    ``close()`` hands the connection back to the pool instead of closing the
+    socket. For the request-scoped connection it is a no-op, so every helper
+    can keep its ``try/finally: conn.close()`` shape while sharing one
+    connection; the connection is returned on app-context teardown.
+    """
+
+    def __init__(self, pool, conn, request_scoped=False):
+        self._pool = pool
+        self._conn = conn
+        self._request_scoped = request_scoped
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if not self._request_scoped:
+            self.release()
+
+    def release(self, discard=False):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.putconn(conn, discard=discard)
+
 def get_db_connection():
-    return psycopg2.connect(
-        os.getenv("DATABASE_URL"),
-        cursor_factory=RealDictCursor
-    )
+    """
+    Get a database connection.
+
+    Inside a Flask app context this is the single connection bound to the
+    current request via ``g``, shared by the route and every helper it calls.
+    Elsewhere (scripts, background threads) it is a connection checked out
+    of the pool until ``close()`` is called.
+    """
+    pool = get_pool()
+    if has_app_context():
+        conn = g.get('db_conn')
+        if conn is None:
+            conn = g.db_conn = PooledConnection(pool, pool.getconn(), request_scoped=True)
+        return conn
+    return PooledConnection(pool, pool.getconn())
+
+def release_db_connection(exc=None):
+    """Return the request's connection to the pool, rolling back anything uncommitted"""
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        conn.release(discard=isinstance(exc, psycopg2.InterfaceError))
+
+def init_app(app):
+    """Register request-scoped connection handling on the Flask app"""
+    app.teardown_appcontext(release_db_connection)
+
+# ELO formula (simplified): 1000 + 1.5 per kg summed over every logged PR
+ELO_BASE = 1000
+ELO_PER_KG = 1.5
+
+def recalculate_elo(cur, usernames=None):
+    """
+    Recompute ELO with one set-based UPDATE on the caller's cursor
+
+    Runs inside the caller's transaction (nothing is committed here), so the
+    new ELO becomes visible atomically with the PR write that changed it.
+    Rows whose ELO is already correct are not rewritten.
+
+    Args:
+        cur: Cursor of the connection performing the write
+        usernames (list): Users to recompute, or None for every user
+
+    Returns:
+        int: Number of users whose ELO changed
+    """
+    params = [ELO_BASE, ELO_PER_KG]
+    user_filter = ""
+    if usernames is not None:
+        usernames = [username for username in set(usernames) if username]
+        if not usernames:
+            return 0
+        user_filter = "WHERE u.username = ANY(%s)"
+        params.append(usernames)
+
+    cur.execute(f"""
+        UPDATE users u
+        SET elo = t.new_elo
+        FROM (
+            SELECT u.username, %s + COALESCE(SUM(p.weight), 0) * %s AS new_elo
+            FROM users u
+            LEFT JOIN prs p ON p.username = u.username
+            {user_filter}
+            GROUP BY u.username
+        ) t
+        WHERE u.username = t.username AND u.elo IS DISTINCT FROM t.new_elo
+    """, tuple(params))
+    return cur.rowcount
+
+def calculate_elo(username, cur=None):
+    """
+    Recompute one user's ELO
+
+    Pass the caller's cursor to run inside its transaction; without one the
+    update runs and commits on the current connection.
+    """
+    if cur is not None:
+        recalculate_elo(cur, [username])
+        return
 
-def calculate_elo(username):
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
-            # Fetch all lifts for the user
-            cur.execute("SELECT * FROM prs WHERE username = %s", (username,))
-            prs = cur.fetchall()
-            total_weight = sum([pr['weight'] for pr in prs])
-
-            # ELO formula (simplified)
-            new_elo = 1000 + total_weight * 1.5  # You can scale this differently
-
-            # Update user score
-            cur.execute("UPDATE users SET elo = %s WHERE username = %s", (new_elo, username))
+            recalculate_elo(cur, [username])
             conn.commit()
     finally:
         conn.close()
\ No newline at end of file
@@ -0,0 +1,409 @@
+"""
+Background video processing
+
+``submit_pr`` stores an uploaded video under ``uploads/originals/`` and
+queues a ``video_jobs`` row in the same transaction. This worker claims due
+jobs with ``FOR UPDATE SKIP LOCKED`` and runs them on a process pool, where
+each job:
+
+1. validates the file size and duration (ffprobe),
+2. transcodes to H.264/AAC MP4 with a capped bitrate and resolution and
+   ``+faststart`` (so playback starts before the whole file is downloaded),
+3. extracts a JPEG poster frame and a small WebP thumbnail.
+
+The PR then points at the rendition, poster and thumbnail. The original is
+kept for ``VIDEO_ORIGINAL_RETENTION_SECONDS`` first: web workers may still
+serve cached feed and profile JSON that links to it (the default in-memory
+cache is per process, so this worker's invalidations do not reach them), and
+it is swept once every such entry has expired, even if the PR has been
+deleted meanwhile (its job row is kept). ffmpeg never runs on a request
+thread and every ffmpeg/ffprobe call is bounded by ``VIDEO_FFMPEG_TIMEOUT``.
+Run it next to the web workers:
+
+    python -m services.transcoder            # loop forever
+    python -m services.transcoder --once     # process what is due and exit
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import safe_join
+
+from services.supabase import get_db_connection
+from services.media import UPLOAD_DIR
+from services.cache import invalidate
+from services.profiles import invalidate_profiles, PROFILE_CACHE_TTL
+
+ALLOWED_VIDEO_EXTENSIONS = {'.mp4', '.mov', '.m4v', '.webm'}
+
+VIDEO_MAX_BYTES = int(os.getenv('VIDEO_MAX_BYTES', 50 * 1024 * 1024))
+VIDEO_MAX_DURATION = float(os.getenv('VIDEO_MAX_DURATION', 90))
+VIDEO_MAX_HEIGHT = int(os.getenv('VIDEO_MAX_HEIGHT', 720))
+VIDEO_MAX_BITRATE_KBPS = int(os.getenv('VIDEO_MAX_BITRATE_KBPS', 2000))
+VIDEO_CRF = int(os.getenv('VIDEO_CRF', 23))
+THUMBNAIL_SIZE = (320, 320)
+
+VIDEO_JOB_WORKERS = int(os.getenv('VIDEO_JOB_WORKERS', 2))
+VIDEO_JOB_POLL_INTERVAL = float(os.getenv('VIDEO_JOB_POLL_INTERVAL', 5))
+VIDEO_JOB_MAX_ATTEMPTS = int(os.getenv('VIDEO_JOB_MAX_ATTEMPTS', 3))
+VIDEO_JOB_BACKOFF_SECONDS = int(os.getenv('VIDEO_JOB_BACKOFF_SECONDS', 60))
+# A claimed job not finished within this many seconds is assumed lost and re-run
+VIDEO_JOB_LEASE_SECONDS = int(os.getenv('VIDEO_JOB_LEASE_SECONDS', 900))
+# Per ffmpeg/ffprobe invocation; keeps a hung process from holding a pool slot for the whole lease
+VIDEO_FFMPEG_TIMEOUT = int(os.getenv('VIDEO_FFMPEG_TIMEOUT', 300))
+# Longest cached response that can link to an original (profiles; the video feed caches for 60s)
+VIDEO_ORIGINAL_RETENTION_SECONDS = int(os.getenv('VIDEO_ORIGINAL_RETENTION_SECONDS', PROFILE_CACHE_TTL + 60))
+
+class VideoRejected(Exception):
+    """The upload is not an acceptable video; the job is not retried"""
+
+def upload_url(relative_path):
+    return '/uploads/' + relative_path.replace(os.sep, '/')
+
+def save_upload(file_storage):
+    """
+    Store an uploaded video under uploads/originals/ with a unique name
+
+    Returns:
+        str: Path relative to UPLOAD_DIR
+
+    Raises:
+        VideoRejected: if the extension is not an accepted video type
+    """
+    ext = os.path.splitext(file_storage.filename or '')[1].lower()
+    if ext not in ALLOWED_VIDEO_EXTENSIONS:
+        raise VideoRejected(f"Unsupported video type '{ext or 'unknown'}'")
+    relative_path = os.path.join('originals', uuid.uuid4().hex + ext)
+    target = os.path.join(UPLOAD_DIR, relative_path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    file_storage.save(target)
+    return relative_path
+
+def enqueue_video_job(cur, pr_id, source_path):
+    """
+    Queue processing of an uploaded video on the caller's cursor
+
+    Returns:
+        int: Job id
+    """
+    cur.execute("""
+        INSERT INTO video_jobs (pr_id, source_path) VALUES (%s, %s) RETURNING id
+    """, (pr_id, source_path))
+    return cur.fetchone()['id']
+
+def delete_uploads(*urls):
+    """Remove the files behind /uploads/... URLs (missing files are ignored)"""
+    for url in urls:
+        if not url or not url.startswith('/uploads/'):
+            continue
+        path = safe_join(UPLOAD_DIR, url[len('/uploads/'):])
+        if path and os.path.isfile(path):
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Could not delete upload {path}: {e}")
+
+def probe_video(source, timeout=VIDEO_FFMPEG_TIMEOUT):
+    """ffmpeg.probe() with a timeout"""
+    import ffmpeg
+
+    try:
+        completed = subprocess.run(
+            ['ffprobe', '-show_format', '-show_streams', '-of', 'json', source],
+            capture_output=True, timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        raise RuntimeError(f"ffprobe timed out after {timeout}s")
+    if completed.returncode != 0:
+        raise ffmpeg.Error('ffprobe', completed.stdout, completed.stderr)
+    return json.loads(completed.stdout.decode('utf-8'))
+
+def run_ffmpeg(stream, timeout=VIDEO_FFMPEG_TIMEOUT):
+    """stream.run(quiet=True) with a timeout; the process is killed when it expires"""
+    import ffmpeg
+
+    process = stream.run_async(quiet=True)
+    try:
+        out, err = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.communicate()
+        raise RuntimeError(f"ffmpeg timed out after {timeout}s")
+    if process.returncode != 0:
+        raise ffmpeg.Error('ffmpeg', out, err)
+
+def process_video(source_path, stem):
+    """
+    Validate, transcode and thumbnail one video (runs in a pool process)
+
+    Args:
+        source_path (str): Original, relative to UPLOAD_DIR
+        stem (str): Base name for the artifacts
+
+    Returns:
+        dict: {'video', 'poster', 'thumbnail'} paths relative to UPLOAD_DIR, and 'duration'
+
+    Raises:
+        VideoRejected: if the file is too large, too long or not a video
+    """
+    import ffmpeg
+    from PIL import Image
+
+    source = os.path.join(UPLOAD_DIR, source_path)
+    size = os.path.getsize(source)
+    if size > VIDEO_MAX_BYTES:
+        raise VideoRejected(f"File too large: {size} bytes (max: {VIDEO_MAX_BYTES})")
+
+    try:
+        probe = probe_video(source)
+    except ffmpeg.Error as e:
+        raise VideoRejected(f"Not a readable video: {e.stderr.decode('utf-8', 'replace')[-300:]}")
+    if not any(stream.get('codec_type') == 'video' for stream in probe.get('streams', [])):
+        raise VideoRejected('No video stream')
+    duration = float(probe.get('format', {}).get('duration') or 0)
+    if duration <= 0 or duration > VIDEO_MAX_DURATION:
+        raise VideoRejected(f"Duration {duration:.1f}s outside 0-{VIDEO_MAX_DURATION:.0f}s")
+
+    outputs = {
+        'video': os.path.join('videos', stem + '.mp4'),
+        'poster': os.path.join('posters', stem + '.jpg'),
+        'thumbnail': os.path.join('thumbnails', stem + '.webp'),
+    }
+    for relative_path in outputs.values():
+        os.makedirs(os.path.join(UPLOAD_DIR, os.path.dirname(relative_path)), exist_ok=True)
+    video, poster, thumbnail = (os.path.join(UPLOAD_DIR, outputs[key]) for key in ('video', 'poster', 'thumbnail'))
+
+    # Capped-bitrate H.264, never upscaled, moov atom up front for progressive playback
+    run_ffmpeg(
+        ffmpeg
+        .input(source)
+        .output(
+            video + '.part',
+            format='mp4',
+            vcodec='libx264', preset='veryfast', crf=VIDEO_CRF, pix_fmt='yuv420p',
+            maxrate=f"{VIDEO_MAX_BITRATE_KBPS}k", bufsize=f"{2 * VIDEO_MAX_BITRATE_KBPS}k",
+            vf=f"scale=-2:'min({VIDEO_MAX_HEIGHT},ih)'",
+            acodec='aac', audio_bitrate='128k',
+            movflags='+faststart'
+        )
+        .overwrite_output()
+    )
+    os.replace(video + '.part', video)
+
+    run_ffmpeg(
+        ffmpeg
+        .input(video, ss=min(1.0, duration / 2))
+        .output(poster, vframes=1, **{'q:v': 3})
+        .overwrite_output()
+    )
+
+    with Image.open(poster) as image:
+        image.thumbnail(THUMBNAIL_SIZE)
+        image.save(thumbnail, 'WEBP', quality=75, method=6)
+
+    outputs['duration'] = duration
+    return outputs
+
+def claim_jobs(limit):
+    """
+    Mark up to ``limit`` due jobs as processing and return them
+
+    Committed immediately: the lease, not an open transaction, protects the
+    job while ffmpeg runs. A job whose lease expired (its pool process died
+    or hung) is re-run only while it has attempts left; otherwise it fails.
+    """
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE video_jobs
+                SET status = 'failed', locked_until = NULL, finished_at = NOW(),
+                    last_error = 'Lease expired on the last attempt (worker process died or hung)'
+                WHERE status = 'processing' AND locked_until < NOW() AND attempts >= %s
+                RETURNING id
+            """, (VIDEO_JOB_MAX_ATTEMPTS,))
+            for job in cur.fetchall():
+                print(f"Video job {job['id']} failed: lease expired after {VIDEO_JOB_MAX_ATTEMPTS} attempts")
+            cur.execute("""
+                UPDATE video_jobs
+                SET status = 'processing', attempts = attempts + 1,
+                    locked_until = NOW() + make_interval(secs => %s)
+                WHERE id IN (
+                    SELECT id FROM video_jobs
+                    WHERE (status = 'pending' AND next_attempt_at <= NOW())
+                       OR (status = 'processing' AND locked_until < NOW() AND attempts < %s)
+                    ORDER BY id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, pr_id, source_path, attempts
+            """, (VIDEO_JOB_LEASE_SECONDS, VIDEO_JOB_MAX_ATTEMPTS, limit))
+            jobs = cur.fetchall()
+            conn.commit()
+            return jobs
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def complete_job(job, result):
+    """Point the PR at the processed artifacts and schedule the original for deletion"""
+    urls = {key: upload_url(result[key]) for key in ('video', 'poster', 'thumbnail')}
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE prs SET video_url = %s, poster_url = %s, thumbnail_url = %s
+                WHERE id = %s
+                RETURNING username
+            """, (urls['video'], urls['poster'], urls['thumbnail'], job['pr_id']))
+            pr = cur.fetchone()
+            cur.execute("""
+                UPDATE video_jobs
+                SET status = 'done', duration = %s, last_error = NULL, locked_until = NULL, finished_at = NOW(),
+                    delete_original_after = NOW() + make_interval(secs => %s)
+                WHERE id = %s
+            """, (result['duration'], VIDEO_ORIGINAL_RETENTION_SECONDS, job['id']))
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    if pr is None:
+        # The post was deleted while it was being processed; nothing links to any of it
+        delete_uploads(upload_url(job['source_path']), *urls.values())
+        return
+    invalidate('videos')
+    invalidate_profiles(pr['username'])
+
+def fail_job(job, error):
+    """Reject invalid uploads outright; retry other failures with backoff"""
+    rejected = isinstance(error, VideoRejected)
+    exhausted = job['attempts'] >= VIDEO_JOB_MAX_ATTEMPTS
+    status = 'rejected' if rejected else ('failed' if exhausted else 'pending')
+    pr = None
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE video_jobs
+                SET status = %s, last_error = %s, locked_until = NULL,
+                    next_attempt_at = NOW() + make_interval(secs => %s),
+                    finished_at = CASE WHEN %s = 'pending' THEN NULL ELSE NOW() END,
+                    delete_original_after = CASE WHEN %s THEN NOW() + make_interval(secs => %s) END
+                WHERE id = %s
+            """, (status, str(error)[:1000], VIDEO_JOB_BACKOFF_SECONDS * 2 ** (job['attempts'] - 1),
+                  status, rejected, VIDEO_ORIGINAL_RETENTION_SECONDS, job['id']))
+            if rejected:
+                # The raw upload is not kept for an unacceptable video
+                cur.execute("UPDATE prs SET video_url = NULL WHERE id = %s AND video_url = %s RETURNING username",
+                            (job['pr_id'], upload_url(job['source_path'])))
+                pr = cur.fetchone()
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    if rejected:
+        # The raw upload itself is swept by sweep_originals() once cached links expire
+        invalidate('videos')
+        if pr is not None:
+            invalidate_profiles(pr['username'])
+    print(f"Video job {job['id']} {status}: {error}")
+
+def sweep_originals(limit=100):
+    """
+    Delete originals whose retention has passed
+
+    Returns:
+        int: Number of originals deleted
+    """
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE video_jobs SET delete_original_after = NULL
+                WHERE id IN (
+                    SELECT id FROM video_jobs
+                    WHERE delete_original_after <= NOW()
+                    ORDER BY delete_original_after
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING source_path
+            """, (limit,))
+            jobs = cur.fetchall()
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    delete_uploads(*(upload_url(job['source_path']) for job in jobs))
+    return len(jobs)
+
+def run_jobs(executor, workers=VIDEO_JOB_WORKERS):
+    """
+    Claim one batch of jobs and process them on ``executor``
+
+    Returns:
+        int: Number of jobs processed (0 when nothing was due)
+    """
+    jobs = claim_jobs(workers)
+    futures = {
+        executor.submit(process_video, job['source_path'], uuid.uuid4().hex): job
+        for job in jobs
+    }
+    broken = None
+    for future in as_completed(futures):
+        job = futures[future]
+        try:
+            result = future.result()
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                broken = e
+            fail_job(job, e)
+            continue
+        complete_job(job, result)
+        print(f"Video job {job['id']} done: PR {job['pr_id']} ({result['duration']:.1f}s)")
+    if broken is not None:
+        # Let the caller replace the pool before claiming more jobs
+        raise broken
+    return len(jobs)
+
+def main(argv):
+    executor = ProcessPoolExecutor(max_workers=VIDEO_JOB_WORKERS)
+    try:
+        while True:
+            try:
+                sweep_originals()
+                processed = run_jobs(executor)
+            except BrokenProcessPool as e:
+                # A pool process died (e.g. OOM-killed); its jobs were failed above
+                print(f"Video worker pool broken, restarting it: {e}")
+                executor.shutdown(wait=False, cancel_futures=True)
+                executor = ProcessPoolExecutor(max_workers=VIDEO_JOB_WORKERS)
+                processed = 0
+            except Exception as e:
+                print(f"Video worker error: {e}")
+                processed = 0
+            if '--once' in argv and not processed:
+                return 0
+            if not processed:
+                time.sleep(VIDEO_JOB_POLL_INTERVAL)
+    finally:
+        executor.shutdown()
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,78 @@
+"""
+Worker warm-up
+
+gunicorn.conf.py runs ``warm_up`` in every worker before it accepts
+requests. It opens the DB pool's minimum connections and renders the
+hottest cached responses (the leaderboard segments and the team
+leaderboard) through the app itself, so they are cached under exactly the
+keys real requests use and the first visitor after a deploy does not pay
+for a cold cache. ``/api/admin/stats`` reports how the worker's warm-up went.
+
+Warm-up holds up the worker's boot, so it is bounded: connecting gives up
+after ``DB_CONNECT_TIMEOUT`` and no further responses are primed once
+``WARMUP_TIMEOUT`` seconds (default 30) have passed. Keep both well under
+gunicorn's ``timeout``, or a slow database gets workers killed and respawned.
+"""
+import os
+import time
+
+from services.supabase import get_pool
+
+# Default first pages: what the home page and team page request on load
+WARMUP_PATHS = [
+    '/api/leaderboard',
+    '/api/leaderboard?gender=male',
+    '/api/leaderboard?gender=female',
+    '/api/team_leaderboard',
+]
+
+WARMUP_TIMEOUT = float(os.getenv('WARMUP_TIMEOUT', 30))
+
+_state = None
+
+def get_warmup_stats():
+    """Warm-up outcome for this worker, or None if it was not warmed up"""
+    if _state is None or _state['pid'] != os.getpid():
+        return None
+    return dict(_state, errors=list(_state['errors']))
+
+def warm_up(app, paths=WARMUP_PATHS, timeout=WARMUP_TIMEOUT):
+    """
+    Prime the DB pool and cached responses
+
+    Failures are recorded and printed but never keep the worker from serving:
+    a database that is unreachable at boot is retried by the pool on demand.
+
+    Args:
+        timeout: Seconds after which the remaining paths are skipped
+
+    Returns:
+        dict: Warm-up statistics (see get_warmup_stats)
+    """
+    global _state
+    _state = {'pid': os.getpid(), 'duration_ms': None, 'primed': 0, 'errors': []}
+    started = time.perf_counter()
+    deadline = started + timeout
+
+    try:
+        get_pool().prefill()
+        client = app.test_client()
+        for i, path in enumerate(paths):
+            if time.perf_counter() > deadline:
+                _state['errors'].append(f"timed out after {timeout:g}s, skipped {len(paths) - i} paths")
+                break
+            status = client.get(path).status_code
+            if status == 200:
+                _state['primed'] += 1
+            else:
+                _state['errors'].append(f"{path}: status {status}")
+    except Exception as e:
+        # Without a database every path would fail the same way; stop here
+        _state['errors'].append(str(e).strip())
+
+    for error in _state['errors']:
+        print(f"Warm-up error: {error}")
+
+    _state['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    print(f"Worker {os.getpid()} warmed up {_state['primed']}/{len(paths)} responses in {_state['duration_ms']:.0f}ms")
+    return get_warmup_stats()
@@ -17,6 +17,12 @@ class PerformanceMonitor {
             fid: 100,  // First Input Delay
             cls: 0.1   // Cumulative Layout Shift
         };
+        // Samples waiting to be sent to /api/rum
+        this.beaconQueue = [];
+        this.pendingVitals = {};
+        this.beaconUrl = '/api/rum';
+        this.beaconBatchSize = 20;
+        this.originalFetch = window.fetch.bind(window);
         this.init();
     }
 
@@ -25,7 +31,9 @@ class PerformanceMonitor {
         this.measureResourceTiming();
         this.measureWebVitals();
         this.monitorUserInteractions();
+        this.monitorApiCalls();
         this.startReporting();
+        this.startBeacons();
     }
 
     /**
@@ -227,11 +235,11 @@ class PerformanceMonitor {
      * Monitor API call performance
      */
     monitorApiCalls() {
-        const originalFetch = window.fetch;
+        const originalFetch = this.originalFetch;
         
         window.fetch = async (...args) => {
             const startTime = performance.now();
-            const url = args[0];
+            const url = typeof args[0] === 'string' ? args[0] : (args[0] && args[0].url) || String(args[0]);
             
             try {
                 const response = await originalFetch(...args);
@@ -296,6 +304,8 @@ class PerformanceMonitor {
      * Report metric to console and optionally to analytics
      */
     reportMetric(type, data) {
+        this.queueBeacon(type, data);
+
         // In production, send to analytics service
         if (typeof gtag !== 'undefined') {
             gtag('event', 'performance', {
@@ -361,6 +371,96 @@ class PerformanceMonitor {
         this.reportMetric('summary', report);
     }
 
+    /**
+     * Classify the device for RUM percentiles (mobile.html is always mobile)
+     */
+    getDeviceClass() {
+        if (location.pathname.includes('mobile') || window.matchMedia('(max-width: 767px)').matches) return 'mobile';
+        if (window.matchMedia('(max-width: 1024px) and (pointer: coarse)').matches) return 'tablet';
+        return 'desktop';
+    }
+
+    /**
+     * Turn a reported metric into RUM samples for /api/rum
+     */
+    queueBeacon(type, data) {
+        if (type === 'fcp' || type === 'fid') {
+            this.beaconQueue.push({ metric: type, value: data.value });
+        } else if (type === 'lcp' || type === 'cls') {
+            // Both keep growing while the page is open; the final value is sent when it is hidden
+            this.pendingVitals[type] = data.value;
+        } else if (type === 'api') {
+            let path;
+            try {
+                path = new URL(data.url, location.href);
+            } catch (e) {
+                return;
+            }
+            if (path.origin !== location.origin || path.pathname === this.beaconUrl) return;
+            this.beaconQueue.push({ metric: 'api', name: path.pathname, method: data.method, status: data.status, value: data.duration });
+        } else {
+            return;
+        }
+
+        if (this.beaconQueue.length >= this.beaconBatchSize) {
+            this.sendBeacons();
+        }
+    }
+
+    /**
+     * Queue navigation timings once the load event has finished
+     */
+    queueNavigationBeacon() {
+        const entry = performance.getEntriesByType && performance.getEntriesByType('navigation')[0];
+        if (!entry) return;
+        [['ttfb', entry.responseStart], ['dom_interactive', entry.domInteractive], ['load', entry.loadEventEnd]]
+            .filter(([, value]) => value > 0)
+            .forEach(([metric, value]) => this.beaconQueue.push({ metric, value }));
+    }
+
+    /**
+     * Send queued samples in one request that survives page unload
+     */
+    sendBeacons(final = false) {
+        if (final) {
+            Object.entries(this.pendingVitals).forEach(([metric, value]) => this.beaconQueue.push({ metric, value }));
+            this.pendingVitals = {};
+        }
+        if (this.beaconQueue.length === 0) return;
+
+        const payload = JSON.stringify({
+            page: location.pathname,
+            device: this.getDeviceClass(),
+            connection: navigator.connection ? navigator.connection.effectiveType : undefined,
+            events: this.beaconQueue.splice(0, 50)
+        });
+        // text/plain keeps sendBeacon a simple request (no CORS preflight)
+        const body = new Blob([payload], { type: 'text/plain' });
+        if (!(navigator.sendBeacon && navigator.sendBeacon(this.beaconUrl, body))) {
+            this.originalFetch(this.beaconUrl, { method: 'POST', body, keepalive: true }).catch(() => {});
+        }
+    }
+
+    /**
+     * Batch samples: flush every 15s, when the batch is full and when the page is hidden
+     */
+    startBeacons() {
+        if (document.readyState === 'complete') {
+            setTimeout(() => this.queueNavigationBeacon(), 0);
+        } else {
+            window.addEventListener('load', () => setTimeout(() => this.queueNavigationBeacon(), 0));
+        }
+
+        setInterval(() => this.sendBeacons(), 15000);
+
+        document.addEventListener('visibilitychange', () => {
+            if (document.visibilityState === 'hidden') {
+                this.sendBeacons(true);
+            }
+        });
+        window.addEventListener('pagehide', () => this.sendBeacons(true));
+    }
+
     /**
      * Get current performance data
      */
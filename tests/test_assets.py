@@ -0,0 +1,64 @@
+import json
+import os
+
+from services.assets import MANIFEST_NAME, build_assets, rewrite_references
+
+ASSETS = {'src/output.css': 'src/output.0123456789ab.css', 'app.js': 'app.ba9876543210.js'}
+
+
+def test_rewrite_references_forms():
+    html = ('<link href="/src/output.css"><script src="./app.js?v=2"></script>'
+            "<img src='app.js#x'><style>a{background:url(src/output.css)}</style>")
+    assert rewrite_references(html, ASSETS) == (
+        '<link href="/src/output.0123456789ab.css"><script src="./app.ba9876543210.js?v=2"></script>'
+        "<img src='app.ba9876543210.js#x'><style>a{background:url(src/output.0123456789ab.css)}</style>"
+    )
+
+
+def test_rewrite_references_leaves_other_paths():
+    text = '"src/output.css.map" "other/app.js" "myapp.js" "/static/app.jsx"'
+    assert rewrite_references(text, ASSETS) == text
+    assert rewrite_references('"app.js"', {}) == '"app.js"'
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(data)
+
+
+def test_build_assets(tmp_path):
+    static_dir = str(tmp_path / 'static')
+    build_dir = str(tmp_path / 'build' / 'static')
+    write(os.path.join(static_dir, 'index.html'), '<link href="/src/output.css"><script src="/app.js"></script>' * 20)
+    write(os.path.join(static_dir, 'src', 'output.css'), 'body{background:url("../logo.png")}' + ' ' * 500)
+    write(os.path.join(static_dir, 'app.js'), 'fetch("/api/leaderboard");' * 20)
+    write(os.path.join(static_dir, 'sw.js'), 'self.addEventListener("fetch", () => {});')
+    write(os.path.join(static_dir, 'package.json'), '{}')
+
+    manifest = build_assets(static_dir, build_dir)
+
+    css = manifest['assets']['src/output.css']
+    js = manifest['assets']['app.js']
+    assert css.startswith('src/output.') and css.endswith('.css')
+    assert set(manifest['assets']) == {'src/output.css', 'app.js'}
+    assert set(manifest['files']) == {css, js, 'index.html', 'sw.js'}
+    assert manifest['files'][css]['immutable'] and not manifest['files']['index.html']['immutable']
+    assert 'gzip' in manifest['files']['index.html']['encodings']
+
+    with open(os.path.join(build_dir, 'index.html'), encoding='utf-8') as f:
+        html = f.read()
+    assert f'href="/{css}"' in html and f'src="/{js}"' in html
+    assert os.path.exists(os.path.join(build_dir, 'index.html.gz'))
+    assert not os.path.exists(os.path.join(build_dir, 'package.json'))
+    assert not os.path.exists(build_dir + '.tmp')
+    with open(os.path.join(build_dir, MANIFEST_NAME), encoding='utf-8') as f:
+        assert json.load(f) == manifest
+
+
+def test_build_assets_is_reproducible(tmp_path):
+    static_dir = str(tmp_path / 'static')
+    write(os.path.join(static_dir, 'app.js'), 'console.log(1);')
+    first = build_assets(static_dir, str(tmp_path / 'a'))
+    second = build_assets(static_dir, str(tmp_path / 'b'))
+    assert first == second
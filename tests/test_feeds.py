@@ -0,0 +1,34 @@
+import pytest
+
+from services.feeds import decode_team_member_cursor, team_leaderboard_query, team_member_cursor, team_members_query
+from services.pagination import InvalidCursor
+
+
+def test_team_member_cursor_round_trip():
+    assert decode_team_member_cursor(team_member_cursor({'elo': 1234.5, 'username': 'alice'})) == (1234.5, 'alice')
+    # Members without an ELO are listed last and can be paged through too
+    assert decode_team_member_cursor(team_member_cursor({'elo': None, 'username': 'bob'})) == (None, 'bob')
+    assert decode_team_member_cursor(None) is None
+    with pytest.raises(InvalidCursor):
+        decode_team_member_cursor('garbage')
+
+
+@pytest.mark.parametrize('cursor, params', [
+    (None, ('T', 6, 'T', 6, 6)),
+    ((1000.0, 'm'), ('T', 1000.0, 'm', 6, 'T', 6, 6)),
+    ((None, 'm'), (6, 'T', 'm', 6, 6)),
+])
+def test_team_members_query_params(cursor, params):
+    sql, query_params = team_members_query('T', cursor, 5)
+    assert query_params == params
+    assert sql.count('%s') == len(params)
+    assert 'NULLS LAST' in sql
+
+
+def test_team_leaderboard_search_escapes_wildcards():
+    sql, params = team_leaderboard_query('top_elo', '50%_club', 100, 0)
+    assert 'ILIKE' in sql and 'ORDER BY top_elo DESC' in sql
+    assert params == ('%50\\%\\_club%', 100, 0)
+    sql, params = team_leaderboard_query('avg_elo', '', 100, 200)
+    assert 'WHERE' not in sql
+    assert params == (100, 200)
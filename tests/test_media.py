@@ -0,0 +1,66 @@
+from datetime import datetime, timezone
+
+import pytest
+from flask import Flask
+from werkzeug.http import http_date
+
+from services.media import MAX_RANGES, if_range_matches, resolve_ranges
+
+SIZE = 1000
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('bytes=0-99', [(0, 100)]),
+    ('bytes=900-', [(900, 1000)]),
+    ('bytes=-100', [(900, 1000)]),
+    ('bytes=990-2000', [(990, 1000)]),
+    ('bytes=0-99,200-299', [(0, 100), (200, 300)]),
+])
+def test_resolve_ranges(header, expected):
+    assert resolve_ranges(header, SIZE) == expected
+
+
+def test_resolve_ranges_merges_adjacent():
+    assert resolve_ranges('bytes=0-99,100-199', SIZE) == [(0, 200)]
+    assert resolve_ranges('bytes=0-99,100-199,300-', SIZE) == [(0, 200), (300, 1000)]
+    # A suffix range is resolved before merging
+    assert resolve_ranges('bytes=0-899,-100', SIZE) == [(0, 1000)]
+
+
+def test_resolve_ranges_unsatisfiable():
+    # Answered with 416
+    assert resolve_ranges('bytes=1000-', SIZE) == []
+    assert resolve_ranges('bytes=5000-6000', SIZE) == []
+
+
+@pytest.mark.parametrize('header', [
+    'bytes=abc',
+    'items=0-10',
+    'bytes=' + ','.join(f'{i}-{i}' for i in range(MAX_RANGES + 1)),
+    # werkzeug rejects overlapping and out-of-order ranges
+    'bytes=0-99,50-149',
+    'bytes=200-299,0-99',
+    'bytes=0-999,0-999',
+])
+def test_resolve_ranges_ignored(header):
+    # Answered with the whole file
+    assert resolve_ranges(header, SIZE) is None
+
+
+ETAG = 'abc-3e8'
+LAST_MODIFIED = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize('if_range, expected', [
+    (None, True),
+    (f'"{ETAG}"', True),
+    ('"other"', False),
+    (f'W/"{ETAG}"', False),
+    (http_date(LAST_MODIFIED), True),
+    (http_date(datetime(2025, 1, 1, tzinfo=timezone.utc)), False),
+    ('garbage', False),
+])
+def test_if_range_matches(if_range, expected):
+    headers = {'If-Range': if_range} if if_range else {}
+    with Flask(__name__).test_request_context(headers=headers):
+        assert if_range_matches(ETAG, LAST_MODIFIED) is expected
@@ -0,0 +1,25 @@
+import pytest
+
+from services.pagination import InvalidCursor, decode_keyset_cursor, encode_keyset_cursor
+
+
+def test_keyset_cursor_round_trip():
+    token = encode_keyset_cursor(1234.5, 'alice')
+    assert '=' not in token
+    assert decode_keyset_cursor(token, float, str) == (1234.5, 'alice')
+
+
+def test_keyset_cursor_converts_values():
+    token = encode_keyset_cursor('2026-01-01T10:00:00', 7)
+    assert decode_keyset_cursor(token, str, int) == ('2026-01-01T10:00:00', 7)
+
+
+def test_missing_keyset_cursor_is_none():
+    assert decode_keyset_cursor(None, float, str) is None
+    assert decode_keyset_cursor('', float, str) is None
+
+
+@pytest.mark.parametrize('token', ['not-a-cursor', '!!!', encode_keyset_cursor(1.0), encode_keyset_cursor('x', 'y')])
+def test_invalid_keyset_cursor(token):
+    with pytest.raises(InvalidCursor):
+        decode_keyset_cursor(token, float, str)
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services.pr_import import MAX_WEIGHT, parse_created_at, validate_row
+
+
+def test_valid_row():
+    values, errors = validate_row({'username': ' alice ', 'lift_type': 'Bench', 'weight': '102.5',
+                                   'video_url': 'https://www.instagram.com/p/abc/',
+                                   'created_at': '2025-06-01'})
+    assert errors == []
+    assert values == ('alice', 'bench', 102.5, 'https://www.instagram.com/p/abc/', datetime(2025, 6, 1))
+
+
+def test_row_without_optional_fields():
+    values, errors = validate_row({'username': 'bob', 'lift_type': 'squat', 'weight': 200})
+    assert errors == []
+    assert values == ('bob', 'squat', 200.0, None, None)
+
+
+def test_instagram_url_alias():
+    values, errors = validate_row({'username': 'bob', 'lift_type': 'squat', 'weight': 200,
+                                   'instagram_url': 'https://instagram.com/reel/x'})
+    assert errors == []
+    assert values[3] == 'https://instagram.com/reel/x'
+
+
+@pytest.mark.parametrize('row, message', [
+    ({'lift_type': 'bench', 'weight': 100}, 'username is required'),
+    ({'username': 'a', 'lift_type': 'curl', 'weight': 100}, 'lift_type must be one of bench, deadlift, squat'),
+    ({'username': 'a', 'lift_type': 'bench', 'weight': 'heavy'}, 'weight must be a number'),
+    ({'username': 'a', 'lift_type': 'bench'}, 'weight must be a number'),
+    ({'username': 'a', 'lift_type': 'bench', 'weight': 0}, f'weight must be between 0 and {MAX_WEIGHT}'),
+    ({'username': 'a', 'lift_type': 'bench', 'weight': MAX_WEIGHT + 1}, f'weight must be between 0 and {MAX_WEIGHT}'),
+    ({'username': 'a', 'lift_type': 'bench', 'weight': 100, 'video_url': 'https://youtube.com/x'},
+     'video_url must be an Instagram URL'),
+])
+def test_invalid_row(row, message):
+    _, errors = validate_row(row)
+    assert errors == [message]
+
+
+def test_row_collects_every_error():
+    _, errors = validate_row({'lift_type': 'curl', 'weight': 'x', 'created_at': 'yesterday'})
+    assert len(errors) == 4
+    assert errors[-1].startswith('invalid created_at')
+
+
+def test_row_must_be_an_object():
+    assert validate_row(['alice', 'bench', 100]) == (None, ['not an object'])
+
+
+def test_parse_created_at_converts_to_naive_utc():
+    assert parse_created_at('2025-06-01T12:00:00Z') == datetime(2025, 6, 1, 12, 0)
+    assert parse_created_at('2025-06-01T14:00:00+02:00') == datetime(2025, 6, 1, 12, 0)
+    assert parse_created_at(' 2025-06-01 ') == datetime(2025, 6, 1)
+
+
+def test_parse_created_at_rejects_future_and_garbage():
+    with pytest.raises(ValueError, match='future'):
+        parse_created_at((datetime.now(timezone.utc) + timedelta(days=1)).isoformat())
+    with pytest.raises(ValueError):
+        parse_created_at('June 1st')
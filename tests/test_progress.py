@@ -0,0 +1,39 @@
+from services.progress import lttb
+
+
+def series(n):
+    return [(i, (i * 7919) % 97, f"p{i}") for i in range(n)]
+
+
+def test_lttb_keeps_first_and_last_points():
+    points = series(500)
+    sampled = lttb(points, 50)
+    assert len(sampled) == 50
+    assert sampled[0] == points[0]
+    assert sampled[-1] == points[-1]
+
+
+def test_lttb_keeps_order_and_original_points():
+    points = series(300)
+    sampled = lttb(points, 20)
+    xs = [point[0] for point in sampled]
+    assert xs == sorted(xs)
+    assert all(point in points for point in sampled)
+
+
+def test_lttb_keeps_the_peak():
+    points = [(i, 0) for i in range(100)]
+    points[42] = (42, 1000)
+    assert (42, 1000) in lttb(points, 10)
+
+
+def test_lttb_returns_everything_at_or_above_threshold():
+    points = series(10)
+    assert lttb(points, 10) == points
+    assert lttb(points, 25) == points
+    assert lttb([], 5) == []
+
+
+def test_lttb_ignores_thresholds_too_small_to_sample():
+    points = series(10)
+    assert lttb(points, 2) == points
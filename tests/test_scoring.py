@@ -0,0 +1,29 @@
+import random
+
+import pytest
+
+from services.scoring import DOTS_MEN, DOTS_WOMEN, calculate_dots_score, calculate_dots_scores, round_dots_scores
+
+
+def test_batch_scores_match_scalar_scores():
+    rng = random.Random(7)
+    totals = [round(rng.uniform(50, 1100), 1) for _ in range(2000)]
+    bodyweights = [round(rng.uniform(40, 180), 1) for _ in range(2000)]
+    genders = [rng.choice(['male', 'female']) for _ in range(2000)]
+    batch = round_dots_scores(calculate_dots_scores(totals, bodyweights, genders))
+    assert batch == [calculate_dots_score(*row) for row in zip(totals, bodyweights, genders)]
+
+
+def test_missing_bodyweight_scores_zero():
+    scores = round_dots_scores(calculate_dots_scores([500, 500, 500], [None, 0, -5], ['male', 'female', 'male']))
+    assert scores == [0.0, 0.0, 0.0]
+    assert calculate_dots_score(500, None, 'male') == 0
+    assert calculate_dots_score(500, 0, 'female') == 0
+
+
+@pytest.mark.parametrize('total, bodyweight, gender', [(600, 90, 'male'), (350, 60, 'female'), (800.5, 120.3, 'male')])
+def test_dots_formula(total, bodyweight, gender):
+    k = DOTS_MEN if gender == 'male' else DOTS_WOMEN
+    w = bodyweight
+    expected = 500 * total / (k['a'] + k['b'] * w + k['c'] * w ** 2 + k['d'] * w ** 3 + k['e'] * w ** 4)
+    assert calculate_dots_score(total, bodyweight, gender) == pytest.approx(expected, abs=0.005)